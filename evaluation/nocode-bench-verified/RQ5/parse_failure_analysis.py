@@ -1,17 +1,27 @@
 import argparse
-import re
-import pandas as pd
 import os
+import sys
 
-# Regular expressions to extract the required information
-PATTERNS = {
-    'total_instances': r'Total Instances:\s*(\d+)',
-    'success': r'Successfully Resolved:\s*(\d+)\s*\(([\d.]+)%\)',
-    'failure': r'Failed to Resolve:\s*(\d+)\s*\(([\d.]+)%\)',
-    'regression_p2p': r'1\. Regression Errors \(P2P\):\s*(\d+)\s*\(([\d.]+)%\)',
-    'new_feature_f2p': r'2\. New Feature Implementation Errors \(F2P\):\s*(\d+)\s*\(([\d.]+)%\)',
-    'both_errors': r'3\. Both Types of Errors:\s*(\d+)\s*\(([\d.]+)%\)',
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from raim_eval.eval_result import TAXONOMIES, parse_eval_result, parse_eval_results
+from raim_eval.discovery import BEST, discover_artifacts
+
+def to_failure_analysis(parsed):
+    """
+    Convert a parsed EvalResult into the flat dict used by this script.
+    Returns None if the file has no Failure Type Analysis section.
+    """
+    if not parsed.has_failure_analysis:
+        print(f"Warning: 'Failure Type Analysis' section not found in {parsed.path}")
+        return None
+    if not parsed.failure_taxonomy:
+        print(f"Warning: no known failure types found in {parsed.path}")
+
+    result = parsed.to_dict()
+    # The failure section reports the resolved count under 'Successfully Resolved'
+    result['success_count'] = parsed.resolved_count
+    result['success_percent'] = parsed.resolved_percent
+    return result
 
 def parse_failure_analysis(file_path):
     """
@@ -21,96 +31,66 @@ def parse_failure_analysis(file_path):
         print(f"Warning: File not found: {file_path}")
         return None
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Find the Failure Type Analysis section
-    analysis_start = content.find('Failure Type Analysis')
-    if analysis_start == -1:
-        print(f"Warning: 'Failure Type Analysis' section not found in {file_path}")
-        return None
-    
-    # Extract the required information
-    result = {
-        'total_instances': 0,
-        'success_count': 0,
-        'success_percent': 0.0,
-        'failure_count': 0,
-        'failure_percent': 0.0,
-        'regression_p2p_count': 0,
-        'regression_p2p_percent': 0.0,
-        'new_feature_f2p_count': 0,
-        'new_feature_f2p_percent': 0.0,
-        'both_errors_count': 0,
-        'both_errors_percent': 0.0,
-    }
-    
-    # Parse all patterns from the entire file
-    for key, pattern in PATTERNS.items():
-        match = re.search(pattern, content)
-        if match:
-            if key == 'total_instances':
-                result['total_instances'] = int(match.group(1))
-            else:
-                result[f'{key}_count'] = int(match.group(1))
-                result[f'{key}_percent'] = float(match.group(2))
-        else:
-            print(f"Warning: {key} not found in {file_path}")
-    
-    return result
+    return to_failure_analysis(parse_eval_result(file_path))
 
-def main():
-    parser = argparse.ArgumentParser(description='Parse failure analysis results from evaluation files.')
-    parser.add_argument('results', nargs='+', help='Method name and result file path pairs, e.g., "Method1 /path/to/result1.txt" "Method2 /path/to/result2.txt"')
-    parser.add_argument('--output', '-o', default='failure_analysis_summary.xlsx', help='Output file path (default: failure_analysis_summary.xlsx)')
-    
-    args = parser.parse_args()
-    
-    # Process the results
+def failure_rows(pairs, parsed_files):
+    """
+    Build one summary row per (method name, result file) from parsed EvalResults.
+    Files without a Failure Type Analysis section are skipped.
+    """
     data = []
-    for i in range(0, len(args.results), 2):
-        if i + 1 >= len(args.results):
-            print(f"Warning: Missing file path for method {args.results[i]}")
-            continue
-        
-        method_name = args.results[i]
-        file_path = args.results[i + 1]
-        
+    for (method_name, file_path), parsed in zip(pairs, parsed_files):
         print(f"Processing {method_name}: {file_path}")
-        analysis = parse_failure_analysis(file_path)
+        analysis = to_failure_analysis(parsed)
         
         if analysis:
             row = {
                 'Method': method_name,
+                'Failure Taxonomy': analysis['failure_taxonomy'],
                 'Total Instances': analysis['total_instances'],
                 'Success Count': analysis['success_count'],
                 'Success %': analysis['success_percent'],
                 'Failure Count': analysis['failure_count'],
                 'Failure %': analysis['failure_percent'],
-                'regression_p2p_count': analysis['regression_p2p_count'],
-                'regression_p2p_percent': analysis['regression_p2p_percent'],
-                'new_feature_f2p_count': analysis['new_feature_f2p_count'],
-                'new_feature_f2p_percent': analysis['new_feature_f2p_percent'],
-                'both_errors_count': analysis['both_errors_count'],
-                'both_errors_percent': analysis['both_errors_percent'],
+                'Applied %': analysis['applied_percent'],
+                'RT %': analysis['rt_percent'],
+                'FV-Micro': analysis['fv_micro'],
+                'FV-Macro': analysis['fv_macro'],
             }
+            # Categories from the other taxonomy stay empty rather than 0
+            for taxonomy, keys in TAXONOMIES.items():
+                own = taxonomy == analysis['failure_taxonomy']
+                for key in keys:
+                    row[f'{key}_count'] = analysis[f'{key}_count'] if own else None
+                    row[f'{key}_percent'] = analysis[f'{key}_percent'] if own else None
             data.append(row)
     
-    if not data:
-        print("No valid data parsed.")
-        return
-    
-    # Create a DataFrame
+    return data
+
+def write_failure_tables(data, output):
+    """
+    Write the Excel summary and the LaTeX table (same name, .tex) for the given rows.
+    """
+    import pandas as pd
+    from raim_eval.render import render
+
+    # Create a DataFrame; counts of the other taxonomy are missing, so keep them nullable integers
     df = pd.DataFrame(data)
+    count_columns = [f'{key}_count' for keys in TAXONOMIES.values() for key in keys]
+    df[count_columns] = df[count_columns].astype('Int64')
     
     # Reorder columns for better readability (Excel version) with new error type columns
     excel_columns = [
-        'Method', 'Total Instances',
+        'Method', 'Failure Taxonomy', 'Total Instances',
         'Success Count', 'Success %',
         'Failure Count', 'Failure %',
+        'Applied %', 'RT %', 'FV-Micro', 'FV-Macro',
         'regression_p2p_count', 'regression_p2p_percent',
         'new_feature_f2p_count', 'new_feature_f2p_percent',
-        'both_errors_count', 'both_errors_percent'
+        'both_errors_count', 'both_errors_percent',
+        'regression_test_count', 'regression_test_percent',
+        'file_localization_count', 'file_localization_percent',
+        'patch_functionality_count', 'patch_functionality_percent'
     ]
     df_excel = df[excel_columns]
     
@@ -121,7 +101,13 @@ def main():
         'new_feature_f2p_count': 'New Feature Implementation Errors (F2P) Count',
         'new_feature_f2p_percent': 'New Feature Implementation Errors (F2P) %',
         'both_errors_count': 'Both Types of Errors Count',
-        'both_errors_percent': 'Both Types of Errors %'
+        'both_errors_percent': 'Both Types of Errors %',
+        'regression_test_count': 'Regression Test Errors Count',
+        'regression_test_percent': 'Regression Test Errors %',
+        'file_localization_count': 'File Localization Errors Count',
+        'file_localization_percent': 'File Localization Errors %',
+        'patch_functionality_count': 'Patch Functionality Errors Count',
+        'patch_functionality_percent': 'Patch Functionality Errors %'
     })
     
     # Print the full table to console
@@ -129,8 +115,8 @@ def main():
     print(df_excel.to_string(index=False))
     
     # Save full data to Excel
-    df_excel.to_excel(args.output, index=False)
-    print(f"\nSummary saved to: {args.output}")
+    render(df_excel, output)
+    print(f"\nSummary saved to: {output}")
     
     # Prepare LaTeX table with only the requested columns, adding Model column
     df_latex = df.copy()
@@ -149,12 +135,13 @@ def main():
         lambda x: pd.Series(split_method_model(x))
     )
     
-    # Calculate New Feature Implementation Error as the percentage of new feature errors
-    # from the new error type distribution
-    df_latex['New Feature Implementation Error'] = df_latex['new_feature_f2p_percent']
-    
-    # Use Regression Error from the new error type distribution
-    df_latex['Regression Error %'] = df_latex['regression_p2p_percent']
+    # The two failure taxonomies report regressions under different keys, and only the
+    # P2P/F2P one has a new feature error; leave it blank (NaN) instead of writing 0
+    p2p_f2p = df_latex['Failure Taxonomy'] == 'p2p_f2p'
+    localization = df_latex['Failure Taxonomy'] == 'localization'
+    df_latex['Regression Error %'] = df_latex['regression_p2p_percent'].where(p2p_f2p)
+    df_latex.loc[localization, 'Regression Error %'] = df_latex.loc[localization, 'regression_test_percent']
+    df_latex['New Feature Implementation Error'] = df_latex['new_feature_f2p_percent'].where(p2p_f2p)
     
     # === Calculate relative error changes compared to RAIM method for same model ===
     # Define columns for relative changes
@@ -164,6 +151,7 @@ def main():
     # Initialize new columns
     df_latex[rel_regression_col] = 0.0
     df_latex[rel_feature_col] = 0.0
+    df_latex.loc[df_latex['New Feature Implementation Error'].isna(), rel_feature_col] = float('nan')
     
     # Group by Model and calculate relative changes compared to RAIM
     for model, group in df_latex.groupby('Model'):
@@ -173,6 +161,7 @@ def main():
             # Get RAIM's error rates as baseline
             raim_reg_error = raim_rows['Regression Error %'].iloc[0]
             raim_feature_error = raim_rows['New Feature Implementation Error'].iloc[0]
+            raim_taxonomy = raim_rows['Failure Taxonomy'].iloc[0]
             
             # Calculate relative change for each method in the group
             for idx in group.index:
@@ -191,6 +180,10 @@ def main():
                     else:
                         rel_feature = 0.0
                     
+                    # Error rates from different taxonomies are not comparable
+                    if df_latex.loc[idx, 'Failure Taxonomy'] != raim_taxonomy:
+                        rel_reg = rel_feature = float('nan')
+                    
                     df_latex.loc[idx, rel_regression_col] = rel_reg
                     df_latex.loc[idx, rel_feature_col] = rel_feature
     
@@ -208,24 +201,61 @@ def main():
     df_latex = df_latex[latex_columns]
     
     # Save to LaTeX table with custom formatting for relative changes (show signs)
-    latex_output = args.output.replace('.xlsx', '.tex')
+    latex_output = output.replace('.xlsx', '.tex')
     # Create a custom formatter to show signs for relative changes
     def format_with_sign(x):
         if pd.isna(x):
             return ''
         return f"{'+' if x > 0 else ''}{x:.2f}"
     
-    # Generate LaTeX table with formatted values
-    latex_table = df_latex.to_latex(index=False, float_format="%.2f", 
-                                      formatters={
-                                          rel_regression_col: format_with_sign,
-                                          rel_feature_col: format_with_sign
-                                      })
-    
-    # Write the LaTeX table to file
-    with open(latex_output, 'w', encoding='utf-8') as f:
-        f.write(latex_table)
+    # Write the LaTeX table with formatted values
+    render(df_latex, latex_output, float_format="%.2f",
+           formatters={
+               rel_regression_col: format_with_sign,
+               rel_feature_col: format_with_sign
+           })
     print(f"LaTeX table saved to: {latex_output}")
 
+def main():
+    parser = argparse.ArgumentParser(description='Parse failure analysis results from evaluation files.')
+    parser.add_argument('results', nargs='*', help='Method name and result file path pairs, e.g., "Method1 /path/to/result1.txt" "Method2 /path/to/result2.txt"')
+    parser.add_argument('--discover', metavar='ROOT', help='Also add every selected-patch eval_result_*.txt found under ROOT (the nocode-bench-verified directory)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of processes used to parse the result files (default: 1)')
+    parser.add_argument('--output', '-o', default='failure_analysis_summary.xlsx', help='Output file path (default: failure_analysis_summary.xlsx)')
+    
+    args = parser.parse_args()
+    
+    # Process the results
+    pairs = []
+    for i in range(0, len(args.results), 2):
+        if i + 1 >= len(args.results):
+            print(f"Warning: Missing file path for method {args.results[i]}")
+            continue
+        
+        method_name = args.results[i]
+        file_path = args.results[i + 1]
+        if not os.path.exists(file_path):
+            print(f"Warning: File not found: {file_path}")
+            continue
+        pairs.append((method_name, file_path))
+    
+    if args.discover:
+        for artifact in discover_artifacts(args.discover):
+            if artifact.kind == 'eval_result' and artifact.pred == BEST:
+                pairs.append((artifact.label, artifact.path))
+    
+    if not pairs:
+        parser.error('no result files given; pass "Method path" pairs or --discover ROOT')
+    
+    parsed_files = parse_eval_results([file_path for _, file_path in pairs], jobs=args.jobs)
+    
+    data = failure_rows(pairs, parsed_files)
+    
+    if not data:
+        print("No valid data parsed.")
+        return
+    
+    write_failure_tables(data, args.output)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,3 @@
+"""
+Shared helpers for the NoCode-bench Verified analysis scripts (RQ1-RQ5).
+"""
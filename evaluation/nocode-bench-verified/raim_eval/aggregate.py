@@ -0,0 +1,79 @@
+# numpy / pandas are imported inside the functions, so scripts can use the
+# constants below (e.g. as argparse choices) without loading them at startup
+MODIFICATION_TYPES = ['single_file', 'multi_file']
+
+# Changed (added + removed) lines of a patch; empty or missing patches get their own '0' bucket
+PATCH_SIZE_BINS = [-1, 0, 10, 50, 200, float('inf')]
+PATCH_SIZE_LABELS = ['0', '1-10', '11-50', '51-200', '>200']
+
+FILE_COUNT_BINS = [-1, 0, 1, 2, 3, float('inf')]
+FILE_COUNT_LABELS = ['0', '1', '2', '3', '4+']
+
+GROUP_KEYS = ['modification_type', 'repository', 'num_files', 'patch_size']
+
+
+def results_frame(method_results):
+    """Flatten {method: {instance_id: resolved}} into a (method, instance_id, resolved) frame."""
+    import numpy as np
+    import pandas as pd
+
+    methods = list(method_results)
+    frames = [
+        pd.DataFrame({
+            'method': name,
+            'instance_id': list(results.keys()),
+            'resolved': np.fromiter(results.values(), dtype=bool, count=len(results)),
+        })
+        for name, results in method_results.items()
+    ]
+    if not frames:
+        return pd.DataFrame({'method': pd.Categorical([], categories=methods),
+                             'instance_id': [], 'resolved': np.array([], dtype=bool)})
+
+    frame = pd.concat(frames, ignore_index=True)
+    # Keep the command-line order of methods in every groupby result
+    frame['method'] = pd.Categorical(frame['method'], categories=methods)
+    return frame
+
+
+def instance_frame(instance_index):
+    """One row per instance with every grouping key derived from the instance index."""
+    import pandas as pd
+
+    frame = pd.DataFrame.from_dict(instance_index, orient='index')
+    frame.index.name = 'instance_id'
+    frame = frame.reset_index()
+
+    frame['modification_type'] = pd.Categorical(frame['type'], categories=MODIFICATION_TYPES)
+    frame['repository'] = frame['instance_id'].str.split('__', n=1).str[0]
+    frame['num_files'] = pd.cut(frame['num_files'], bins=FILE_COUNT_BINS, labels=FILE_COUNT_LABELS)
+    num_lines = frame['num_lines'] if 'num_lines' in frame else pd.Series(0, index=frame.index)
+    frame['patch_size'] = pd.cut(num_lines, bins=PATCH_SIZE_BINS, labels=PATCH_SIZE_LABELS)
+    return frame[['instance_id'] + GROUP_KEYS]
+
+
+def success_rates(joined, by):
+    """
+    Total / resolved / rate per (method, *by) over an already joined frame.
+
+    Groups with no instances are kept with a zero total so every method
+    gets the same rows.
+    """
+    keys = ['method'] + list(by)
+    table = joined.groupby(keys, observed=False, sort=True)['resolved'].agg(total='size', resolved='sum')
+    table['rate'] = (table['resolved'] / table['total'].where(table['total'] > 0)).fillna(0.0)
+    return table.reset_index()
+
+
+def success_breakdowns(results, instances, group_keys=('modification_type',)):
+    """
+    Join the results with the instance index once and compute one success-rate
+    table per grouping key, plus the per-method 'overall' table.
+
+    Instances that are not in the index are ignored, as in the original RQ2 loop.
+    """
+    joined = results.merge(instances, on='instance_id', how='inner')
+    tables = {'overall': success_rates(joined, [])}
+    for key in group_keys:
+        tables[key] = success_rates(joined, [key])
+    return tables
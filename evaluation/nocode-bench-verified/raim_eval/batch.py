@@ -0,0 +1,101 @@
+"""
+Discover every run under evaluation/nocode-bench-verified and summarize it
+into one consolidated table.
+
+    python -m raim_eval.batch -o all_results.csv -j 8
+"""
+import os
+import argparse
+
+from .discovery import default_root, discover_artifacts
+from .eval_result import parse_eval_results
+from .loader import load_evaluation_details
+from .parallel import parallel_map
+from .render import RENDERERS, render
+
+KEY_COLUMNS = ['rq', 'run', 'method', 'model', 'pred']
+
+
+def details_summary(path):
+    table = load_evaluation_details(path)
+    return {
+        'instances': len(table),
+        'resolved': int(table.resolved.sum()),
+        'applied': int(table.applied.sum()),
+    }
+
+
+def summary_frame(root, results, details):
+    """
+    Combine [(artifact, EvalResult)] and [(artifact, counts)] into one row per
+    (rq, run, pred) with the header metrics and the evaluation_details counts.
+    """
+    import pandas as pd
+
+    rows = {}
+
+    def row_for(artifact):
+        key = (artifact.rq, artifact.run, artifact.pred)
+        if key not in rows:
+            rows[key] = {'rq': artifact.rq, 'run': artifact.run, 'method': artifact.method,
+                         'model': artifact.model, 'pred': artifact.pred}
+        return rows[key]
+
+    for artifact, parsed in results:
+        row = row_for(artifact)
+        parsed = parsed.to_dict()
+        parsed.pop('path')
+        parsed['result_path'] = os.path.relpath(artifact.path, root)
+        row.update(parsed)
+
+    for artifact, counts in details:
+        row = row_for(artifact)
+        row.update({f'details_{k}': v for k, v in counts.items()})
+        row['details_path'] = os.path.relpath(artifact.path, root)
+
+    df = pd.DataFrame(list(rows.values()))
+    if df.empty:
+        return df
+    # 'best' sorts after the numbered candidates of the same run
+    df['pred_order'] = pd.to_numeric(df['pred'], errors='coerce').fillna(float('inf'))
+    df = df.sort_values(['rq', 'run', 'pred_order'], kind='stable').drop(columns='pred_order')
+    return df.reset_index(drop=True)
+
+
+def summarize(root, jobs=1):
+    """Discover and parse every result file under `root` concurrently and summarize them."""
+    artifacts = discover_artifacts(root)
+    result_artifacts = [a for a in artifacts if a.kind == 'eval_result']
+    details_artifacts = [a for a in artifacts if a.kind == 'evaluation_details']
+    print(f"Found {len(result_artifacts)} result files and {len(details_artifacts)} evaluation_details files under {root}")
+
+    results = zip(result_artifacts, parse_eval_results([a.path for a in result_artifacts], jobs=jobs))
+    details = zip(details_artifacts, parallel_map(details_summary, [a.path for a in details_artifacts], jobs=jobs))
+    return summary_frame(root, results, details)
+
+
+def write_table(df, output):
+    if os.path.splitext(output)[1].lower() in RENDERERS:
+        render(df, output)
+    else:
+        df.to_csv(output, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize every evaluation run found under the NoCode-bench Verified results tree.')
+    parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders (default: evaluation/nocode-bench-verified)')
+    parser.add_argument('--output', '-o', default='all_results.csv', help='Output table (.csv, .xlsx, .jsonl, .md or .tex; default: all_results.csv)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    df = summarize(args.root, jobs=args.jobs)
+    if df.empty:
+        print("No result files found.")
+        return
+
+    write_table(df, args.output)
+    print(f"Summary of {len(df)} runs saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
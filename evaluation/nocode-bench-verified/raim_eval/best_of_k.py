@@ -0,0 +1,195 @@
+"""
+Best-of-k analysis over the RQ4 `logs_num_plan_k*` runs.
+
+Every candidate `pred_<i>/evaluation_details.jsonl` of a run is loaded into
+a dense instance x candidate matrix (resolved flags and F2P pass ratios).
+From it we get the oracle (any candidate resolves the instance), pass@k,
+the accuracy of the selected patch against the oracle, and the marginal gain
+of each added plan, for every run at once.
+
+    python -m raim_eval.best_of_k --latex design_table.tex
+"""
+import os
+import math
+import argparse
+
+from .discovery import BEST, default_root, discover_artifacts
+from .parallel import parallel_map
+from .render import render
+
+
+def _candidate_vectors(artifact):
+    """Resolved flag and F2P pass counts per instance of one candidate (executed in a worker)."""
+    from .loader import load_evaluation_details
+    from .test_outcomes import decode_outcome
+
+    instance_ids, resolved, f2p_passed, f2p_total = [], [], [], []
+    for instance_id, record in load_evaluation_details(artifact.path).iter_records():
+        success, failure, not_attempted = decode_outcome(record.get('F2P'))
+        instance_ids.append(instance_id)
+        resolved.append(bool(record.get('resolved')))
+        f2p_passed.append(len(success))
+        f2p_total.append(len(success) + len(failure) + len(not_attempted))
+    return instance_ids, resolved, f2p_passed, f2p_total
+
+
+class CandidateMatrix:
+    """
+    Dense (instances x candidates) outcomes of one multi-plan run.
+
+    `selected` holds the resolved flags of the patch the pipeline picked
+    (the run's pred_best / root details), or None when the run has no
+    selection step logged. `preds` are the pred_<i> numbers of the columns,
+    in order; a run with a missing pred_<i> has gaps in them.
+    """
+
+    def __init__(self, rq, run, model, instance_ids, resolved, f2p_ratio, selected=None, preds=None):
+        import numpy as np
+
+        self.rq = rq
+        self.run = run
+        self.model = model
+        self.instance_ids = list(instance_ids)
+        self.resolved = np.asarray(resolved, dtype=bool)
+        self.f2p_ratio = np.asarray(f2p_ratio, dtype=float)
+        self.selected = None if selected is None else np.asarray(selected, dtype=bool)
+        self.preds = list(range(self.resolved.shape[1])) if preds is None else list(preds)
+
+    @property
+    def k(self):
+        return self.resolved.shape[1]
+
+    def oracle_curve(self):
+        """Instances solved by at least one of the first j candidates, for j = 1..k."""
+        import numpy as np
+
+        return np.logical_or.accumulate(self.resolved, axis=1).sum(axis=0)
+
+    def pass_at_k(self):
+        """
+        Unbiased pass@j for j = 1..k (Chen et al., 2021), averaged over instances.
+
+        With n candidates of which c resolve the instance, pass@j is
+        1 - C(n - c, j) / C(n, j); the (c, j) table is tiny, so it is built
+        once and indexed with the per-instance c vector.
+        """
+        import numpy as np
+
+        n = self.k
+        correct = self.resolved.sum(axis=1)
+        table = np.array([[1.0 - math.comb(n - c, j) / math.comb(n, j) for j in range(1, n + 1)]
+                          for c in range(n + 1)])
+        return table[correct].mean(axis=0)
+
+    def summary(self):
+        solvable = self.resolved.any(axis=1)
+        curve = self.oracle_curve()
+        row = {
+            'rq': self.rq, 'run': self.run, 'model': self.model, 'k': self.k,
+            'instances': len(self.instance_ids),
+            'solvable': int(solvable.sum()),
+            'oracle_fv_macro': float(self.f2p_ratio.max(axis=1).mean()) if self.k else 0.0,
+            'mean_candidate_resolved': float(self.resolved.sum(axis=0).mean()),
+        }
+        if self.selected is not None:
+            correct = int((self.selected & solvable).sum())
+            row.update({
+                'selected_correct': correct,
+                'selector_accuracy': correct / row['solvable'] if row['solvable'] else 0.0,
+                'success_rate': self.selected.sum() / len(self.instance_ids) * 100,
+            })
+        for j, (solved, estimate) in enumerate(zip(curve, self.pass_at_k()), start=1):
+            row[f'oracle@{j}'] = int(solved)
+            row[f'pass@{j}'] = float(estimate)
+            row[f'gain@{j}'] = int(solved - (curve[j - 2] if j > 1 else 0))
+        return row
+
+
+def load_candidate_matrices(root, jobs=1):
+    """Build one CandidateMatrix per run that has pred_<i> candidates."""
+    import numpy as np
+
+    artifacts = [a for a in discover_artifacts(root) if a.kind == 'evaluation_details']
+    vectors = dict(zip(artifacts, parallel_map(_candidate_vectors, artifacts, jobs=jobs)))
+
+    runs = {}
+    for artifact in artifacts:
+        runs.setdefault((artifact.rq, artifact.run, artifact.model), {})[artifact.pred] = vectors[artifact]
+
+    matrices = []
+    for (rq, run, model), preds in runs.items():
+        candidates = sorted((int(p) for p in preds if p != BEST))
+        if not candidates:
+            continue
+
+        instance_ids = sorted({i for p in preds.values() for i in p[0]})
+        position = {instance_id: row for row, instance_id in enumerate(instance_ids)}
+        resolved = np.zeros((len(instance_ids), len(candidates)), dtype=bool)
+        f2p_ratio = np.zeros(resolved.shape)
+        for column, pred in enumerate(candidates):
+            ids, flags, passed, total = preds[str(pred)]
+            rows = np.array([position[i] for i in ids], dtype=np.int64)
+            passed, total = np.asarray(passed, dtype=float), np.asarray(total, dtype=float)
+            resolved[rows, column] = flags
+            f2p_ratio[rows, column] = np.divide(passed, total, out=np.zeros(len(total)), where=total > 0)
+
+        selected = None
+        if BEST in preds:
+            ids, flags = preds[BEST][0], preds[BEST][1]
+            selected = np.zeros(len(instance_ids), dtype=bool)
+            selected[[position[i] for i in ids if i in position]] = [f for i, f in zip(ids, flags) if i in position]
+        matrices.append(CandidateMatrix(rq, run, model, instance_ids, resolved, f2p_ratio, selected,
+                                        preds=candidates))
+    return matrices
+
+
+def design_table(summary):
+    """The design_table.tex columns for the runs that log a selection step."""
+    import pandas as pd
+
+    rows = summary.dropna(subset=['selected_correct'])
+    return pd.DataFrame({
+        'Model Name': rows['run'].str.replace(r'^logs_', '', regex=True),
+        'Solvable Instances': rows['solvable'],
+        'Optimal Patch Correct Count': rows['selected_correct'].astype(int),
+        'Correct Rate over Solvable (%)': rows['selector_accuracy'] * 100,
+        'Success Rate (Total, %)': rows['success_rate'],
+    })
+
+
+def main():
+    import numpy as np
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Oracle / best-of-k analysis over multi-plan runs.')
+    parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders')
+    parser.add_argument('--output', '-o', default='best_of_k.csv', help='Per-run summary (default: best_of_k.csv)')
+    parser.add_argument('--latex', default='', help='Optional LaTeX table in the design_table.tex layout')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    matrices = load_candidate_matrices(args.root, jobs=args.jobs)
+    if not matrices:
+        print("No runs with pred_<i> candidates found")
+        return
+
+    summary = pd.DataFrame([matrix.summary() for matrix in matrices])
+    summary.to_csv(args.output, index=False)
+
+    columns = ['run', 'k', 'solvable', 'selected_correct', 'selector_accuracy']
+    print(summary[[c for c in columns if c in summary]].to_string(index=False))
+    for matrix in matrices:
+        curve = matrix.oracle_curve()
+        gains = np.diff(curve, prepend=0)
+        print(f"\n=== {matrix.run}: oracle solved / marginal gain per added plan ===")
+        print('  '.join(f"@{j}: {solved} (+{gain})" for j, (solved, gain) in enumerate(zip(curve, gains), start=1)))
+    print(f"\nSummary saved to: {args.output}")
+
+    if args.latex and 'selected_correct' in summary:
+        render(design_table(summary), args.latex,
+               caption="Multi-Model Best Patch Selection Analysis", label="tab:multi_model_analysis")
+        print(f"LaTeX table saved to: {args.latex}")
+
+
+if __name__ == "__main__":
+    main()
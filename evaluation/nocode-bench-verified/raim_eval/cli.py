@@ -0,0 +1,129 @@
+"""
+Single `raim-eval` entry point for the analysis scripts and raim_eval tools.
+
+    python -m raim_eval modtype --discover . --index_path <index> --output_latex merged.tex
+    python -m raim_eval failures --discover . -o failure_analysis.xlsx
+    python -m raim_eval startup --budget_ms 150
+
+Nothing beyond the standard library is imported until a subcommand is
+chosen, and each subcommand only loads its own module, which in turn
+imports numpy / pandas inside the functions that use them. `startup`
+measures that with `python -X importtime` in a fresh interpreter per
+subcommand and exits non-zero when one goes over the budget.
+"""
+import os
+import re
+import sys
+import argparse
+import importlib
+import importlib.util
+
+from .discovery import default_root
+
+# name: (RQ script path or raim_eval module, help)
+COMMANDS = {
+    'modtype': (os.path.join('RQ2', 'analyze_file_modification_types.py'), 'Success rates by file modification type (RQ2)'),
+    'failures': (os.path.join('RQ5', 'parse_failure_analysis.py'), 'Failure type distribution tables (RQ5)'),
+    'batch': ('raim_eval.batch', 'Consolidated table of every discovered run'),
+    'incremental': ('raim_eval.incremental', 'Incrementally rebuild the RQ2/RQ5 tables'),
+    'patch-store': ('raim_eval.patch_store', 'Build or query the packed patch store'),
+    'patch-stats': ('raim_eval.patch_stats', 'Diff statistics for every model patch'),
+    'localization': ('raim_eval.localization', 'File localization accuracy against the gold patch'),
+    'test-outcomes': ('raim_eval.test_outcomes', 'Build or query the P2P/F2P test outcome store'),
+    'fv-metrics': ('raim_eval.fv_metrics', 'FV-Micro / FV-Macro / RT% for any slice'),
+    'best-of-k': ('raim_eval.best_of_k', 'Oracle / best-of-k analysis over multi-plan runs'),
+    'significance': ('raim_eval.significance', 'Bootstrap CIs and paired significance tests'),
+}
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\| ( *)(\S+)')
+
+
+def load_script(relpath):
+    """Import one of the RQ*/ scripts as a module without running its main()."""
+    path = os.path.join(default_root(), relpath)
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_command(name):
+    target = COMMANDS[name][0]
+    return load_script(target) if target.endswith('.py') else importlib.import_module(target)
+
+
+def _import_times(code):
+    """(total microseconds, {top-level module: cumulative microseconds}) for running `code`."""
+    import subprocess
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [default_root(), os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, cwd=default_root())
+    if result.returncode != 0:
+        raise RuntimeError(f"Import failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        # Only top-level imports; nested ones are already in their parent's cumulative time
+        if match and not match.group(3):
+            modules[match.group(4)] = modules.get(match.group(4), 0) + int(match.group(2))
+    return sum(modules.values()), modules
+
+
+def startup_report(commands, budget_ms=None, top=5):
+    """
+    Import cost of each subcommand over a bare interpreter, in milliseconds.
+
+    Returns the names of the subcommands over `budget_ms`.
+    """
+    baseline, baseline_modules = _import_times('pass')
+    over = []
+    print(f"{'command':<14} {'import ms':>9}  heaviest imports")
+    for name in commands:
+        total, modules = _import_times(f'from raim_eval.cli import load_command; load_command({name!r})')
+        cost = (total - baseline) / 1000
+        heaviest = sorted(((us, module) for module, us in modules.items() if module not in baseline_modules), reverse=True)
+        flag = ''
+        if budget_ms is not None and cost > budget_ms:
+            over.append(name)
+            flag = '  OVER BUDGET'
+        print(f"{name:<14} {cost:>9.1f}  " + ', '.join(f"{module} {us / 1000:.0f}" for us, module in heaviest[:top]) + flag)
+    return over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='raim-eval', description='NoCode-bench Verified analysis tools.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text.replace('%', '%%'), add_help=False)
+
+    startup_parser = subparsers.add_parser('startup', help='Report the import time of each subcommand')
+    startup_parser.add_argument('commands', nargs='*', help='Subcommands to measure (default: all)')
+    startup_parser.add_argument('--budget_ms', type=float, default=None,
+                                help='Exit with status 1 if a subcommand imports for longer than this')
+    startup_parser.add_argument('--top', type=int, default=5, help='Heaviest imports to list per subcommand')
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command == 'startup':
+        if rest:
+            parser.error(f"unrecognized arguments: {' '.join(rest)}")
+        unknown = [name for name in args.commands if name not in COMMANDS]
+        if unknown:
+            parser.error(f"unknown subcommands: {', '.join(unknown)}")
+        over = startup_report(args.commands or list(COMMANDS), budget_ms=args.budget_ms, top=args.top)
+        if over:
+            print(f"\nOver the {args.budget_ms:g} ms budget: {', '.join(over)}")
+            sys.exit(1)
+        return
+
+    # Hand the remaining arguments to the subcommand's own parser
+    sys.argv = [f'raim-eval {args.command}'] + argv[argv.index(args.command) + 1:]
+    load_command(args.command).main()
+
+
+if __name__ == "__main__":
+    main()
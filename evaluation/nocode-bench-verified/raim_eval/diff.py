@@ -0,0 +1,54 @@
+def diff_stats(patch):
+    """
+    Single pass over a unified diff.
+
+    Returns the touched files (new path, or old path for deletions), the
+    .py subset, and counts of hunks, added/removed lines and created/deleted
+    files. `+++`/`---` lines are only treated as headers before the first
+    hunk of each file, so content lines starting with them are counted.
+    """
+    files = []
+    new_files = deleted_files = hunks = added = removed = 0
+    in_hunk = False
+    old_path = new_path = None
+
+    def flush():
+        if new_path is not None:
+            files.append(old_path if new_path == '/dev/null' else new_path)
+
+    for line in (patch or '').splitlines():
+        if line.startswith('diff --git '):
+            flush()
+            in_hunk = False
+            parts = line.split(' b/', 1)
+            old_path = parts[0][len('diff --git a/'):]
+            new_path = parts[1] if len(parts) > 1 else old_path
+        elif not in_hunk:
+            if line.startswith('@@'):
+                in_hunk = True
+                hunks += 1
+            elif line.startswith('new file mode'):
+                new_files += 1
+            elif line.startswith('deleted file mode'):
+                deleted_files += 1
+        elif line.startswith('@@'):
+            hunks += 1
+        elif line.startswith('+'):
+            added += 1
+        elif line.startswith('-'):
+            removed += 1
+    flush()
+
+    files = list(dict.fromkeys(files))
+    py_files = [path for path in files if path.endswith('.py')]
+    return {
+        'files': files,
+        'py_files': py_files,
+        'num_files': len(files),
+        'num_py_files': len(py_files),
+        'num_hunks': hunks,
+        'added': added,
+        'removed': removed,
+        'new_files': new_files,
+        'deleted_files': deleted_files,
+    }
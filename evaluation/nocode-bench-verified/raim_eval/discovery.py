@@ -0,0 +1,96 @@
+import os
+import re
+from dataclasses import dataclass
+
+RQ_DIR = re.compile(r'^RQ\d+$')
+RUN_DIR = re.compile(r'^logs_(.+)$')
+PRED_DIR = re.compile(r'^pred_(\d+|best)$')
+KPLANS_FILE = re.compile(r'^eval_kplans_.*_pred_(\d+)\.txt$')
+RESULT_FILE = re.compile(r'^eval_result_.*\.txt$')
+DETAILS_FILE = 'evaluation_details.jsonl'
+
+BEST = 'best'
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """One result file found under an `RQ*/logs_<variant>_<model>/` run directory."""
+    kind: str  # 'eval_result' or 'evaluation_details'
+    rq: str
+    run: str
+    variant: str
+    model: str
+    pred: str  # 'best' for the selected patch, otherwise the candidate index
+    path: str
+
+    @property
+    def method(self):
+        # RQ1 runs have no variant; they are the full RAIM pipeline
+        return self.variant or 'RAIM'
+
+    @property
+    def label(self):
+        """`Method-model` name in the format the RQ2/RQ5 scripts expect."""
+        label = f"{self.method}-{self.model}"
+        return label if self.pred == BEST else f"{label}-pred_{self.pred}"
+
+
+def split_run_name(run):
+    """
+    Split `logs_<variant>_<model>` into (variant, model).
+
+    Model names use hyphens only (e.g. qwen3-235b-a22b-thinking), so the
+    model is everything after the last underscore.
+    """
+    name = RUN_DIR.match(run).group(1)
+    variant, _, model = name.rpartition('_')
+    return variant, model
+
+
+def _scan(path):
+    try:
+        with os.scandir(path) as it:
+            return sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        print(f"Warning: Cannot scan {path}: {e}")
+        return []
+
+
+def _scan_run(rq, run_entry, pred, path, artifacts):
+    variant, model = split_run_name(run_entry.name)
+    for entry in _scan(path):
+        if entry.is_dir(follow_symlinks=False):
+            # Only pred_* directories are descended into; patches/ holds thousands of .diff files
+            match = PRED_DIR.match(entry.name)
+            if match:
+                _scan_run(rq, run_entry, match.group(1), entry.path, artifacts)
+            continue
+
+        if entry.name == DETAILS_FILE:
+            artifacts.append(Artifact('evaluation_details', rq, run_entry.name, variant, model, pred, entry.path))
+        elif KPLANS_FILE.match(entry.name):
+            candidate = KPLANS_FILE.match(entry.name).group(1)
+            artifacts.append(Artifact('eval_result', rq, run_entry.name, variant, model, candidate, entry.path))
+        elif RESULT_FILE.match(entry.name):
+            artifacts.append(Artifact('eval_result', rq, run_entry.name, variant, model, pred, entry.path))
+
+
+def discover_artifacts(root):
+    """
+    Find every eval_result / eval_kplans / evaluation_details file under
+    `root` (the nocode-bench-verified directory) following the
+    `RQ*/logs_<variant>_<model>/[pred_best|pred_<i>/]` layout.
+    Results are sorted by RQ, run and path so output is deterministic.
+    """
+    artifacts = []
+    for rq_entry in _scan(root):
+        if not (rq_entry.is_dir() and RQ_DIR.match(rq_entry.name)):
+            continue
+        for run_entry in _scan(rq_entry.path):
+            if run_entry.is_dir() and RUN_DIR.match(run_entry.name):
+                _scan_run(rq_entry.name, run_entry, BEST, run_entry.path, artifacts)
+    return artifacts
+
+
+def default_root():
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
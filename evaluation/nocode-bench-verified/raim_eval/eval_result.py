@@ -0,0 +1,149 @@
+import re
+from dataclasses import dataclass, field, asdict
+
+from .parallel import parallel_map
+
+FAILURE_SECTION = 'Failure Type Analysis'
+
+# Error categories written by the two versions of the evaluation harness
+TAXONOMIES = {
+    'p2p_f2p': ['regression_p2p', 'new_feature_f2p', 'both_errors'],
+    'localization': ['regression_test', 'file_localization', 'patch_functionality'],
+}
+ERROR_LABELS = {
+    'Regression Errors (P2P)': 'regression_p2p',
+    'New Feature Implementation Errors (F2P)': 'new_feature_f2p',
+    'Both Types of Errors': 'both_errors',
+    'Regression Test Errors': 'regression_test',
+    'File Localization Errors': 'file_localization',
+    'Patch Functionality Errors': 'patch_functionality',
+}
+ERROR_TAXONOMY = {key: name for name, keys in TAXONOMIES.items() for key in keys}
+
+COUNT_PERCENT = re.compile(r'(\d+)\s*\(([\d.]+)%\)')
+PERCENT_RATIO = re.compile(r'([\d.]+)%\s*\((\d+)\s*/\s*(\d+)\)')
+SCORE_RATIO = re.compile(r'([\d.]+)(?:\s*\((\d+)\s*/\s*(\d+)\))?')
+BANNER = re.compile(r'Processed (\d+) instances this run, Total (\d+) instances')
+NUMBERED = re.compile(r'^\d+\.\s*')
+
+
+@dataclass
+class EvalResult:
+    """Everything reported in one eval_result_*.txt / eval_kplans_*.txt file."""
+    path: str
+    processed_instances: int = 0
+    total_instances: int = 0
+    submitted_instances: int = 0
+    applied_count: int = 0
+    applied_percent: float = 0.0
+    success_count: int = 0
+    success_percent: float = 0.0
+    rt_count: int = 0
+    rt_percent: float = 0.0
+    fv_micro: float = 0.0
+    fv_micro_passed: int = 0
+    fv_micro_total: int = 0
+    fv_macro: float = 0.0
+    has_failure_analysis: bool = False
+    failure_taxonomy: str = ''
+    resolved_count: int = 0
+    resolved_percent: float = 0.0
+    failure_count: int = 0
+    failure_percent: float = 0.0
+    # {error key: (count, percent)} for whichever taxonomy the file uses
+    errors: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        row = asdict(self)
+        errors = row.pop('errors')
+        for key in ERROR_TAXONOMY:
+            count, percent = errors.get(key, (0, 0.0))
+            row[f'{key}_count'] = count
+            row[f'{key}_percent'] = percent
+        return row
+
+
+def _set_percent_ratio(result, prefix, value):
+    match = PERCENT_RATIO.search(value)
+    if match:
+        setattr(result, f'{prefix}_percent', float(match.group(1)))
+        setattr(result, f'{prefix}_count', int(match.group(2)))
+
+
+def _set_count_percent(result, prefix, value):
+    match = COUNT_PERCENT.search(value)
+    if match:
+        setattr(result, f'{prefix}_count', int(match.group(1)))
+        setattr(result, f'{prefix}_percent', float(match.group(2)))
+
+
+def parse_eval_result(path):
+    """
+    Parse an evaluation result file in one streaming pass.
+
+    Lines are dispatched on their `Label:` prefix, and the section they are
+    in decides whether they belong to the header metrics or to the
+    Failure Type Analysis block.
+    """
+    result = EvalResult(path=path)
+    in_failure_section = False
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('---'):
+                continue
+            if line == FAILURE_SECTION:
+                in_failure_section = True
+                result.has_failure_analysis = True
+                continue
+            if line.startswith('Evaluation Results'):
+                match = BANNER.search(line)
+                if match:
+                    result.processed_instances = int(match.group(1))
+                continue
+
+            label, sep, value = line.partition(':')
+            if not sep:
+                continue
+            label = label.strip()
+
+            if label == 'Total Instances':
+                result.total_instances = int(value)
+            elif not in_failure_section:
+                if label == 'Submitted Instances':
+                    result.submitted_instances = int(value)
+                elif label == 'Applied%':
+                    _set_percent_ratio(result, 'applied', value)
+                elif label == 'Success%':
+                    _set_percent_ratio(result, 'success', value)
+                elif label == 'Regression Test (RT%)':
+                    _set_percent_ratio(result, 'rt', value)
+                elif label == 'FV-Micro':
+                    match = SCORE_RATIO.search(value)
+                    if match:
+                        result.fv_micro = float(match.group(1))
+                        if match.group(2):
+                            result.fv_micro_passed = int(match.group(2))
+                            result.fv_micro_total = int(match.group(3))
+                elif label == 'FV-Macro':
+                    match = SCORE_RATIO.search(value)
+                    if match:
+                        result.fv_macro = float(match.group(1))
+            elif label == 'Successfully Resolved':
+                _set_count_percent(result, 'resolved', value)
+            elif label == 'Failed to Resolve':
+                _set_count_percent(result, 'failure', value)
+            else:
+                key = ERROR_LABELS.get(NUMBERED.sub('', label))
+                match = COUNT_PERCENT.search(value)
+                if key and match:
+                    result.errors[key] = (int(match.group(1)), float(match.group(2)))
+                    result.failure_taxonomy = ERROR_TAXONOMY[key]
+
+    return result
+
+
+def parse_eval_results(paths, jobs=1):
+    """Parse many result files, in a process pool when `jobs` > 1; keeps the input order."""
+    return parallel_map(parse_eval_result, paths, jobs=jobs)
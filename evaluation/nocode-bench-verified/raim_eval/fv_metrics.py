@@ -0,0 +1,129 @@
+"""
+Recompute FV-Micro, FV-Macro and RT% from the per-test P2P / F2P outcomes
+for any slice of instances (repository, single- vs multi-file, patch size)
+and any set of runs / pred indices.
+
+    python -m raim_eval.fv_metrics test_outcomes.npz --by repository
+    python -m raim_eval.fv_metrics test_outcomes.npz --by modification_type --index_path <index> --pred best
+
+Definitions follow the eval_result_*.txt header, which they reproduce:
+    FV-Micro  passed F2P tests / all F2P tests, summed over the instances
+    FV-Macro  mean over instances of passed F2P tests / F2P tests
+    RT%       instances with no failing P2P test / instances
+Every instance of a slice counts, including ones a run never attempted.
+Their F2P tests count as not passed, but their P2P tests are not
+regressions: only P2P tests that actually ran and failed are.
+"""
+import argparse
+
+from .aggregate import GROUP_KEYS, instance_frame
+from .test_outcomes import RUN_COLUMNS, TestOutcomes
+
+METRIC_COLUMNS = ['instances', 'fv_micro_passed', 'fv_micro_total', 'fv_micro', 'fv_macro', 'rt_count', 'rt_percent']
+
+
+def instance_groups(instance_ids, instance_index=None):
+    """Grouping keys for the store's instances; only 'repository' is available without an index."""
+    import pandas as pd
+
+    frame = pd.DataFrame({'instance_id': instance_ids})
+    frame['repository'] = frame['instance_id'].str.split('__', n=1).str[0]
+    if instance_index is not None:
+        keys = instance_frame(instance_index).drop(columns='repository')
+        frame = frame.merge(keys, on='instance_id', how='left')
+    return frame
+
+
+def feature_validation_metrics(store, groups=None, by=None, runs=None):
+    """
+    One row per (run, group) with the FV / RT metrics.
+
+    The per-instance counts come from two bincounts over the store; slicing
+    by group is then a (runs x instances) @ (instances x groups) product, so
+    every run and every group is computed at once. `runs` is an optional
+    boolean mask over store.runs.
+    """
+    import numpy as np
+    import pandas as pd
+
+    f2p_passed, f2p_total = store.instance_counts('F2P')
+    # Unattempted P2P tests are not failures, so RT only looks at the tests that ran
+    p2p_passed, p2p_ran = store.instance_counts('P2P', mask=store.attempted)
+
+    if by is None:
+        codes, labels = np.zeros(len(store.instance_ids), dtype=np.int64), np.array(['all'], dtype=object)
+    else:
+        column = groups.set_index('instance_id')[by].reindex(store.instance_ids)
+        codes, labels = pd.factorize(column, sort=True)
+        labels = np.asarray(labels, dtype=object)
+    # Instances outside the index get code -1 and are left out of every group
+    membership = np.zeros((len(store.instance_ids), len(labels)))
+    inside = codes >= 0
+    membership[np.flatnonzero(inside), codes[inside]] = 1.0
+
+    ratio = np.divide(f2p_passed, f2p_total, out=np.zeros(f2p_passed.shape), where=f2p_total > 0)
+    regression_free = (p2p_passed == p2p_ran).astype(float)
+
+    instances = membership.sum(axis=0)
+    micro_passed = f2p_passed @ membership
+    micro_total = f2p_total @ membership
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'instances': np.broadcast_to(instances, micro_total.shape),
+            'fv_micro_passed': micro_passed,
+            'fv_micro_total': micro_total,
+            'fv_micro': np.where(micro_total > 0, micro_passed / micro_total, 0.0),
+            'fv_macro': np.where(instances > 0, (ratio @ membership) / instances, 0.0),
+            'rt_count': regression_free @ membership,
+        }
+    metrics['rt_percent'] = np.where(instances > 0, metrics['rt_count'] / instances * 100, 0.0)
+
+    selected = np.ones(len(store.runs), dtype=bool) if runs is None else np.asarray(runs, dtype=bool)
+    table = store.runs.loc[selected, RUN_COLUMNS]
+    table = table.loc[table.index.repeat(len(labels))].reset_index(drop=True)
+    table[by or 'group'] = np.tile(labels, selected.sum())
+    for name in METRIC_COLUMNS:
+        table[name] = metrics[name][selected].reshape(-1)
+    for name in ('instances', 'fv_micro_passed', 'fv_micro_total', 'rt_count'):
+        table[name] = table[name].astype(int)
+    return table
+
+
+def main():
+    import numpy as np
+
+    from .instance_index import load_instance_index
+
+    parser = argparse.ArgumentParser(description='Recompute FV-Micro / FV-Macro / RT% from per-test outcomes.')
+    parser.add_argument('store', help='Test outcome store built with `python -m raim_eval.test_outcomes build`')
+    parser.add_argument('--by', choices=GROUP_KEYS, default=None, help='Slice the instances by this key (default: no slicing)')
+    parser.add_argument('--data_path', default='', help='NoCode-bench Verified dataset, needed for every key except repository')
+    parser.add_argument('--index_path', default='', help='Cached instance index to use instead of --data_path')
+    parser.add_argument('--pred', nargs='*', default=None, help="Only these pred indices, e.g. best 0 1")
+    parser.add_argument('--rq', nargs='*', default=None, help='Only these RQ folders, e.g. RQ1 RQ4')
+    parser.add_argument('--output', '-o', default='', help='Optional CSV output')
+    args = parser.parse_args()
+
+    instance_index = None
+    if args.by not in (None, 'repository'):
+        if not (args.data_path or args.index_path):
+            parser.error(f'--data_path or --index_path is required for --by {args.by}')
+        instance_index = load_instance_index(args.data_path, index_path=args.index_path or None)
+
+    store = TestOutcomes.load(args.store)
+    runs = np.ones(len(store.runs), dtype=bool)
+    if args.pred is not None:
+        runs &= store.runs['pred'].isin(args.pred).to_numpy()
+    if args.rq is not None:
+        runs &= store.runs['rq'].isin(args.rq).to_numpy()
+
+    table = feature_validation_metrics(store, instance_groups(store.instance_ids, instance_index), by=args.by, runs=runs)
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Metrics for {runs.sum()} runs saved to: {args.output}")
+    else:
+        print(table.round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
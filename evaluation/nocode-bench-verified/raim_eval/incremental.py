@@ -0,0 +1,225 @@
+"""
+Incrementally rebuild the RQ2 / RQ5 tables and the consolidated results table.
+
+A manifest in the output directory records the content hash and the parsed
+result of every input file, and the input hashes each output was rendered
+from. Only new or modified eval_result / evaluation_details files are
+re-parsed, and only outputs whose inputs changed are re-rendered. The source
+of the modules that parse the inputs and render each output counts as an
+input too, so a change to the parsing or table code invalidates what it
+produced.
+
+    python -m raim_eval.incremental --out_dir build --data_path /path/to/NoCode-bench_Verified_test
+"""
+import os
+import json
+import hashlib
+import argparse
+from dataclasses import asdict
+
+from .cli import load_script
+from .discovery import BEST, default_root, discover_artifacts
+from .eval_result import EvalResult, parse_eval_result
+from .parallel import parallel_map
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = '.raim_eval_manifest.json'
+
+# Source files (relative to the evaluation directory) whose code produces the parsed inputs and each target
+PARSER_SOURCES = ['raim_eval/eval_result.py', 'raim_eval/loader.py']
+TARGET_SOURCES = {
+    'failures': ['RQ5/parse_failure_analysis.py', 'raim_eval/render.py'],
+    'summary': ['raim_eval/batch.py', 'raim_eval/render.py'],
+    'modtype': ['RQ2/analyze_file_modification_types.py', 'raim_eval/aggregate.py', 'raim_eval/render.py'],
+}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_digest(sources):
+    """Content hash of the given source files, so outputs are rebuilt when the code that made them changes."""
+    digest = hashlib.sha1()
+    for source in sources:
+        digest.update(source.encode() + b'\0' + file_digest(os.path.join(default_root(), *source.split('/'))).encode())
+    return digest.hexdigest()
+
+
+def _parse_artifact(job):
+    kind, path = job
+    if kind == 'eval_result':
+        parsed = asdict(parse_eval_result(path))
+        parsed.pop('path')
+        return parsed
+
+    from .loader import load_evaluation_details
+    table = load_evaluation_details(path)
+    return {
+        'resolved_map': table.resolved_map(),
+        'counts': {
+            'instances': len(table),
+            'resolved': int(table.resolved.sum()),
+            'applied': int(table.applied.sum()),
+        },
+    }
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Unreadable manifest {path}, starting from scratch: {e}")
+    return {'version': MANIFEST_VERSION, 'parser': None, 'files': {}, 'targets': {}}
+
+
+def save_manifest(path, manifest):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def refresh_files(manifest, artifacts, root, jobs=1):
+    """
+    Bring manifest['files'] up to date with the artifacts on disk.
+
+    Files whose size and mtime are unchanged are trusted as-is; otherwise the
+    content hash decides whether the file has to be re-parsed. Every file is
+    re-parsed when the parser code changed. Returns the relative paths that
+    were (re)parsed.
+    """
+    parser = code_digest(PARSER_SOURCES)
+    old_files = manifest['files'] if manifest.get('parser') == parser else {}
+    manifest['parser'] = parser
+    files = {}
+    to_parse = []
+
+    for artifact in artifacts:
+        rel = os.path.relpath(artifact.path, root)
+        st = os.stat(artifact.path)
+        entry = old_files.get(rel)
+        if entry and entry['kind'] == artifact.kind and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            files[rel] = entry
+            continue
+
+        sha1 = file_digest(artifact.path)
+        if entry and entry['kind'] == artifact.kind and entry['sha1'] == sha1:
+            files[rel] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            continue
+
+        files[rel] = {'kind': artifact.kind, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': sha1, 'parsed': None}
+        to_parse.append((rel, artifact))
+
+    parsed = parallel_map(_parse_artifact, [(a.kind, a.path) for _, a in to_parse], jobs=jobs)
+    for (rel, _), result in zip(to_parse, parsed):
+        files[rel]['parsed'] = result
+
+    manifest['files'] = files
+    return [rel for rel, _ in to_parse]
+
+
+def render_failures(root, files, inputs, outputs):
+    script = load_script(os.path.join('RQ5', 'parse_failure_analysis.py'))
+    pairs = [(artifact.label, artifact.path) for artifact in inputs]
+    parsed = [EvalResult(path=artifact.path, **files[os.path.relpath(artifact.path, root)]['parsed'])
+              for artifact in inputs]
+    data = script.failure_rows(pairs, parsed)
+    if data:
+        script.write_failure_tables(data, outputs[0])
+
+
+def render_modtype(root, files, inputs, outputs, instance_index):
+    script = load_script(os.path.join('RQ2', 'analyze_file_modification_types.py'))
+    method_results = {artifact.label: files[os.path.relpath(artifact.path, root)]['parsed']['resolved_map']
+                      for artifact in inputs}
+    df, breakdowns = script.success_tables(instance_index, method_results)
+    script.write_tables(df, breakdowns, [], outputs[0], outputs[1])
+
+
+def render_summary(root, files, inputs, outputs):
+    from .batch import summary_frame, write_table
+
+    results, details = [], []
+    for artifact in inputs:
+        parsed = files[os.path.relpath(artifact.path, root)]['parsed']
+        if artifact.kind == 'eval_result':
+            results.append((artifact, EvalResult(path=artifact.path, **parsed)))
+        else:
+            details.append((artifact, parsed['counts']))
+    write_table(summary_frame(root, results, details), outputs[0])
+
+
+def build(root, out_dir, data_path='', index_path='', jobs=1, force=False):
+    """Re-parse changed inputs and re-render the outputs that depend on them."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    artifacts = discover_artifacts(root)
+    parsed = refresh_files(manifest, artifacts, root, jobs=jobs)
+    print(f"{len(artifacts)} input files, {len(parsed)} new or modified")
+    files = manifest['files']
+
+    best_results = [a for a in artifacts if a.kind == 'eval_result' and a.pred == BEST]
+    best_details = [a for a in artifacts if a.kind == 'evaluation_details' and a.pred == BEST]
+    targets = {
+        'failures': (best_results, [os.path.join(out_dir, 'failure_analysis.xlsx'),
+                                    os.path.join(out_dir, 'failure_analysis.tex')], render_failures, {}),
+        'summary': (artifacts, [os.path.join(out_dir, 'all_results.csv')], render_summary, {}),
+    }
+
+    extra_signature = {}
+    if data_path or index_path:
+        from .instance_index import default_index_path, load_instance_index
+        instance_index = load_instance_index(data_path, index_path=index_path or None)
+        index_file = index_path or default_index_path(data_path)
+        extra_signature['modtype'] = {'<instance_index>': file_digest(index_file)}
+        targets['modtype'] = (best_details, [os.path.join(out_dir, 'file_modification_stats.xlsx'),
+                                             os.path.join(out_dir, 'file_modification_stats.tex')],
+                              render_modtype, {'instance_index': instance_index})
+    else:
+        print("Skipping modtype tables: pass --data_path or --index_path to build them")
+
+    for name, (inputs, outputs, render, kwargs) in targets.items():
+        signature = {os.path.relpath(a.path, root): files[os.path.relpath(a.path, root)]['sha1'] for a in inputs}
+        signature.update(extra_signature.get(name, {}))
+        signature['<code>'] = code_digest(PARSER_SOURCES + TARGET_SOURCES[name])
+        previous = manifest['targets'].get(name)
+        up_to_date = (previous is not None and previous['inputs'] == signature
+                      and previous['outputs'] == outputs and all(os.path.exists(o) for o in outputs))
+        if up_to_date and not force:
+            print(f"{name}: up to date")
+            continue
+
+        print(f"{name}: rendering {', '.join(outputs)}")
+        render(root, files, inputs, outputs, **kwargs)
+        manifest['targets'][name] = {'inputs': signature, 'outputs': outputs}
+
+    save_manifest(manifest_path, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally rebuild the RQ2/RQ5 tables from the evaluation logs.')
+    parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders (default: evaluation/nocode-bench-verified)')
+    parser.add_argument('--out_dir', default='build', help='Directory for the generated tables and the manifest (default: build)')
+    parser.add_argument('--data_path', default='', help='NoCode-bench Verified dataset, needed for the modification-type table')
+    parser.add_argument('--index_path', default='', help='Cached instance index to use instead of --data_path')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-render every output even if its inputs are unchanged')
+    args = parser.parse_args()
+
+    build(args.root, args.out_dir, data_path=args.data_path, index_path=args.index_path,
+          jobs=args.jobs, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
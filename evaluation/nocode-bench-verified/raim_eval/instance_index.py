@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import hashlib
+
+from .diff import diff_stats
+
+# Bump when the index layout or the labelling rules change
+INDEX_VERSION = 5
+INDEX_SUFFIX = '.instance_index.json'
+
+FILE_PATTERN = re.compile(r'diff --git a/([^\s]+) b/([^\s]+)')
+
+
+def parse_feature_patch(feature_patch):
+    """Return the .py files touched by a unified diff (from its `diff --git` headers)."""
+    if not feature_patch:
+        return []
+
+    python_files = set()
+    for old_path, new_path in FILE_PATTERN.findall(feature_patch):
+        if old_path.endswith('.py'):
+            python_files.add(old_path)
+        if new_path.endswith('.py'):
+            python_files.add(new_path)
+
+    return list(python_files)
+
+
+def modification_type(py_files):
+    # Patches without any .py file are counted as single-file, as in the original RQ2 analysis
+    return 'multi_file' if len(py_files) > 1 else 'single_file'
+
+
+def summarize_instance(feature_patch):
+    py_files = sorted(parse_feature_patch(feature_patch))
+    stats = diff_stats(feature_patch)
+    return {
+        'files': py_files,
+        'type': modification_type(py_files),
+        'num_files': len(py_files),
+        'num_hunks': stats['num_hunks'],
+        'num_lines': stats['added'] + stats['removed'],
+        'num_added': stats['added'],
+        'num_removed': stats['removed'],
+        'new_files': stats['new_files'],
+        # Extracted like the model patches in patch_stats / localization (new paths, old path for deletions)
+        'changed_py_files': stats['py_files'],
+        'num_changed_files': stats['num_files'],
+        'num_py_changed_files': stats['num_py_files'],
+        'deleted_files': stats['deleted_files'],
+    }
+
+
+def dataset_fingerprint(data_path):
+    """
+    Fingerprint of a dataset saved with `save_to_disk`, read without importing `datasets`.
+
+    Uses the `_fingerprint` recorded in state.json and falls back to the
+    names, sizes and mtimes of the files in the directory.
+    """
+    state_path = os.path.join(data_path, 'state.json')
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            fingerprint = json.load(f).get('_fingerprint')
+        if fingerprint:
+            return fingerprint
+
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(data_path)):
+        for name in sorted(files):
+            st = os.stat(os.path.join(root, name))
+            digest.update(f"{os.path.relpath(os.path.join(root, name), data_path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def default_index_path(data_path):
+    return os.path.normpath(data_path) + INDEX_SUFFIX
+
+
+def build_instance_index(data_path):
+    """Scan the dataset once and summarize every instance's gold feature_patch."""
+    from datasets import load_from_disk
+
+    print(f"Loading dataset from: {data_path}")
+    dataset = load_from_disk(data_path)
+    print(f"Total instances: {len(dataset)}")
+
+    instances = {}
+    for instance_id, feature_patch in zip(dataset['instance_id'], dataset['feature_patch']):
+        instances[instance_id] = summarize_instance(feature_patch)
+    return instances
+
+
+def _read_index(index_path, fingerprint):
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Unreadable instance index {index_path}, rebuilding: {e}")
+        return None
+
+    if index.get('version') != INDEX_VERSION:
+        return None
+    if fingerprint is not None and index.get('fingerprint') != fingerprint:
+        return None
+    return index['instances']
+
+
+def _write_index(index_path, fingerprint, instances):
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'fingerprint': fingerprint, 'instances': instances},
+                      f, separators=(',', ':'))
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"Warning: Could not write instance index {index_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_instance_index(data_path, index_path=None, rebuild=False):
+    """
+    Return {instance_id: {'files', 'type', 'num_files', 'num_hunks', 'num_lines', ...}}.
+
+    The index is stored as JSON (default: `<data_path>.instance_index.json`)
+    and reused while its version and the dataset fingerprint match, so
+    `datasets` is only imported when the index has to be (re)built.
+    """
+    index_path = index_path or default_index_path(data_path)
+
+    if not os.path.isdir(data_path):
+        # Dataset not available locally: fall back to an index built elsewhere
+        instances = None if rebuild else _read_index(index_path, fingerprint=None)
+        if instances is None:
+            raise FileNotFoundError(f"Dataset {data_path} not found and no usable index at {index_path}")
+        print(f"Loaded instance index from: {index_path}")
+        return instances
+
+    fingerprint = dataset_fingerprint(data_path)
+    if not rebuild:
+        instances = _read_index(index_path, fingerprint)
+        if instances is not None:
+            print(f"Loaded instance index from: {index_path}")
+            return instances
+
+    instances = build_instance_index(data_path)
+    _write_index(index_path, fingerprint, instances)
+    print(f"Instance index saved to: {index_path}")
+    return instances
@@ -0,0 +1,202 @@
+import os
+import json
+
+from .parallel import parallel_map
+
+# Bump when the sidecar layout changes so stale caches are rebuilt
+SIDECAR_VERSION = '1'
+SIDECAR_SUFFIX = '.arrow'
+
+
+class EvaluationTable:
+    """
+    Columnar view of one evaluation_details.jsonl file.
+
+    Only the small per-instance fields are kept in memory. The bulky
+    `model_patch`, `P2P` and `F2P` payloads are read back from the source
+    file on demand through the byte offset of each line.
+    """
+
+    def __init__(self, path, instance_ids, resolved, applied, offsets, lengths):
+        import numpy as np
+
+        self.path = path
+        self.instance_ids = list(instance_ids)
+        self.resolved = np.asarray(resolved, dtype=bool)
+        self.applied = np.asarray(applied, dtype=bool)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self._index = {instance_id: i for i, instance_id in enumerate(self.instance_ids)}
+
+    def __len__(self):
+        return len(self.instance_ids)
+
+    def __contains__(self, instance_id):
+        return instance_id in self._index
+
+    def resolved_map(self):
+        """Return {instance_id: resolved}, the shape the RQ2 script works with."""
+        return dict(zip(self.instance_ids, self.resolved.tolist()))
+
+    def record(self, instance_id):
+        """Load the full JSON record of one instance from the source file."""
+        i = self._index[instance_id]
+        with open(self.path, 'rb') as f:
+            f.seek(int(self.offsets[i]))
+            return json.loads(f.read(int(self.lengths[i])))
+
+    def iter_records(self):
+        """Yield (instance_id, record) pairs in a single sequential read."""
+        import numpy as np
+
+        order = np.argsort(self.offsets, kind='stable')
+        with open(self.path, 'rb') as f:
+            for i in order:
+                f.seek(int(self.offsets[i]))
+                yield self.instance_ids[i], json.loads(f.read(int(self.lengths[i])))
+
+    def model_patch(self, instance_id):
+        return self.record(instance_id).get('model_patch') or ''
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return {'mtime_ns': str(st.st_mtime_ns), 'size': str(st.st_size)}
+
+
+def parse_evaluation_details(path):
+    """
+    Stream an evaluation_details.jsonl file once and build an EvaluationTable.
+
+    Later records for the same instance override earlier ones, matching the
+    dict-based loading the analysis scripts used before.
+    """
+    positions = {}
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            length = len(line)
+            if line.strip():
+                try:
+                    obj = json.loads(line)
+                    positions[obj['instance_id']] = (bool(obj['resolved']), bool(obj.get('applied', False)),
+                                                     offset, length)
+                except Exception as e:
+                    print(f"Error parsing line at byte {offset} of {path}")
+                    print(f"Error: {e}")
+            offset += length
+
+    instance_ids = list(positions)
+    columns = list(zip(*positions.values())) or [(), (), (), ()]
+    return EvaluationTable(path, instance_ids, *columns)
+
+
+def _sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+def _read_sidecar(path):
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+
+    sidecar = _sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+
+    try:
+        table = feather.read_table(sidecar, memory_map=True)
+    except Exception as e:
+        print(f"Warning: Unreadable cache {sidecar}, rebuilding: {e}")
+        return None
+
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    expected = dict(_source_key(path), version=SIDECAR_VERSION)
+    if any(meta.get(k) != v for k, v in expected.items()):
+        return None
+
+    return EvaluationTable(
+        path,
+        table.column('instance_id').to_pylist(),
+        table.column('resolved').to_numpy(),
+        table.column('applied').to_numpy(),
+        table.column('offset').to_numpy(),
+        table.column('length').to_numpy(),
+    )
+
+
+def _write_sidecar(table):
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return
+
+    metadata = dict(_source_key(table.path), version=SIDECAR_VERSION)
+    arrow_table = pa.table({
+        'instance_id': pa.array(table.instance_ids, type=pa.string()),
+        'resolved': pa.array(table.resolved, type=pa.bool_()),
+        'applied': pa.array(table.applied, type=pa.bool_()),
+        'offset': pa.array(table.offsets, type=pa.int64()),
+        'length': pa.array(table.lengths, type=pa.int64()),
+    }).replace_schema_metadata(metadata)
+
+    sidecar = _sidecar_path(table.path)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(arrow_table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        print(f"Warning: Could not write cache {sidecar}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_evaluation_details(path, use_cache=True):
+    """
+    Load an evaluation_details.jsonl file as an EvaluationTable.
+
+    With `use_cache`, the table is stored in an Arrow sidecar next to the
+    source file (`evaluation_details.jsonl.arrow`) keyed by the source mtime
+    and size, so repeat runs skip JSON parsing entirely. The sidecar is only
+    used when pyarrow is available.
+    """
+    if use_cache:
+        table = _read_sidecar(path)
+        if table is not None:
+            return table
+
+    table = parse_evaluation_details(path)
+    if use_cache:
+        _write_sidecar(table)
+    return table
+
+
+def _load_resolved_map(job):
+    name, path, use_cache = job
+    return name, load_evaluation_details(path, use_cache=use_cache).resolved_map()
+
+
+def load_resolved_maps(result_files, jobs=1, use_cache=True):
+    """
+    Load {method_name: {instance_id: resolved}} for (name, path) pairs.
+
+    With `jobs` > 1 the files are parsed in a process pool. The returned dict
+    always follows the order of `result_files`, and falls back to serial
+    loading if the pool cannot be started.
+    """
+    pending = []
+    for name, path in result_files:
+        if not os.path.exists(path):
+            print(f"Warning: File {path} does not exist, skipping")
+            continue
+        pending.append((name, path, use_cache))
+
+    loaded = parallel_map(_load_resolved_map, pending, jobs=jobs)
+
+    method_results = {}
+    for name, instance_results in loaded:
+        method_results[name] = instance_results
+        print(f"- Loaded {len(instance_results)} results for method: {name}")
+    return method_results
@@ -0,0 +1,133 @@
+"""
+File-localization accuracy: files touched by each model patch against the
+.py files of the gold feature_patch, for every discovered run at once.
+
+    python -m raim_eval.localization --index_path /path/to/NoCode-bench_Verified_test.instance_index.json
+"""
+import os
+import argparse
+
+from .diff import diff_stats
+from .discovery import default_root, discover_artifacts
+from .patch_store import default_prefix, run_patches
+from .parallel import parallel_map
+
+TOP_K = (1, 3, 5)
+
+
+def _run_files(job):
+    """Long (instance_id, file, rank) rows for the .py files of one run's model patches."""
+    artifact, prefix = job
+
+    rows = {'instance_id': [], 'file': [], 'rank': []}
+    for instance_id, body in run_patches(artifact, prefix):
+        # Rank is the order in which the patch touches the files
+        for rank, path in enumerate(diff_stats(body.decode('utf-8', errors='replace'))['py_files']):
+            rows['instance_id'].append(instance_id)
+            rows['file'].append(path)
+            rows['rank'].append(rank)
+    return {'rq': artifact.rq, 'run': artifact.run, 'model': artifact.model, 'pred': artifact.pred, **rows}
+
+
+def model_file_frame(root, jobs=1, patch_store=None):
+    import pandas as pd
+
+    prefix = patch_store or default_prefix(root)
+    artifacts = [a for a in discover_artifacts(root) if a.kind == 'evaluation_details']
+    frames = [pd.DataFrame(run) for run in parallel_map(_run_files, [(a, prefix) for a in artifacts], jobs=jobs)]
+    runs = pd.DataFrame([{'rq': a.rq, 'run': a.run, 'model': a.model, 'pred': a.pred} for a in artifacts])
+    files = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['rq', 'run', 'model', 'pred', 'instance_id', 'file', 'rank'])
+    return runs, files
+
+
+def gold_file_frame(instance_index):
+    import pandas as pd
+
+    # Same path extraction as the model side (diff_stats), so a renamed file is its new path on both
+    gold = pd.DataFrame([(instance_id, path) for instance_id, info in instance_index.items()
+                         for path in info['changed_py_files']],
+                        columns=['instance_id', 'file'])
+    return gold
+
+
+def localization_scores(runs, model_files, gold_files, top_k=TOP_K):
+    """
+    Per-instance localization scores for every run.
+
+    All set operations are joins on (instance_id, file): the intersection
+    size is the group size of the inner join, and hit@k checks the smallest
+    rank among the correctly predicted files. Every (run, gold instance)
+    pair is scored, so instances with no or empty patches count as misses.
+    """
+    keys = ['rq', 'run', 'pred']
+    gold_counts = gold_files.groupby('instance_id').size().rename('num_gold')
+
+    grid = runs[keys + ['model']].merge(gold_counts.reset_index(), how='cross')
+
+    predicted = model_files.groupby(keys + ['instance_id']).size().rename('num_predicted')
+    correct = model_files.merge(gold_files, on=['instance_id', 'file'], how='inner')
+    hits = correct.groupby(keys + ['instance_id']).agg(num_correct=('file', 'size'), best_rank=('rank', 'min'))
+
+    scores = grid.join(predicted, on=keys + ['instance_id']).join(hits, on=keys + ['instance_id'])
+    scores[['num_predicted', 'num_correct']] = scores[['num_predicted', 'num_correct']].fillna(0).astype(int)
+
+    scores['recall'] = scores['num_correct'] / scores['num_gold']
+    scores['precision'] = (scores['num_correct'] / scores['num_predicted'].where(scores['num_predicted'] > 0)).fillna(0.0)
+    scores['exact_match'] = (scores['num_correct'] == scores['num_gold']) & (scores['num_predicted'] == scores['num_gold'])
+    for k in top_k:
+        scores[f'hit@{k}'] = scores['best_rank'] < k
+    return scores.drop(columns='best_rank')
+
+
+def summarize_localization(scores, top_k=TOP_K):
+    """Per-run macro recall/precision, micro recall/precision and hit@k rates."""
+    keys = ['rq', 'run', 'model', 'pred']
+    summary = scores.groupby(keys, sort=True).agg(
+        instances=('instance_id', 'size'),
+        recall=('recall', 'mean'),
+        precision=('precision', 'mean'),
+        exact_match=('exact_match', 'mean'),
+        num_correct=('num_correct', 'sum'),
+        num_predicted=('num_predicted', 'sum'),
+        num_gold=('num_gold', 'sum'),
+        **{f'hit@{k}': (f'hit@{k}', 'mean') for k in top_k},
+    )
+    summary['micro_recall'] = summary['num_correct'] / summary['num_gold']
+    summary['micro_precision'] = summary['num_correct'] / summary['num_predicted'].where(summary['num_predicted'] > 0)
+    return summary.reset_index()
+
+
+def main():
+    from .instance_index import load_instance_index
+
+    parser = argparse.ArgumentParser(description='Compare files touched by model patches with the gold feature_patch files.')
+    parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders')
+    parser.add_argument('--data_path', default='', help='NoCode-bench Verified dataset (used to build the instance index)')
+    parser.add_argument('--index_path', default='', help='Cached instance index (default: <data_path>.instance_index.json)')
+    parser.add_argument('--output', '-o', default='localization.csv', help='Per-run summary (default: localization.csv)')
+    parser.add_argument('--instances_output', default='', help='Optional per-instance scores table')
+    parser.add_argument('--patch_store', default='',
+                        help='Packed patch store prefix (default: <root>/patches; the patches/*.diff files are read if it is missing)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    if not (args.data_path or args.index_path):
+        parser.error('--data_path or --index_path is required for the gold files')
+
+    instance_index = load_instance_index(args.data_path, index_path=args.index_path or None)
+    runs, model_files = model_file_frame(args.root, jobs=args.jobs, patch_store=args.patch_store)
+    scores = localization_scores(runs, model_files, gold_file_frame(instance_index))
+
+    if args.instances_output:
+        scores.to_csv(args.instances_output, index=False)
+        print(f"Per-instance scores saved to: {args.instances_output}")
+
+    summary = summarize_localization(scores)
+    summary.to_csv(args.output, index=False)
+    print(summary.drop(columns=['num_correct', 'num_predicted', 'num_gold']).round(4).to_string(index=False))
+    print(f"\nLocalization summary saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
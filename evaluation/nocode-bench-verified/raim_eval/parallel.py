@@ -0,0 +1,16 @@
+def parallel_map(func, items, jobs=1):
+    """
+    Map a picklable top-level `func` over `items`, keeping the input order.
+
+    Uses a process pool when `jobs` > 1 and there is more than one item,
+    and falls back to a serial map if the pool cannot be started.
+    """
+    items = list(items)
+    if jobs > 1 and len(items) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+                return list(pool.map(func, items, chunksize=max(1, len(items) // (jobs * 4))))
+        except (OSError, RuntimeError) as e:
+            print(f"Warning: Parallel processing failed, falling back to serial: {e}")
+    return [func(item) for item in items]
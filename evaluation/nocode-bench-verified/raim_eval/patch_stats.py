@@ -0,0 +1,130 @@
+"""
+Unified-diff statistics (files, hunks, added/removed lines, new files) for
+gold and model patches, computed in bulk over every discovered run.
+
+    python -m raim_eval.patch_stats --index_path <index> -o patch_stats.csv -j 8
+"""
+import os
+import argparse
+
+from .aggregate import PATCH_SIZE_BINS, PATCH_SIZE_LABELS
+from .diff import diff_stats
+from .discovery import default_root, discover_artifacts
+from .patch_store import default_prefix, run_patches
+from .parallel import parallel_map
+
+STAT_COLUMNS = ['num_files', 'num_py_files', 'num_hunks', 'added', 'removed', 'new_files', 'deleted_files']
+
+
+def _run_stats(job):
+    """Stats and resolved flags for every patch of one run (executed in a worker)."""
+    from .loader import load_evaluation_details
+
+    artifact, prefix = job
+    resolved = load_evaluation_details(artifact.path).resolved_map()
+    instance_ids = []
+    columns = {name: [] for name in STAT_COLUMNS}
+    for instance_id, body in run_patches(artifact, prefix):
+        stats = diff_stats(body.decode('utf-8', errors='replace'))
+        instance_ids.append(instance_id)
+        for name in STAT_COLUMNS:
+            columns[name].append(stats[name])
+
+    # Instances without a patch are kept with zero counts so resolve rates stay comparable
+    seen = set(instance_ids)
+    missing = [instance_id for instance_id in resolved if instance_id not in seen]
+    instance_ids += missing
+    for name in STAT_COLUMNS:
+        columns[name] += [0] * len(missing)
+
+    return {
+        'rq': artifact.rq, 'run': artifact.run, 'model': artifact.model, 'pred': artifact.pred,
+        'instance_id': instance_ids,
+        'resolved': [bool(resolved.get(instance_id, False)) for instance_id in instance_ids],
+        **columns,
+    }
+
+
+def model_patch_stats(root, jobs=1, patch_store=None):
+    """One row per (run, pred, instance_id) with the diff stats of the model patch and its resolved flag."""
+    import pandas as pd
+
+    prefix = patch_store or default_prefix(root)
+    artifacts = [a for a in discover_artifacts(root) if a.kind == 'evaluation_details']
+    frames = [pd.DataFrame(run) for run in parallel_map(_run_stats, [(a, prefix) for a in artifacts], jobs=jobs)]
+    if not frames:
+        return pd.DataFrame(columns=['rq', 'run', 'model', 'pred', 'instance_id', 'resolved'] + STAT_COLUMNS)
+    return with_derived_columns(pd.concat(frames, ignore_index=True))
+
+
+def gold_patch_stats(instance_index):
+    """
+    Same columns for the gold feature_patch, from the cached instance index, as
+    run 'gold' with an empty resolved flag.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame.from_dict(instance_index, orient='index')
+    frame.index.name = 'instance_id'
+    frame = frame.reset_index()
+    frame = frame.drop(columns=['num_files']).rename(columns={
+        'num_changed_files': 'num_files', 'num_py_changed_files': 'num_py_files',
+        'num_added': 'added', 'num_removed': 'removed'})
+    frame = frame.assign(rq='', run='gold', model='gold', pred='gold', resolved=pd.NA)
+    return with_derived_columns(frame[['rq', 'run', 'model', 'pred', 'instance_id', 'resolved'] + STAT_COLUMNS])
+
+
+def with_derived_columns(frame):
+    import pandas as pd
+
+    frame = frame.copy()
+    frame['changed'] = frame['added'] + frame['removed']
+    frame['cross_file'] = frame['num_py_files'] > 1
+    frame['creates_file'] = frame['new_files'] > 0
+    frame['patch_size'] = pd.cut(frame['changed'], bins=PATCH_SIZE_BINS, labels=PATCH_SIZE_LABELS)
+    return frame
+
+
+def resolve_breakdown(stats, by=('patch_size', 'cross_file')):
+    """Resolve rate per (run, pred) and each key in `by`, in one groupby per key."""
+    tables = {}
+    for key in by:
+        table = stats.groupby(['rq', 'run', 'pred', key], observed=True, sort=True)['resolved'].agg(
+            total='size', resolved='sum')
+        table['rate'] = table['resolved'] / table['total']
+        tables[key] = table.reset_index()
+    return tables
+
+
+def main():
+    import pandas as pd
+    from .instance_index import load_instance_index
+
+    parser = argparse.ArgumentParser(description='Compute diff statistics for the gold patches and every model patch in the results tree.')
+    parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders')
+    parser.add_argument('--data_path', default='', help='NoCode-bench Verified dataset (used to build the instance index)')
+    parser.add_argument('--index_path', default='', help='Cached instance index (default: <data_path>.instance_index.json)')
+    parser.add_argument('--output', '-o', default='patch_stats.csv', help='Per-patch table (default: patch_stats.csv)')
+    parser.add_argument('--patch_store', default='',
+                        help='Packed patch store prefix (default: <root>/patches; the patches/*.diff files are read if it is missing)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    stats = model_patch_stats(args.root, jobs=args.jobs, patch_store=args.patch_store)
+    table = stats
+    if args.data_path or args.index_path:
+        gold = gold_patch_stats(load_instance_index(args.data_path, index_path=args.index_path or None))
+        table = pd.concat([gold, stats], ignore_index=True)
+    else:
+        print("Warning: No --data_path or --index_path given, gold patches are skipped")
+    table.to_csv(args.output, index=False)
+    print(f"Stats for {len(table)} patches saved to: {args.output}")
+
+    for key, table in resolve_breakdown(stats).items():
+        pivot = table.pivot_table(index=['run', 'pred'], columns=key, values='rate', observed=True)
+        print(f"\n=== Resolve rate by {key} ===")
+        print((pivot * 100).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
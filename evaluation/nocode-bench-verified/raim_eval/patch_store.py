@@ -0,0 +1,214 @@
+"""
+Packed, deduplicated store for the per-instance patches of every run.
+
+The store is two files: `<prefix>.pack` holds each distinct patch body once,
+back to back, and `<prefix>.pack.idx` maps (run, pred, instance_id) to the
+offset and length of its body. Reads go through mmap, so random access is a
+dict lookup plus a slice and a full scan is one sequential pass.
+
+`run_patches` serves every consumer of the per-run patches (patch_stats,
+localization, prompt/prefix_stats and prompt/batch_eval) from the store at
+`<root>/patches` when it exists and is newer than the run's
+evaluation_details.jsonl, and reads the run's patches/*.diff files otherwise.
+
+    python -m raim_eval.patch_store build
+    python -m raim_eval.patch_store get patches logs_num_plan_k9_deepseek-v3.2 3 django__django-15622
+"""
+import os
+import re
+import json
+import mmap
+import hashlib
+import argparse
+
+from .discovery import default_root, discover_artifacts
+
+STORE_VERSION = 1
+STORE_NAME = 'patches'
+PATCH_FILE = re.compile(r'^patch_(.+)\.diff$')
+
+# Stores opened by this process, so each worker maps the pack once
+_open_stores = {}
+
+
+def _key(run, pred, instance_id):
+    return f"{run}\t{pred}\t{instance_id}"
+
+
+class PatchStore:
+    def __init__(self, prefix):
+        with open(prefix + '.pack.idx', 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported patch store version in {prefix}.pack.idx: {index.get('version')}")
+
+        self.offsets = index['offsets']
+        self.lengths = index['lengths']
+        self._blob_of = dict(zip(index['keys'], index['blobs']))
+        self.mtime = os.path.getmtime(prefix + '.pack.idx')
+        self._runs = None
+
+        self._file = open(prefix + '.pack', 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._blob_of)
+
+    def __contains__(self, key):
+        return _key(*key) in self._blob_of
+
+    def keys(self):
+        return [tuple(key.split('\t')) for key in self._blob_of]
+
+    def _raw(self, blob_id):
+        start = self.offsets[blob_id]
+        return self._data[start:start + self.lengths[blob_id]]
+
+    def _blob(self, blob_id):
+        return self._raw(blob_id).decode('utf-8')
+
+    def _run_index(self):
+        if self._runs is None:
+            self._runs = {}
+            for key, blob_id in self._blob_of.items():
+                run, pred, instance_id = key.split('\t')
+                self._runs.setdefault((run, pred), []).append((instance_id, blob_id))
+        return self._runs
+
+    def has_run(self, run, pred):
+        return (run, pred) in self._run_index()
+
+    def iter_run(self, run, pred):
+        """Yield (instance_id, patch bytes) for one run, in instance_id order like the patches/*.diff files."""
+        for instance_id, blob_id in sorted(self._run_index().get((run, pred), ())):
+            yield instance_id, bytes(self._raw(blob_id))
+
+    def get(self, run, pred, instance_id, default=None):
+        blob_id = self._blob_of.get(_key(run, pred, instance_id))
+        return default if blob_id is None else self._blob(blob_id)
+
+    def iter_patches(self):
+        """Yield ((run, pred, instance_id), patch) in on-disk order."""
+        for key, blob_id in sorted(self._blob_of.items(), key=lambda item: self.offsets[item[1]]):
+            yield tuple(key.split('\t')), self._blob(blob_id)
+
+    @property
+    def num_blobs(self):
+        return len(self.offsets)
+
+
+def default_prefix(root):
+    return os.path.join(root, STORE_NAME)
+
+
+def open_store(prefix):
+    """The PatchStore at `prefix`, opened once per process, or None if it has not been built."""
+    if prefix not in _open_stores:
+        _open_stores[prefix] = PatchStore(prefix) if os.path.exists(prefix + '.pack.idx') else None
+    return _open_stores[prefix]
+
+
+def run_patches(artifact, prefix=None):
+    """
+    Yield (instance_id, patch bytes) for one run: from the store at `prefix`
+    when it holds the run and is newer than its evaluation_details.jsonl,
+    otherwise from the patches/*.diff files.
+    """
+    store = open_store(prefix) if prefix else None
+    if (store is not None and store.has_run(artifact.run, artifact.pred)
+            and os.path.getmtime(artifact.path) <= store.mtime):
+        yield from store.iter_run(artifact.run, artifact.pred)
+        return
+
+    patch_dir = os.path.join(os.path.dirname(artifact.path), 'patches')
+    if os.path.isdir(patch_dir):
+        with os.scandir(patch_dir) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            match = PATCH_FILE.match(entry.name)
+            if match:
+                with open(entry.path, 'rb') as f:
+                    yield match.group(1), f.read()
+        return
+
+    from .loader import load_evaluation_details
+    for instance_id, record in load_evaluation_details(artifact.path).iter_records():
+        patch = record.get('model_patch')
+        if patch:
+            yield instance_id, patch.encode('utf-8')
+
+
+def build_patch_store(root, prefix):
+    """Pack the patches of every discovered run under `root` into `<prefix>.pack`."""
+    keys, blobs = [], []
+    offsets, lengths = [], []
+    blob_ids = {}
+    offset = 0
+
+    tmp_pack = f"{prefix}.pack.{os.getpid()}.tmp"
+    with open(tmp_pack, 'wb') as out:
+        for artifact in discover_artifacts(root):
+            if artifact.kind != 'evaluation_details':
+                continue
+            for instance_id, body in run_patches(artifact):
+                digest = hashlib.sha1(body).digest()
+                blob_id = blob_ids.get(digest)
+                if blob_id is None:
+                    blob_id = blob_ids[digest] = len(offsets)
+                    out.write(body)
+                    offsets.append(offset)
+                    lengths.append(len(body))
+                    offset += len(body)
+                keys.append(_key(artifact.run, artifact.pred, instance_id))
+                blobs.append(blob_id)
+
+    tmp_idx = f"{prefix}.pack.idx.{os.getpid()}.tmp"
+    with open(tmp_idx, 'w', encoding='utf-8') as f:
+        json.dump({'version': STORE_VERSION, 'keys': keys, 'blobs': blobs, 'offsets': offsets, 'lengths': lengths},
+                  f, separators=(',', ':'))
+    os.replace(tmp_pack, prefix + '.pack')
+    os.replace(tmp_idx, prefix + '.pack.idx')
+
+    print(f"Packed {len(keys)} patches ({len(offsets)} distinct, {offset / 1e6:.1f} MB) into {prefix}.pack")
+    return len(keys), len(offsets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the packed patch store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Pack every run under ROOT')
+    build_parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders')
+    build_parser.add_argument('--output', '-o', default='', help='Store prefix (default: <root>/patches -> patches.pack, patches.pack.idx)')
+
+    get_parser = subparsers.add_parser('get', help='Print one patch')
+    get_parser.add_argument('prefix')
+    get_parser.add_argument('run', help='Run directory name, e.g. logs_num_plan_k9_deepseek-v3.2')
+    get_parser.add_argument('pred', help="Candidate index, or 'best'")
+    get_parser.add_argument('instance_id')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_patch_store(args.root, args.output or default_prefix(args.root))
+    else:
+        with PatchStore(args.prefix) as store:
+            patch = store.get(args.run, args.pred, args.instance_id)
+        if patch is None:
+            parser.exit(1, f"No patch for ({args.run}, {args.pred}, {args.instance_id})\n")
+        print(patch, end='')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Write one results table to several formats in a single pass.
+
+The backend is picked from each output's extension (.xlsx, .tex, .csv, .md,
+.jsonl). Cells are formatted once and shared by the text backends; LaTeX
+(booktabs) and Markdown are written directly, so the common LaTeX-only path
+needs neither jinja2 nor openpyxl. openpyxl is only imported for .xlsx.
+
+    render(df, ['stats.xlsx', 'stats.tex'], percent=['Overall'], caption='...', label='tab:stats')
+
+Options understood by the backends:
+    index         write the DataFrame index as leading column(s) (default False)
+    float_format  %-format for float cells (default '%.2f')
+    percent       columns holding fractions in [0, 1], shown as percentages
+    formatters    {column: callable} overriding the text of individual columns
+    na_rep        text for missing values (default '')
+    caption, label, position
+                  LaTeX table float; without any of them only the tabular is written
+    standalone    wrap the LaTeX table in a minimal \\documentclass document
+    sheet_name    name of the Excel sheet holding the table (default 'Sheet1')
+    sheets        extra {sheet_name: DataFrame} written after the table in the same workbook
+"""
+import os
+import re
+
+RENDERERS = {}
+
+LATEX_SPECIAL = {
+    '\\': r'\textbackslash ', '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_',
+    '{': r'\{', '}': r'\}', '~': r'\textasciitilde ', '^': r'\textasciicircum ',
+}
+_LATEX_TABLE = str.maketrans(LATEX_SPECIAL)
+
+
+def renderer(*extensions):
+    """Register a `func(table, path, options)` backend for the given file extensions."""
+    def register(func):
+        for extension in extensions:
+            RENDERERS[extension] = func
+        return func
+    return register
+
+
+def latex_escape(text):
+    return str(text).translate(_LATEX_TABLE)
+
+
+def render(table, outputs, **options):
+    """Write `table` to every path in `outputs`; returns the paths written."""
+    if isinstance(outputs, str):
+        outputs = [outputs]
+    cache = {}
+    written = []
+    for output in outputs:
+        if not output:
+            continue
+        extension = os.path.splitext(output)[1].lower()
+        if extension not in RENDERERS:
+            raise ValueError(f"No renderer for {output}; known extensions: {', '.join(sorted(RENDERERS))}")
+        RENDERERS[extension](table, output, dict(options, _cache=cache))
+        written.append(output)
+    return written
+
+
+def _with_index(table, options):
+    return table.reset_index() if options.get('index') else table
+
+
+def formatted_cells(table, options, percent_suffix='%'):
+    """
+    The table as strings, one vectorized pass per column.
+
+    Shared between text backends through the per-render cache, keyed by the
+    percent suffix since LaTeX needs it escaped.
+    """
+    import pandas as pd
+
+    cache = options.get('_cache', {})
+    if percent_suffix in cache:
+        return cache[percent_suffix]
+
+    frame = _with_index(table, options)
+    float_format = options.get('float_format', '%.2f')
+    percent = set(options.get('percent', ()))
+    formatters = options.get('formatters', {})
+    na_rep = options.get('na_rep', '')
+
+    cells = {}
+    for column in frame.columns:
+        values = frame[column]
+        if column in formatters:
+            text = values.map(formatters[column])
+        elif column in percent:
+            text = (values * 100).map(lambda x: na_rep if pd.isna(x) else (float_format % x) + percent_suffix)
+        elif pd.api.types.is_float_dtype(values):
+            text = values.map(lambda x: na_rep if pd.isna(x) else float_format % x)
+        else:
+            text = values.astype(object).where(values.notna(), na_rep).astype(str)
+        cells[column] = text.tolist()
+    cache[percent_suffix] = cells
+    return cells
+
+
+def _column_format(table, options):
+    import pandas as pd
+
+    frame = _with_index(table, options)
+    index_columns = table.index.nlevels if options.get('index') else 0
+    return ''.join('l' if i < index_columns or not pd.api.types.is_numeric_dtype(frame[c]) else 'r'
+                   for i, c in enumerate(frame.columns))
+
+
+def _latex_header(table, options):
+    columns = [latex_escape(c) for c in table.columns]
+    if not options.get('index'):
+        return [columns]
+    index_names = [latex_escape(n) if n is not None else '' for n in table.index.names]
+    if table.columns.name is None:
+        return [index_names + columns]
+    # A named column axis gets its own row, with the index names on the row below
+    return [[latex_escape(table.columns.name)] + [''] * (len(index_names) - 1) + columns,
+            index_names + [''] * len(columns)]
+
+
+def latex_table(table, options):
+    import pandas as pd
+
+    cells = formatted_cells(table, options, percent_suffix='\\%')
+    preformatted = set(options.get('formatters', {})) | set(options.get('percent', ()))
+    frame = _with_index(table, options)
+    columns = []
+    for column in frame.columns:
+        if column in preformatted or pd.api.types.is_numeric_dtype(frame[column]):
+            columns.append(cells[column])
+        else:
+            columns.append([latex_escape(value) for value in cells[column]])
+
+    lines = [f"\\begin{{tabular}}{{{_column_format(table, options)}}}", '\\toprule']
+    lines += [' & '.join(row) + ' \\\\' for row in _latex_header(table, options)]
+    lines.append('\\midrule')
+    lines += [' & '.join(row) + ' \\\\' for row in zip(*columns)]
+    lines += ['\\bottomrule', '\\end{tabular}']
+
+    caption, label, position = options.get('caption'), options.get('label'), options.get('position')
+    if caption or label or position:
+        head = ['\\begin{table}' + (f'[{position}]' if position else '')]
+        if caption:
+            head.append(f'\\caption{{{caption}}}')
+        if label:
+            head.append(f'\\label{{{label}}}')
+        lines = head + lines + ['\\end{table}']
+    return '\n'.join(lines) + '\n'
+
+
+@renderer('.tex')
+def write_latex(table, path, options):
+    text = latex_table(table, options)
+    if options.get('standalone'):
+        text = ('\\documentclass{article}\n\\usepackage{booktabs}\n\\begin{document}\n\n'
+                + text + '\n\n\\end{document}\n')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@renderer('.md')
+def write_markdown(table, path, options):
+    cells = formatted_cells(table, options)
+    frame = _with_index(table, options)
+    header = [str(c) for c in frame.columns]
+    align = ['---:' if a == 'r' else ':---' for a in _column_format(table, options)]
+    rows = [header, align] + [list(row) for row in zip(*(cells[c] for c in frame.columns))]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join('| ' + ' | '.join(value.replace('|', '\\|') for value in row) + ' |\n' for row in rows))
+
+
+@renderer('.csv')
+def write_csv(table, path, options):
+    table.to_csv(path, index=bool(options.get('index')))
+
+
+@renderer('.jsonl')
+def write_jsonl(table, path, options):
+    _with_index(table, options).to_json(path, orient='records', lines=True)
+
+
+def _excel_number_formats(worksheet, frame, options, offset):
+    import pandas as pd
+
+    match = re.search(r'\.(\d+)f', options.get('float_format', '%.2f'))
+    decimals = int(match.group(1)) if match else 2
+    percent = set(options.get('percent', ()))
+    for i, column in enumerate(frame.columns, start=1 + offset):
+        if column in percent:
+            number_format = '0.' + '0' * decimals + '%'
+        elif pd.api.types.is_float_dtype(frame[column]):
+            number_format = '0.' + '0' * decimals
+        else:
+            continue
+        for (cell,) in worksheet.iter_rows(min_row=2, min_col=i, max_col=i):
+            cell.number_format = number_format
+
+
+@renderer('.xlsx')
+def write_excel(table, path, options):
+    import pandas as pd
+
+    # Percentages stay numeric and get a cell number format instead of becoming strings
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        sheet_name = options.get('sheet_name', 'Sheet1')
+        index = bool(options.get('index'))
+        table.to_excel(writer, sheet_name=sheet_name, index=index)
+        _excel_number_formats(writer.sheets[sheet_name], table, options, table.index.nlevels if index else 0)
+        for name, sheet in (options.get('sheets') or {}).items():
+            sheet.to_excel(writer, sheet_name=name, index=False)
+            _excel_number_formats(writer.sheets[name], sheet, options, 0)
+
@@ -0,0 +1,198 @@
+"""
+Bootstrap confidence intervals and paired significance tests between methods,
+computed from the per-instance `resolved` vectors.
+
+All methods are stacked into one (methods x instances) matrix. A bootstrap
+replicate is a row of multinomial instance weights, so the resolve rates of
+every method for every replicate are one matrix product, and resampling is
+paired across methods. Replicates can be split across worker processes.
+
+    python -m raim_eval.significance --discover . --reference RAIM-deepseek-v3.2 -o significance.csv
+"""
+import os
+import math
+import argparse
+from itertools import combinations
+
+from .discovery import BEST, discover_artifacts
+from .loader import load_resolved_maps
+from .parallel import parallel_map
+
+# Replicates are drawn in a fixed number of independently seeded chunks, so
+# results for a given --seed do not depend on --jobs
+CHUNKS = 16
+
+
+def resolved_matrix(method_results):
+    """Align {method: {instance_id: resolved}} on the instances every method has."""
+    import numpy as np
+
+    methods = list(method_results)
+    common = sorted(set.intersection(*(set(results) for results in method_results.values()))) if methods else []
+    matrix = np.array([[method_results[m][i] for i in common] for m in methods], dtype=bool).reshape(len(methods), len(common))
+    return methods, common, matrix
+
+
+def _seeds(seed, chunks):
+    import numpy as np
+
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(chunks)]
+
+
+def _chunk_sizes(total, chunks):
+    return [total // chunks + (1 if i < total % chunks else 0) for i in range(chunks)]
+
+
+def _bootstrap_chunk(job):
+    import numpy as np
+
+    matrix, size, seed = job
+    n = matrix.shape[1]
+    weights = np.random.default_rng(seed).multinomial(n, np.full(n, 1.0 / n), size=size)
+    return weights @ matrix.T.astype(float) / n
+
+
+def bootstrap_rates(matrix, resamples=10000, seed=0, jobs=1):
+    """(resamples x methods) resolve rates over paired bootstrap replicates of the instances."""
+    import numpy as np
+
+    chunks = max(1, min(CHUNKS, resamples))
+    work = [(matrix, size, chunk_seed) for size, chunk_seed in zip(_chunk_sizes(resamples, chunks), _seeds(seed, chunks))]
+    return np.vstack(parallel_map(_bootstrap_chunk, work, jobs=jobs))
+
+
+def _permutation_chunk(job):
+    import numpy as np
+
+    differences, size, seed = job
+    signs = np.random.default_rng(seed).choice(np.array([-1.0, 1.0]), size=(size, differences.shape[1]))
+    observed = np.abs(differences.sum(axis=1))
+    return (np.abs(signs @ differences.T) >= observed - 1e-9).sum(axis=0)
+
+
+def permutation_pvalues(differences, permutations=10000, seed=0, jobs=1):
+    """
+    Two-sided paired sign-flip test for each row of per-instance differences.
+
+    The statistic is the summed difference; every pair is tested against the
+    same random sign matrix. p = (1 + #extreme) / (1 + permutations).
+    """
+    import numpy as np
+
+    chunks = max(1, min(CHUNKS, permutations))
+    work = [(differences, size, chunk_seed)
+            for size, chunk_seed in zip(_chunk_sizes(permutations, chunks), _seeds(seed + 1, chunks))]
+    extreme = np.sum(parallel_map(_permutation_chunk, work, jobs=jobs), axis=0)
+    return (1 + extreme) / (1 + permutations)
+
+
+def mcnemar_exact(b, c):
+    """Exact two-sided McNemar p-value from the discordant counts b and c."""
+    n = b + c
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, i) for i in range(min(b, c) + 1)) / 2 ** n
+    return min(1.0, 2 * tail)
+
+
+def method_intervals(methods, matrix, rates, alpha=0.05):
+    import numpy as np
+    import pandas as pd
+
+    low, high = np.quantile(rates, [alpha / 2, 1 - alpha / 2], axis=0)
+    return pd.DataFrame({
+        'method': methods,
+        'instances': matrix.shape[1],
+        'resolved': matrix.sum(axis=1),
+        'rate': matrix.mean(axis=1) * 100,
+        'ci_low': low * 100,
+        'ci_high': high * 100,
+    })
+
+
+def pairwise_tests(methods, matrix, rates, pairs, alpha=0.05, permutations=10000, seed=0, jobs=1):
+    """
+    One row per (method_a, method_b): rate difference and relative change
+    (b against a, in %) with bootstrap CIs, exact McNemar and permutation p-values.
+    """
+    import numpy as np
+    import pandas as pd
+
+    a, b = np.array([p[0] for p in pairs], dtype=int), np.array([p[1] for p in pairs], dtype=int)
+    x, y = matrix[a].astype(int), matrix[b].astype(int)
+
+    diff = rates[:, b] - rates[:, a]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(rates[:, a] > 0, diff / rates[:, a], np.nan)
+    q = [alpha / 2, 1 - alpha / 2]
+    diff_low, diff_high = np.quantile(diff, q, axis=0)
+    rel_low, rel_high = np.nanquantile(relative, q, axis=0) if len(pairs) else (np.array([]), np.array([]))
+
+    only_a = (x & (1 - y)).sum(axis=1)
+    only_b = ((1 - x) & y).sum(axis=1)
+    rate_a, rate_b = x.mean(axis=1), y.mean(axis=1)
+    return pd.DataFrame({
+        'method_a': [methods[i] for i in a],
+        'method_b': [methods[i] for i in b],
+        'rate_a': rate_a * 100,
+        'rate_b': rate_b * 100,
+        'diff': (rate_b - rate_a) * 100,
+        'diff_ci_low': diff_low * 100,
+        'diff_ci_high': diff_high * 100,
+        'rel_change': np.divide(rate_b - rate_a, rate_a, out=np.full(len(pairs), np.nan), where=rate_a > 0) * 100,
+        'rel_ci_low': rel_low * 100,
+        'rel_ci_high': rel_high * 100,
+        'only_a': only_a,
+        'only_b': only_b,
+        'mcnemar_p': [mcnemar_exact(int(i), int(j)) for i, j in zip(only_a, only_b)],
+        'permutation_p': permutation_pvalues((y - x).astype(float), permutations, seed=seed, jobs=jobs),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap CIs and paired significance tests between methods.')
+    parser.add_argument('-r', '--result', action='append', nargs=2, metavar=('NAME', 'PATH'),
+                        help='Add an evaluation file, format: NAME PATH')
+    parser.add_argument('--discover', metavar='ROOT', default='',
+                        help='Also add every selected-patch evaluation_details.jsonl found under ROOT')
+    parser.add_argument('--reference', default='',
+                        help='Compare every method against this one (default: all pairs)')
+    parser.add_argument('--resamples', type=int, default=10000, help='Bootstrap resamples (default: 10000)')
+    parser.add_argument('--permutations', type=int, default=10000, help='Sign-flip permutations (default: 10000)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='CI level is 1 - alpha (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', default='significance.csv', help='Pairwise tests (default: significance.csv)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    args.result = args.result or []
+    if args.discover:
+        args.result += [(artifact.label, artifact.path) for artifact in discover_artifacts(args.discover)
+                        if artifact.kind == 'evaluation_details' and artifact.pred == BEST]
+    if not args.result:
+        parser.error('-r/--result or --discover')
+
+    methods, instances, matrix = resolved_matrix(load_resolved_maps(args.result, jobs=args.jobs))
+    print(f"Comparing {len(methods)} methods on {len(instances)} shared instances")
+
+    if args.reference:
+        if args.reference not in methods:
+            parser.error(f'--reference {args.reference} is not one of the loaded methods')
+        ref = methods.index(args.reference)
+        pairs = [(ref, i) for i in range(len(methods)) if i != ref]
+    else:
+        pairs = list(combinations(range(len(methods)), 2))
+
+    rates = bootstrap_rates(matrix, args.resamples, seed=args.seed, jobs=args.jobs)
+    intervals = method_intervals(methods, matrix, rates, alpha=args.alpha)
+    print(intervals.round(2).to_string(index=False))
+
+    tests = pairwise_tests(methods, matrix, rates, pairs, alpha=args.alpha,
+                           permutations=args.permutations, seed=args.seed, jobs=args.jobs)
+    tests.to_csv(args.output, index=False)
+    intervals.to_csv(os.path.splitext(args.output)[0] + '_intervals.csv', index=False)
+    print(f"\n{len(tests)} pairwise comparisons saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Normalized store of the per-test P2P / F2P outcomes of every run.
+
+Each field of each record is decoded once; test names and instance ids are
+interned into integer tables, and the outcomes are kept as flat numpy
+columns (run, instance, field, test, passed, attempted) with one row per
+test result. Tests of instances that were never attempted are stored with
+attempted=False, so they stay distinct from tests that ran and failed.
+The store is saved as a single .npz file so later analyses never touch the
+raw strings again.
+
+    python -m raim_eval.test_outcomes build -o test_outcomes.npz
+    python -m raim_eval.test_outcomes regressions test_outcomes.npz -o p2p_regressions.csv
+"""
+import os
+import ast
+import argparse
+
+from .discovery import default_root, discover_artifacts
+from .parallel import parallel_map
+
+STORE_VERSION = 2
+FIELDS = ('P2P', 'F2P')
+RUN_COLUMNS = ['rq', 'run', 'model', 'pred']
+
+
+def decode_outcome(value):
+    """
+    Return (success, failure, not_attempted) test lists for one P2P / F2P field.
+
+    The field is either a dict or its Python repr as a string; only strings
+    go through ast.literal_eval. Records of instances that were never
+    attempted list their tests under 'fail' instead of 'failure'.
+    """
+    if isinstance(value, str):
+        value = ast.literal_eval(value) if value.strip() else {}
+    if not value:
+        return [], [], []
+    return value.get('success', []), value.get('failure', []), value.get('fail', [])
+
+
+def _run_outcomes(artifact):
+    """Decode one evaluation_details file into locally interned arrays (executed in a worker)."""
+    import numpy as np
+
+    from .loader import load_evaluation_details
+
+    instance_ids, tests = [], {}
+    instance, field, test, passed, attempted = [], [], [], [], []
+    for instance_id, record in load_evaluation_details(artifact.path).iter_records():
+        i = len(instance_ids)
+        instance_ids.append(instance_id)
+        for f, name in enumerate(FIELDS):
+            success, failure, not_attempted = decode_outcome(record.get(name))
+            for outcome, ran, names in ((True, True, success), (False, True, failure), (False, False, not_attempted)):
+                for test_name in names:
+                    instance.append(i)
+                    field.append(f)
+                    test.append(tests.setdefault(test_name, len(tests)))
+                    passed.append(outcome)
+                    attempted.append(ran)
+
+    return {
+        'run': {column: getattr(artifact, column) for column in RUN_COLUMNS},
+        'instance_ids': instance_ids,
+        'tests': list(tests),
+        'instance': np.asarray(instance, dtype=np.int32),
+        'field': np.asarray(field, dtype=np.int8),
+        'test': np.asarray(test, dtype=np.int32),
+        'passed': np.asarray(passed, dtype=bool),
+        'attempted': np.asarray(attempted, dtype=bool),
+    }
+
+
+def _pack_strings(strings):
+    import numpy as np
+
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack_strings(data):
+    text = data.tobytes().decode('utf-8')
+    return text.split('\n') if text else []
+
+
+class TestOutcomes:
+    """
+    Interned per-test outcomes of many runs.
+
+    `runs` is a DataFrame with one row per (rq, run, model, pred); the
+    `run`, `instance` and `test` columns index into `runs`, `instance_ids`
+    and `tests`, and `field` indexes into FIELDS. `attempted` is False for
+    the tests of instances a run never attempted (their `passed` is False).
+    """
+
+    def __init__(self, runs, instance_ids, tests, run, instance, field, test, passed, attempted):
+        import numpy as np
+
+        self.runs = runs.reset_index(drop=True)
+        self.instance_ids = list(instance_ids)
+        self.tests = list(tests)
+        self.run = np.asarray(run, dtype=np.int32)
+        self.instance = np.asarray(instance, dtype=np.int32)
+        self.field = np.asarray(field, dtype=np.int8)
+        self.test = np.asarray(test, dtype=np.int32)
+        self.passed = np.asarray(passed, dtype=bool)
+        self.attempted = np.asarray(attempted, dtype=bool)
+        self._instance_index = {instance_id: i for i, instance_id in enumerate(self.instance_ids)}
+
+    def __len__(self):
+        return len(self.passed)
+
+    def save(self, path):
+        import numpy as np
+
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=STORE_VERSION,
+                 runs=_pack_strings(self.runs[RUN_COLUMNS].astype(str).agg('\t'.join, axis=1)),
+                 instance_ids=_pack_strings(self.instance_ids), tests=_pack_strings(self.tests),
+                 run=self.run, instance=self.instance, field=self.field, test=self.test, passed=self.passed,
+                 attempted=self.attempted)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        import pandas as pd
+
+        with np.load(path) as data:
+            if int(data['version']) != STORE_VERSION:
+                raise ValueError(f"Unsupported test outcome store version in {path}: {int(data['version'])}")
+            runs = pd.DataFrame([row.split('\t') for row in _unpack_strings(data['runs'])], columns=RUN_COLUMNS)
+            return cls(runs, _unpack_strings(data['instance_ids']), _unpack_strings(data['tests']),
+                       data['run'], data['instance'], data['field'], data['test'], data['passed'],
+                       data['attempted'])
+
+    def field_mask(self, field):
+        return self.field == FIELDS.index(field)
+
+    def instance_counts(self, field, mask=None):
+        """
+        (passed, total) arrays of shape (num_runs, num_instances) for one field.
+
+        Counting is a single bincount over the flattened (run, instance) key;
+        `mask` optionally restricts which outcome rows are counted.
+        """
+        import numpy as np
+
+        keep = self.field_mask(field) if mask is None else self.field_mask(field) & mask
+        shape = (len(self.runs), len(self.instance_ids))
+        key = self.run[keep].astype(np.int64) * shape[1] + self.instance[keep]
+        total = np.bincount(key, minlength=shape[0] * shape[1]).reshape(shape)
+        passed = np.bincount(key, weights=self.passed[keep], minlength=total.size).reshape(shape).astype(np.int64)
+        return passed, total
+
+    def instance_bits(self, instance_id, field):
+        """
+        Per-instance bitsets for one field.
+
+        Returns (tests, passed, present): the instance's test names in a
+        fixed order, and two (num_runs, ceil(len(tests) / 8)) uint8 arrays
+        packed with np.packbits, marking which tests passed and which were
+        actually run (not skipped as unattempted) in each run.
+        """
+        import numpy as np
+
+        rows = np.flatnonzero((self.instance == self._instance_index[instance_id]) & self.field_mask(field))
+        universe, column = np.unique(self.test[rows], return_inverse=True)
+        passed = np.zeros((len(self.runs), len(universe)), dtype=bool)
+        present = np.zeros_like(passed)
+        passed[self.run[rows], column] = self.passed[rows]
+        present[self.run[rows], column] = self.attempted[rows]
+        return [self.tests[t] for t in universe], np.packbits(passed, axis=1), np.packbits(present, axis=1)
+
+
+def build_test_outcomes(root, jobs=1):
+    """Decode the P2P / F2P fields of every discovered evaluation_details file."""
+    import numpy as np
+    import pandas as pd
+
+    artifacts = [a for a in discover_artifacts(root) if a.kind == 'evaluation_details']
+    decoded = parallel_map(_run_outcomes, artifacts, jobs=jobs)
+
+    instance_index, test_index = {}, {}
+    runs, columns = [], {'run': [], 'instance': [], 'field': [], 'test': [], 'passed': [], 'attempted': []}
+    for r, part in enumerate(decoded):
+        # Remap the worker-local ids onto the global tables with one fancy index each
+        local_instances = np.array([instance_index.setdefault(i, len(instance_index)) for i in part['instance_ids']],
+                                   dtype=np.int32)
+        local_tests = np.array([test_index.setdefault(t, len(test_index)) for t in part['tests']], dtype=np.int32)
+        runs.append(part['run'])
+        columns['run'].append(np.full(len(part['passed']), r, dtype=np.int32))
+        columns['instance'].append(local_instances[part['instance']])
+        columns['field'].append(part['field'])
+        columns['test'].append(local_tests[part['test']])
+        columns['passed'].append(part['passed'])
+        columns['attempted'].append(part['attempted'])
+
+    arrays = {name: np.concatenate(values) if values else np.array([]) for name, values in columns.items()}
+    return TestOutcomes(pd.DataFrame(runs, columns=RUN_COLUMNS), instance_index, test_index, **arrays)
+
+
+def cross_run_outcomes(store, field='P2P'):
+    """
+    One row per (instance_id, test) with the number of runs in which the
+    test passed, failed and was not attempted, plus the runs it failed in.
+
+    Rows are grouped with a single lexsort over (instance, test) rather than
+    per-test Python loops.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = np.flatnonzero(store.field_mask(field))
+    if not len(rows):
+        return pd.DataFrame(columns=['instance_id', 'test', 'runs_passed', 'runs_failed', 'runs_not_attempted',
+                                     'failed_in'])
+
+    instance, test, passed, run = store.instance[rows], store.test[rows], store.passed[rows], store.run[rows]
+    attempted = store.attempted[rows]
+    order = np.lexsort((test, instance))
+    instance, test, passed, run, attempted = instance[order], test[order], passed[order], run[order], attempted[order]
+
+    group = np.cumsum(np.r_[True, (instance[1:] != instance[:-1]) | (test[1:] != test[:-1])]) - 1
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    runs_passed = np.bincount(group, weights=passed, minlength=len(starts)).astype(np.int64)
+    runs_attempted = np.bincount(group, weights=attempted, minlength=len(starts)).astype(np.int64)
+    runs_total = np.bincount(group, minlength=len(starts))
+
+    labels = (store.runs['run'] + '/' + store.runs['pred']).to_numpy()
+    failed = attempted & ~passed
+    failed_in = pd.Series(labels[run[failed]]).groupby(group[failed]).agg(','.join)
+
+    return pd.DataFrame({
+        'instance_id': np.asarray(store.instance_ids, dtype=object)[instance[starts]],
+        'test': np.asarray(store.tests, dtype=object)[test[starts]],
+        'runs_passed': runs_passed,
+        'runs_failed': runs_attempted - runs_passed,
+        'runs_not_attempted': runs_total - runs_attempted,
+        'failed_in': failed_in.reindex(range(len(starts)), fill_value='').to_numpy(),
+    })
+
+
+def regressions(store, field='P2P'):
+    """Tests that pass in some runs but fail in others, most widely failing first."""
+    outcomes = cross_run_outcomes(store, field)
+    mixed = outcomes[(outcomes['runs_passed'] > 0) & (outcomes['runs_failed'] > 0)]
+    return mixed.sort_values(['runs_failed', 'instance_id', 'test'], ascending=[False, True, True]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the normalized P2P/F2P test outcome store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Decode every run under ROOT')
+    build_parser.add_argument('--root', default=default_root(), help='Directory holding the RQ* folders')
+    build_parser.add_argument('--output', '-o', default='test_outcomes.npz', help='Store path (default: test_outcomes.npz)')
+    build_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: CPU count)')
+
+    regress_parser = subparsers.add_parser('regressions', help='List tests that pass in some runs and fail in others')
+    regress_parser.add_argument('store')
+    regress_parser.add_argument('--field', choices=FIELDS, default='P2P')
+    regress_parser.add_argument('--output', '-o', default='', help='Optional CSV output')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        store = build_test_outcomes(args.root, jobs=args.jobs)
+        store.save(args.output)
+        print(f"Stored {len(store)} test outcomes ({len(store.tests)} distinct tests, {len(store.runs)} runs) in {args.output}")
+    else:
+        table = regressions(TestOutcomes.load(args.store), field=args.field)
+        if args.output:
+            table.to_csv(args.output, index=False)
+            print(f"{len(table)} {args.field} tests with mixed outcomes saved to: {args.output}")
+        else:
+            print(table.drop(columns='failed_in').head(30).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Batched single-call patch evaluation and its offline replay over RQ4 runs.
+
+Impact-aware selection normally makes k PATCH_EVALUATION_PROMPT calls and
+one PATCH_SELECTION_PROMPT call per instance. PATCH_BATCH_EVALUATION_PROMPT
+scores all k candidates and picks one in a single call. This harness renders
+those prompts from the saved pred_<i> patches of an RQ4 run and scores saved
+responses against the candidates' evaluation results, next to the k+1-call
+pipeline's own selection (the run's pred_best patches):
+
+    python prompt/batch_eval.py render logs_num_plan_k9_deepseek-v3.2 --problems problems.jsonl -o prompts.jsonl
+    python prompt/batch_eval.py score logs_num_plan_k9_deepseek-v3.2 responses.jsonl
+
+`score --pipeline` replays the pipeline's own choices as batched responses,
+which checks the harness end to end: it reproduces the pipeline's selector
+accuracy, up to instances where the same patch was evaluated with a different
+outcome as a candidate and as pred_best.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from templates import get as get_template
+from prefix_stats import EVALUATION_ROOT, load_problems, run_candidates
+
+SCORE_KEYS = ('feature_implementation_score', 'relevance', 'syntax', 'upstream_safety',
+              'downstream_correctness', 'regression_safety')
+JSON_BLOCK = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+def batch_prompt(problem_statement, impact_report, candidates):
+    """The batched evaluation prompt for [(pred, patch), ...], indexed in list order."""
+    candidate = get_template('PATCH_BATCH_CANDIDATE')
+    text = '\n'.join(candidate.render(index=index, plan_name=f'plan_{pred}', patch_diff=patch)
+                     for index, (pred, patch) in enumerate(candidates))
+    return get_template('PATCH_BATCH_EVALUATION_PROMPT').render(
+        problem_statement=problem_statement, impact_report=impact_report,
+        num_candidates=len(candidates), candidates_text=text)
+
+
+def extract_json(text):
+    """The JSON object in an LLM response (fenced or bare), or None."""
+    for candidate in JSON_BLOCK.findall(text) + [text[text.find('{'):text.rfind('}') + 1]]:
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def _score_key(entry):
+    scores = entry.get('scores') or {}
+    values = []
+    for key in SCORE_KEYS:
+        try:
+            values.append(float(scores.get(key, 0)))
+        except (TypeError, ValueError):
+            values.append(0.0)
+    return values[0], sum(values[1:])
+
+
+def parse_batch_response(text, k):
+    """
+    (selected index or None, fell_back) from a batched evaluation response.
+
+    An out-of-range or missing selected_plan_index falls back to the
+    candidate with the best feature_implementation_score, then the best
+    summed detailed scores, then the lowest index.
+    """
+    data = extract_json(text or '')
+    if data is None:
+        return None, False
+
+    selected = data.get('selected_plan_index')
+    if isinstance(selected, int) and not isinstance(selected, bool) and 0 <= selected < k:
+        return selected, False
+
+    entries = [e for e in data.get('candidates') or [] if isinstance(e, dict)
+               and isinstance(e.get('index'), int) and 0 <= e['index'] < k]
+    if not entries:
+        return None, True
+    best = max(entries, key=lambda e: (_score_key(e), -e['index']))
+    return best['index'], True
+
+
+def pipeline_selections(candidates, selected):
+    """The candidate index whose patch equals the pipeline's pred_best patch, per instance."""
+    choices = {}
+    for instance_id, patch in selected.items():
+        matches = [index for index, (_, candidate) in enumerate(candidates.get(instance_id, [])) if candidate == patch]
+        if matches:
+            choices[instance_id] = matches[0]
+    return choices
+
+
+def replay(run, candidates, responses, root=EVALUATION_ROOT):
+    """
+    Score {instance_id: response text} against the candidates' resolved flags.
+
+    Returns a dict with the batched and k+1-call pipeline selection results
+    over the same instances.
+    """
+    sys.path.insert(0, root)
+    import numpy as np
+    from raim_eval.best_of_k import load_candidate_matrices
+    from raim_eval.significance import mcnemar_exact
+
+    matrices = [m for m in load_candidate_matrices(root) if m.run == run]
+    if not matrices:
+        raise FileNotFoundError(f"No candidate evaluation results for run {run}")
+    matrix = matrices[0]
+    row_of = {instance_id: row for row, instance_id in enumerate(matrix.instance_ids)}
+    column_of = {pred: column for column, pred in enumerate(matrix.preds)}
+
+    batched = np.zeros(len(matrix.instance_ids), dtype=bool)
+    answered = fallbacks = unparsed = skipped = 0
+    for instance_id, text in responses.items():
+        if instance_id not in row_of or instance_id not in candidates:
+            skipped += 1
+            continue
+        index, fell_back = parse_batch_response(text, len(candidates[instance_id]))
+        if index is None:
+            unparsed += 1
+            continue
+        answered += 1
+        fallbacks += fell_back
+        pred = candidates[instance_id][index][0]
+        if pred in column_of:
+            batched[row_of[instance_id]] = matrix.resolved[row_of[instance_id], column_of[pred]]
+
+    solvable = matrix.resolved.any(axis=1)
+    result = {
+        'run': run, 'k': matrix.k, 'instances': len(matrix.instance_ids), 'solvable': int(solvable.sum()),
+        'answered': answered, 'fallbacks': fallbacks, 'unparsed': unparsed, 'skipped': skipped,
+        'batched_correct': int((batched & solvable).sum()),
+    }
+    result['batched_accuracy'] = result['batched_correct'] / result['solvable'] if result['solvable'] else 0.0
+    if matrix.selected is not None:
+        pipeline = matrix.selected
+        result['pipeline_correct'] = int((pipeline & solvable).sum())
+        result['pipeline_accuracy'] = result['pipeline_correct'] / result['solvable'] if result['solvable'] else 0.0
+        only_pipeline, only_batched = int((pipeline & ~batched).sum()), int((~pipeline & batched).sum())
+        result.update({'only_pipeline': only_pipeline, 'only_batched': only_batched,
+                       'mcnemar_p': mcnemar_exact(only_pipeline, only_batched)})
+    return result
+
+
+def load_responses(path):
+    """{instance_id: response text} from a JSONL file of {instance_id, response}."""
+    responses = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                responses[record['instance_id']] = record['response']
+            except (json.JSONDecodeError, KeyError) as e:
+                print(f"Warning: Skipping line {line_num} of {path}: {e}")
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batched patch evaluation prompts and their offline replay.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = subparsers.add_parser('render', help='Write one batched evaluation prompt per instance')
+    render_parser.add_argument('run', help='RQ4 run name, e.g. logs_num_plan_k9_deepseek-v3.2')
+    render_parser.add_argument('--problems', default='', help='JSONL of {instance_id, problem_statement, impact_report}')
+    render_parser.add_argument('--output', '-o', default='batch_prompts.jsonl')
+
+    score_parser = subparsers.add_parser('score', help='Selection accuracy of saved batched responses')
+    score_parser.add_argument('run', help='RQ4 run name, e.g. logs_num_plan_k9_deepseek-v3.2')
+    score_parser.add_argument('responses', nargs='?', default='', help='JSONL of {instance_id, response}')
+    score_parser.add_argument('--pipeline', action='store_true',
+                              help="Replay the k+1-call pipeline's own selections instead of saved responses")
+    args = parser.parse_args()
+
+    candidates, selected = run_candidates(args.run)
+
+    if args.command == 'render':
+        problems = load_problems(args.problems) if args.problems else {}
+        missing = [i for i in candidates if i not in problems]
+        if missing:
+            print(f"Warning: No problem statement / impact report for {len(missing)} of {len(candidates)} instances")
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for instance_id in sorted(candidates):
+                problem = problems.get(instance_id, {})
+                prompt_text = batch_prompt(problem.get('problem_statement', ''), problem.get('impact_report', ''),
+                                           candidates[instance_id])
+                f.write(json.dumps({'instance_id': instance_id, 'prompt': prompt_text,
+                                    'plans': [pred for pred, _ in candidates[instance_id]]}) + '\n')
+        print(f"{len(candidates)} batched prompts (1 call per instance instead of "
+              f"{max(len(c) for c in candidates.values()) + 1}) saved to: {args.output}")
+        return
+
+    if args.pipeline:
+        responses = {instance_id: json.dumps({'selected_plan_index': index})
+                     for instance_id, index in pipeline_selections(candidates, selected).items()}
+        if not selected:
+            print(f"Warning: {args.run} has no pred_best patches, so there are no pipeline selections to replay")
+        elif not responses:
+            print(f"Warning: None of the {len(selected)} pred_best patches of {args.run} matches a pred_<i> candidate")
+    elif args.responses:
+        responses = load_responses(args.responses)
+    else:
+        parser.error('score needs a responses file or --pipeline')
+
+    result = replay(args.run, candidates, responses)
+    if result['skipped']:
+        print(f"Warning: {result['skipped']} responses are for instances without candidates in {args.run}")
+    print(f"{result['run']}: k={result['k']}, {result['instances']} instances, {result['solvable']} solvable")
+    print(f"  responses: {result['answered']} parsed ({result['fallbacks']} via score fallback), {result['unparsed']} unparsed")
+    print(f"  {'batched (1 call)':<22} {result['batched_correct']} correct, {result['batched_accuracy']:.1%} of solvable")
+    if 'pipeline_correct' in result:
+        print(f"  {'pipeline (%d calls)' % (result['k'] + 1):<22} {result['pipeline_correct']} correct, "
+              f"{result['pipeline_accuracy']:.1%} of solvable")
+        print(f"  only pipeline {result['only_pipeline']}, only batched {result['only_batched']}, "
+              f"McNemar p = {result['mcnemar_p']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Call-graph index of a repository snapshot, for the call-graph prompt sections.
+
+`file_loc_with_graph_user` shows a {module_call_graph} of the candidate files
+and `CONTEXT_SELECTION_PROMPT` a {call_graph_context} of the functions that
+call, or are called by, the core functions, named `path/to/file.py:Class.func`.
+Both come from one index per snapshot:
+
+    nodes      every function, method and class, with an integer id
+    callees    CSR adjacency (out_ptr, out_idx): node -> nodes it calls
+    callers    the transpose (in_ptr, in_idx)
+    modules    file-level CSR built from the call edges, weighted by call count
+
+Calls are resolved statically, through the file's own definitions, its
+imports (absolute and relative) and `self.` methods of the enclosing class.
+Calls on other objects are not resolved. Per-file facts are extracted with
+ast and kept by git blob hash, so building the index for a nearby base
+commit from a previous one only parses the files that changed:
+
+    python prompt/call_graph.py build /repos/django --rev 4a72da7 -o django_4a72da7.npz
+    python prompt/call_graph.py build /repos/django --rev 9f3e1b2 --previous django_4a72da7.npz -o django_9f3e1b2.npz
+    python prompt/call_graph.py query django_9f3e1b2.npz django/db/models/query.py:QuerySet.filter --hops 2
+    python prompt/call_graph.py modules django_9f3e1b2.npz django/db/models/query.py django/db/models/sql/query.py
+"""
+import os
+import ast
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from skeletons import blob_hash, read_blobs, rev_blobs, tree_files
+
+# Bump when file_facts changes, so indexes built before are not reused
+FACTS_VERSION = 1
+
+
+class _FactsVisitor(ast.NodeVisitor):
+    """Definitions, imports and call sites of one module; nested functions count as their enclosing one."""
+
+    def __init__(self):
+        self.defs, self.classes = [], []
+        self.imports, self.calls = {}, {}
+        self._scope = []
+
+    def _qual(self):
+        return '.'.join(name for _, name in self._scope)
+
+    def visit_ClassDef(self, node):
+        if any(kind == 'def' for kind, _ in self._scope):
+            self.generic_visit(node)
+            return
+        self._scope.append(('class', node.name))
+        self.defs.append(self._qual())
+        self.classes.append(self._qual())
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node):
+        if any(kind == 'def' for kind, _ in self._scope):
+            self.generic_visit(node)
+            return
+        # Decorators and defaults run when the function is defined, not when it is called
+        for child in node.decorator_list + [node.args] + ([node.returns] if node.returns else []):
+            self.visit(child)
+        self._scope.append(('def', node.name))
+        self.defs.append(self._qual())
+        for child in node.body:
+            self.visit(child)
+        self._scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = [alias.name, '', 0]
+            else:
+                top = alias.name.split('.')[0]
+                self.imports[top] = [top, '', 0]
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self.imports[alias.asname or alias.name] = [node.module or '', alias.name, node.level]
+
+    def visit_Call(self, node):
+        depth = max((i for i, (kind, _) in enumerate(self._scope) if kind == 'def'), default=None)
+        if depth is not None:
+            caller = '.'.join(name for _, name in self._scope[:depth + 1])
+            spec = _call_spec(node.func)
+            if spec is not None:
+                self.calls.setdefault(caller, []).append(spec)
+        self.generic_visit(node)
+
+
+def _dotted(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def _call_spec(func):
+    if isinstance(func, ast.Name):
+        return ['name', func.id]
+    if isinstance(func, ast.Attribute):
+        receiver = _dotted(func.value)
+        if receiver == 'self':
+            return ['self', func.attr]
+        if receiver is not None:
+            return ['attr', receiver, func.attr]
+    return None
+
+
+def file_facts(source):
+    """{defs, classes, imports, calls} of one Python file; a file that does not parse has none."""
+    if isinstance(source, bytes):
+        source = source.decode('utf-8', 'replace')
+    visitor = _FactsVisitor()
+    try:
+        visitor.visit(ast.parse(source))
+    except (SyntaxError, ValueError, RecursionError):
+        return {'defs': [], 'classes': [], 'imports': {}, 'calls': {}}
+    for caller in visitor.calls:
+        visitor.calls[caller] = sorted(set(map(tuple, visitor.calls[caller])))
+    # Redefinitions (property setters, conditional definitions) share one node
+    return {'defs': list(dict.fromkeys(visitor.defs)), 'classes': list(dict.fromkeys(visitor.classes)),
+            'imports': visitor.imports, 'calls': visitor.calls}
+
+
+def _facts(item):
+    blob, data = item
+    return blob, file_facts(data)
+
+
+def module_names(paths):
+    """
+    {path: dotted module name}, relative to the directory above each file's
+    topmost package, so `lib/matplotlib/axes/_base.py` is `matplotlib.axes._base`.
+    """
+    packages = {os.path.dirname(p) for p in paths if os.path.basename(p) == '__init__.py'}
+    names = {}
+    for path in paths:
+        root = os.path.dirname(path)
+        while root and root in packages:
+            root = os.path.dirname(root)
+        relative = os.path.relpath(path[:-len('.py')], root) if root else path[:-len('.py')]
+        parts = relative.split(os.sep)
+        if parts[-1] == '__init__':
+            parts = parts[:-1]
+        names[path] = '.'.join(parts)
+    return names
+
+
+def _csr(src, dst, n):
+    """(ptr, idx) adjacency of the deduplicated edges src -> dst over n nodes."""
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    if len(src):
+        keep = np.ones(len(src), dtype=bool)
+        keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst = src[keep], dst[keep]
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=ptr[1:])
+    return ptr, dst.astype(np.int32)
+
+
+ARRAYS = ('out_ptr', 'out_idx', 'in_ptr', 'in_idx', 'mod_ptr', 'mod_idx', 'mod_weight', 'mod_in_ptr', 'mod_in_idx')
+
+
+class CallGraph:
+    """
+    Function- and module-level call graph of one snapshot, as CSR arrays over integer ids.
+
+    Node ids follow the order of `paths` and of the definitions in each file.
+    `arrays` restores saved adjacency arrays instead of resolving the calls again.
+    """
+
+    def __init__(self, paths, blobs, facts, arrays=None):
+        self.paths, self.blobs, self.facts = list(paths), list(blobs), list(facts)
+        self.version = FACTS_VERSION
+        self.file_id = {path: i for i, path in enumerate(self.paths)}
+        self.nodes, node_file = [], []
+        for file_id, (path, file_facts) in enumerate(zip(self.paths, self.facts)):
+            for qual in file_facts['defs']:
+                self.nodes.append(f"{path}:{qual}")
+                node_file.append(file_id)
+        self.node_id = {qname: i for i, qname in enumerate(self.nodes)}
+        self.node_file = np.asarray(node_file, dtype=np.int32)
+        if arrays is not None:
+            for name in ARRAYS:
+                setattr(self, name, arrays[name])
+            return
+
+        src, dst = self._resolve_calls()
+        n = len(self.nodes)
+        self.out_ptr, self.out_idx = _csr(src, dst, n)
+        self.in_ptr, self.in_idx = _csr(dst, src, n)
+
+        # Module edges: one per (caller file, callee file) pair, weighted by the number of call edges
+        fsrc, fdst = self.node_file[self.in_idx], np.repeat(self.node_file, np.diff(self.in_ptr))
+        cross = fsrc != fdst
+        pairs = fsrc[cross].astype(np.int64) * len(self.paths) + fdst[cross]
+        pairs, weights = np.unique(pairs, return_counts=True)
+        self.mod_ptr, self.mod_idx = _csr(pairs // len(self.paths), pairs % len(self.paths), len(self.paths))
+        self.mod_weight = weights.astype(np.int32)
+        self.mod_in_ptr, self.mod_in_idx = _csr(pairs % len(self.paths), pairs // len(self.paths), len(self.paths))
+
+    def _resolve_calls(self):
+        modules = module_names(self.paths)
+        file_of_module = {name: path for path, name in modules.items()}
+        def_sets = [set(f['defs']) for f in self.facts]
+        class_sets = [set(f['classes']) for f in self.facts]
+
+        def lookup(path, qual):
+            """Node id of `qual` in `path`; a class stands for its __init__ when it has one."""
+            file_id = self.file_id[path]
+            if qual in class_sets[file_id] and f"{qual}.__init__" in def_sets[file_id]:
+                qual = f"{qual}.__init__"
+            return self.node_id.get(f"{path}:{qual}") if qual in def_sets[file_id] else None
+
+        def lookup_dotted(dotted):
+            """Node id for an absolute dotted name such as pkg.mod.Class.method."""
+            parts = dotted.split('.')
+            for i in range(len(parts) - 1, 0, -1):
+                path = file_of_module.get('.'.join(parts[:i]))
+                if path is not None:
+                    return lookup(path, '.'.join(parts[i:]))
+            return None
+
+        src, dst = [], []
+        for file_id, (path, facts) in enumerate(zip(self.paths, self.facts)):
+            package = modules[path].split('.')
+            if os.path.basename(path) != '__init__.py':
+                package = package[:-1]
+            imported = {}
+            for alias, (module, name, level) in facts['imports'].items():
+                if level:
+                    base = package[:len(package) - (level - 1)] if level > 1 else package
+                    module = '.'.join(base + ([module] if module else []))
+                imported[alias] = f"{module}.{name}" if name else module
+
+            for caller, specs in facts['calls'].items():
+                caller_id = self.node_id[f"{path}:{caller}"]
+                for spec in specs:
+                    callee = None
+                    if spec[0] == 'name':
+                        if spec[1] in def_sets[file_id]:
+                            callee = lookup(path, spec[1])
+                        elif spec[1] in imported:
+                            callee = lookup_dotted(imported[spec[1]])
+                    elif spec[0] == 'self':
+                        owner = caller.rsplit('.', 1)[0] if '.' in caller else ''
+                        if owner in class_sets[file_id]:
+                            callee = lookup(path, f"{owner}.{spec[1]}")
+                    else:
+                        head, _, rest = spec[1].partition('.')
+                        if head in class_sets[file_id]:
+                            callee = lookup(path, f"{spec[1]}.{spec[2]}")
+                        elif head in imported:
+                            callee = lookup_dotted('.'.join(filter(None, [imported[head], rest, spec[2]])))
+                    if callee is not None:
+                        src.append(caller_id)
+                        dst.append(callee)
+        return np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.out_idx)
+
+    def _ids(self, ptr, idx, node):
+        return idx[ptr[node]:ptr[node + 1]]
+
+    def callees(self, qname):
+        return [self.nodes[i] for i in self._ids(self.out_ptr, self.out_idx, self.node_id[qname])]
+
+    def callers(self, qname):
+        return [self.nodes[i] for i in self._ids(self.in_ptr, self.in_idx, self.node_id[qname])]
+
+    def neighborhood(self, qname, hops=1, direction='both'):
+        """
+        {node id: hop} of the functions within `hops` calls of `qname`, following
+        'callees', 'callers' or 'both'; the function itself is left out.
+        """
+        adjacency = []
+        if direction in ('callees', 'both'):
+            adjacency.append((self.out_ptr, self.out_idx))
+        if direction in ('callers', 'both'):
+            adjacency.append((self.in_ptr, self.in_idx))
+        start = self.node_id[qname]
+        seen, frontier = {start: 0}, [start]
+        for hop in range(1, hops + 1):
+            reached = []
+            for node in frontier:
+                for ptr, idx in adjacency:
+                    reached.extend(idx[ptr[node]:ptr[node + 1]].tolist())
+            frontier = [node for node in dict.fromkeys(reached) if node not in seen]
+            seen.update((node, hop) for node in frontier)
+        del seen[start]
+        return seen
+
+    def module_edges(self, path):
+        """([(callee file, calls), ...], [caller file, ...]) of one file."""
+        file_id = self.file_id[path]
+        lo, hi = self.mod_ptr[file_id], self.mod_ptr[file_id + 1]
+        out = [(self.paths[j], int(w)) for j, w in zip(self.mod_idx[lo:hi], self.mod_weight[lo:hi])]
+        callers = [self.paths[j] for j in self._ids(self.mod_in_ptr, self.mod_in_idx, file_id)]
+        return out, callers
+
+    def save(self, path):
+        meta = json.dumps({'version': FACTS_VERSION, 'paths': self.paths, 'blobs': self.blobs,
+                           'facts': self.facts}).encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.frombuffer(meta, dtype=np.uint8),
+                            **{name: getattr(self, name) for name in ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            arrays = {name: data[name] for name in ARRAYS}
+        graph = cls(meta['paths'], meta['blobs'], meta['facts'], arrays)
+        graph.version = meta.get('version', 0)
+        return graph
+
+
+def build_graph(repo, rev=None, previous=None, workers=None):
+    """
+    CallGraph of a working tree, or of `rev` read straight from git.
+
+    Files whose blob is in `previous` (a CallGraph of another snapshot) reuse
+    its facts; only the rest are parsed, in a process pool when there are many.
+    A `previous` index saved by another FACTS_VERSION is not reused.
+    Returns (graph, number of files that had to be parsed).
+    """
+    if previous is not None and previous.version != FACTS_VERSION:
+        print(f"Warning: Previous index has facts version {previous.version}, not {FACTS_VERSION}; "
+              f"parsing every file")
+        previous = None
+    known = dict(zip(previous.blobs, previous.facts)) if previous else {}
+    if rev:
+        blobs = rev_blobs(repo, rev)
+        missing = {b for b in blobs.values() if b not in known}
+        contents = read_blobs(repo, missing) if missing else {}
+    else:
+        blobs, contents = {}, {}
+        for path in tree_files(repo):
+            with open(os.path.join(repo, path), 'rb') as f:
+                data = f.read()
+            blobs[path] = blob = blob_hash(data)
+            if blob not in known:
+                contents[blob] = data
+
+    if len(contents) < 32 or workers == 1:
+        parsed = dict(map(_facts, contents.items()))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = dict(pool.map(_facts, contents.items(), chunksize=16))
+    known.update(parsed)
+
+    paths = sorted(p for p in blobs if blobs[p] in known)
+    graph = CallGraph(paths, [blobs[p] for p in paths], [known[blobs[p]] for p in paths])
+    return graph, sum(blobs[p] in parsed for p in paths)
+
+
+def call_graph_context(graph, core_qnames, hops=1):
+    """
+    The {call_graph_context} section: a call tree of the callers and callees
+    of each core function, two levels deep with hops=2.
+    """
+    sections = []
+    for qname in core_qnames:
+        if qname not in graph.node_id:
+            print(f"Warning: {qname} is not in the call graph")
+            continue
+        core = graph.node_id[qname]
+        lines = [qname]
+        for label, ptr, idx in (('Called by', graph.in_ptr, graph.in_idx), ('Calls', graph.out_ptr, graph.out_idx)):
+            first = [n for n in idx[ptr[core]:ptr[core + 1]] if n != core]
+            lines.append(f"  {label}:" + ('' if first else ' (none found)'))
+            for node in sorted(first, key=graph.nodes.__getitem__):
+                lines.append(f"    - {graph.nodes[node]}")
+                if hops > 1:
+                    second = [n for n in idx[ptr[node]:ptr[node + 1]] if n != core and n != node]
+                    lines.extend(f"      - {graph.nodes[n]}" for n in sorted(second, key=graph.nodes.__getitem__))
+        sections.append('\n'.join(lines))
+    return '\n\n'.join(sections)
+
+
+def module_call_graph(graph, paths):
+    """The {module_call_graph} section: call edges among the given files, heaviest first."""
+    selected = [p for p in paths if p in graph.file_id]
+    edges = []
+    for path in selected:
+        out, _ = graph.module_edges(path)
+        edges.extend((path, callee, calls) for callee, calls in out if callee in selected)
+    edges.sort(key=lambda edge: (-edge[2], edge[0], edge[1]))
+    lines = [f"{caller} -> {callee} ({calls} call{'s' if calls != 1 else ''})" for caller, callee, calls in edges]
+    return '### Module Call Graph ###\n' + ('\n'.join(lines) if lines else '(no calls between these files)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Call-graph index of a repository snapshot.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index a working tree or git revision')
+    build_parser.add_argument('repo', help='Repository root')
+    build_parser.add_argument('--rev', default='', help='Git revision to read instead of the working tree')
+    build_parser.add_argument('--previous', default='', help='Index of another snapshot to reuse unchanged files from')
+    build_parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    build_parser.add_argument('--output', '-o', required=True, help='Index file (.npz)')
+
+    query_parser = subparsers.add_parser('query', help='Print the call graph context of some functions')
+    query_parser.add_argument('index', help='Index file (.npz)')
+    query_parser.add_argument('qnames', nargs='+', help='Functions as path/to/file.py:Class.func')
+    query_parser.add_argument('--hops', type=int, default=1, choices=(1, 2))
+
+    modules_parser = subparsers.add_parser('modules', help='Print the module call graph of some files')
+    modules_parser.add_argument('index', help='Index file (.npz)')
+    modules_parser.add_argument('paths', nargs='+', help='File paths relative to the repository root')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        previous = CallGraph.load(args.previous) if args.previous else None
+        graph, parsed = build_graph(args.repo, args.rev or None, previous, args.workers)
+        graph.save(args.output)
+        print(f"{len(graph.paths)} files ({parsed} parsed, {len(graph.paths) - parsed} reused), "
+              f"{len(graph)} functions, {graph.num_edges} call edges, {len(graph.mod_idx)} module edges "
+              f"in {time.perf_counter() - start:.2f}s")
+        print(f"Index saved to: {args.output}")
+        return
+
+    graph = CallGraph.load(args.index)
+    if args.command == 'modules':
+        print(module_call_graph(graph, args.paths))
+        return
+
+    print(call_graph_context(graph, args.qnames, args.hops))
+    known = [q for q in args.qnames if q in graph.node_id]
+    if known:
+        start = time.perf_counter()
+        for qname in known:
+            graph.neighborhood(qname, args.hops)
+        elapsed = (time.perf_counter() - start) / len(known)
+        print(f"\n{args.hops}-hop neighborhood in {elapsed * 1e6:.0f} us per function", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,545 @@
+"""
+Asyncio executor running the four RAIM stages for many instances at once.
+
+Each instance still goes through its stages strictly in order (file
+localization, function localization, multi-design generation, impact-aware
+selection), but up to --max_in_flight instances run concurrently. Calls
+inside a stage that do not depend on each other run in parallel: the k
+LINE_LOC_FROM_PLAN_PROMPT calls after the design step and the k
+PATCH_EVALUATION_PROMPT calls before selection. Both are rendered from a
+template bound to the per-instance fields, so the k prompts share their prefix.
+
+Every provider has its own concurrency limit and token-per-minute budget.
+Prompt tokens are reserved before a call and completion tokens are charged
+when it returns. Calls retry with exponential backoff on 429/5xx responses
+and connection errors. The HTTP client is the standard library, run in
+worker threads, and talks to any OpenAI-compatible endpoint, including
+llm_cache.py's replay server.
+
+With --stream, responses are streamed through the template's parser from
+stream_parse.py, which gets the call's render values (e.g. k_plans): the
+connection is dropped as soon as the parser has the complete result, and the
+stage gets what arrived in closed form (the ``` block with its closing
+fence, or the JSON re-serialized from the parsed items). A response that
+stops matching its output format is retried mid-stream instead of after it
+finishes.
+
+    python prompt/executor.py mock --port 8790 --latency 0.5
+    python prompt/executor.py run instances.jsonl --base_url http://127.0.0.1:8790/v1 --concurrency 16 --tpm 400000
+    python prompt/executor.py demo --instances 40
+    python prompt/executor.py demo --instances 40 --stream --tokens_per_second 50
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from templates import STAGE_OF, bind, get as get_template
+from packing import estimate_tokens
+from batch_eval import extract_json, parse_batch_response
+from stream_parse import PARSERS, ParseError, parser_for, sse_deltas
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class ProviderLimits:
+    concurrency: int = 8
+    tokens_per_minute: int = 0  # 0: unlimited
+    max_retries: int = 3
+    backoff: float = 1.0
+
+
+class TokenBucket:
+    """Token-per-minute budget; waiters are served in arrival order."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens):
+        if not self.capacity:
+            return
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def charge(self, tokens):
+        """Take tokens that were only known after the call; the budget may go negative."""
+        if self.capacity:
+            self._refill()
+            self.tokens -= tokens
+
+
+class Provider:
+    """One OpenAI-compatible endpoint with its own limits."""
+
+    def __init__(self, name, base_url, model, api_key='', limits=None, params=None, timeout=600, stream=False):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.limits = limits or ProviderLimits()
+        self.params = params or {}
+        self.timeout = timeout
+        self.stream = stream
+        self.semaphore = asyncio.Semaphore(self.limits.concurrency)
+        self.bucket = TokenBucket(self.limits.tokens_per_minute)
+        self.in_flight = 0
+        self.stats = {'calls': 0, 'retries': 0, 'parse_retries': 0, 'closed_on_parse': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0, 'peak_in_flight': 0}
+
+    def _open(self, body, template):
+        import urllib.request
+
+        headers = {'Content-Type': 'application/json', 'X-Prompt-Template': template}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(self.base_url + '/chat/completions',
+                                         data=json.dumps(body).encode('utf-8'), headers=headers)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _post(self, body, template):
+        with self._open(body, template) as response:
+            return json.load(response)
+
+    def _post_stream(self, body, template, parse_options=None):
+        """
+        Stream the completion through the template's parser, hanging up once the parser is done.
+
+        The returned content is the parser's closed rendering of what arrived
+        (e.g. the ``` block with its closing fence), and 'parsed' its result.
+        """
+        parser = parser_for(template, **(parse_options or {})) if template in PARSERS else None
+        parsed = None
+        pieces, closed = [], False
+        with self._open(dict(body, stream=True), template) as response:
+            for delta in sse_deltas(response):
+                pieces.append(delta)
+                if parser is not None:
+                    parser.feed(delta)
+                    if parser.done:
+                        closed = True
+                        break
+        content = ''.join(pieces)
+        completion_tokens = estimate_tokens(content)
+        if parser is not None:
+            parsed = parser.close()
+            content = parser.closed_text(content)
+        return {'choices': [{'message': {'content': content}}], 'parsed': parsed, 'closed_on_parse': closed,
+                'usage': {'completion_tokens': completion_tokens}}
+
+    async def complete(self, template, prompt, parse_options=None, **params):
+        """The completion text; `parse_options` are the render values, passed to the stream parser."""
+        import urllib.error
+
+        body = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}], **self.params, **params}
+        prompt_tokens = estimate_tokens(prompt)
+        if self.stream:
+            post = lambda body, template: self._post_stream(body, template, parse_options)
+        else:
+            post = self._post
+        await self.bucket.acquire(prompt_tokens)
+
+        async with self.semaphore:
+            self.in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.in_flight)
+            try:
+                for attempt in range(self.limits.max_retries + 1):
+                    try:
+                        result = await asyncio.to_thread(post, body, template)
+                        break
+                    except ParseError:
+                        if attempt == self.limits.max_retries:
+                            raise
+                        # A malformed response is not a rate limit: resample right away
+                        self.stats['parse_retries'] += 1
+                        continue
+                    except urllib.error.HTTPError as e:
+                        if e.code not in RETRY_STATUS or attempt == self.limits.max_retries:
+                            raise
+                    except (urllib.error.URLError, TimeoutError, ConnectionError):
+                        if attempt == self.limits.max_retries:
+                            raise
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(self.limits.backoff * 2 ** attempt * (0.5 + random.random()))
+            finally:
+                self.in_flight -= 1
+
+        usage = result.get('usage') or {}
+        completion_tokens = usage.get('completion_tokens', 0)
+        self.bucket.charge(completion_tokens)
+        self.stats['calls'] += 1
+        self.stats['closed_on_parse'] += bool(result.get('closed_on_parse'))
+        self.stats['prompt_tokens'] += usage.get('prompt_tokens', prompt_tokens)
+        self.stats['completion_tokens'] += completion_tokens
+        return result['choices'][0]['message']['content']
+
+
+class LLM:
+    """
+    Renders templates and sends them to the provider routed for their stage.
+
+    `routes` maps a stage name from templates.STAGES (or a template name) to
+    a provider name; everything else goes to `default`.
+    """
+
+    def __init__(self, providers, default=None, routes=None):
+        self.providers = providers
+        self.default = default or next(iter(providers))
+        self.routes = routes or {}
+
+    def provider(self, template):
+        name = self.routes.get(template) or self.routes.get(STAGE_OF.get(template)) or self.default
+        return self.providers[name]
+
+    async def call(self, template, parse_options=None, **values):
+        """
+        Render and send one prompt. The stream parser gets the render values
+        plus `parse_options` for what is not a template field (e.g. the
+        rerank_prompt's num_items).
+        """
+        return await self.provider(template).complete(template, get_template(template).render(**values),
+                                                      parse_options={**values, **(parse_options or {})})
+
+    async def fan_out(self, template, shared, per_call):
+        """One call per entry of `per_call`, concurrently, all sharing the `shared` prefix fields."""
+        bound = bind(template, **shared)
+        provider = self.provider(template)
+        return await asyncio.gather(*(provider.complete(template, bound.render(**values), parse_options={**shared, **values})
+                                      for values in per_call))
+
+
+def _plans(design_response, k):
+    plans = (extract_json(design_response) or {}).get('plans') or []
+    return [json.dumps(plan, indent=2) if not isinstance(plan, str) else plan for plan in plans[:k]]
+
+
+async def file_localization(instance, state, llm):
+    state['file_localization'] = await llm.call(
+        'file_loc_with_graph_user', problem_statement=instance.get('problem_statement', ''),
+        structure=instance.get('structure', ''), module_call_graph=instance.get('module_call_graph', ''),
+        code_skeletons=instance.get('code_skeletons', ''))
+
+
+async def function_localization(instance, state, llm):
+    state['function_localization'] = await llm.call(
+        'initial_func_loc', problem_statement=instance.get('problem_statement', ''),
+        file_skeletons=instance.get('file_skeletons', ''))
+
+
+async def multi_design(instance, state, llm):
+    k = instance.get('k_plans', 3)
+    analysis = instance.get('analysis_result_json', '')
+    design = await llm.call(
+        'DESIGN_PROMPT_TEMPLATE', k_plans=k, analysis_result_json=analysis,
+        augmentations_text=instance.get('augmentations_text', ''),
+        call_graph_context=instance.get('call_graph_context', ''),
+        final_code_context=instance.get('final_code_context', ''))
+    state['plans'] = _plans(design, k)
+    state['line_locations'] = await llm.fan_out(
+        'LINE_LOC_FROM_PLAN_PROMPT_SHARED_PREFIX', {'analysis_result_json': analysis},
+        [{'plan_text': plan, 'code_context': instance.get('code_context', '')} for plan in state['plans']])
+
+
+async def impact_aware_selection(instance, state, llm):
+    # Patches are produced from the located lines outside of prompt.py; take them from the instance
+    candidates = instance.get('candidates') or []
+    if not candidates:
+        state['selected_plan_index'] = None
+        return
+    shared = {'problem_statement': instance.get('problem_statement', ''),
+              'impact_report': instance.get('impact_report', '')}
+    evaluations = await llm.fan_out('PATCH_EVALUATION_PROMPT_SHARED_PREFIX', shared,
+                                    [{'plan_name': c.get('plan_name', f'plan_{i}'), 'patch_diff': c.get('patch_diff', '')}
+                                     for i, c in enumerate(candidates)])
+    state['evaluations'] = evaluations
+    analysis = '\n\n'.join(f"### Patch {i} ({c.get('plan_name', f'plan_{i}')})\n{evaluation}"
+                           for i, (c, evaluation) in enumerate(zip(candidates, evaluations)))
+    selection = await llm.call('PATCH_SELECTION_PROMPT', problem_statement=shared['problem_statement'],
+                               candidates_analysis=analysis)
+    state['selected_plan_index'], _ = parse_batch_response(selection, len(candidates))
+
+
+RAIM_STAGES = [file_localization, function_localization, multi_design, impact_aware_selection]
+
+
+async def run_instance(instance, stages, llm):
+    state = {'instance_id': instance.get('instance_id'), 'timings': {}}
+    for stage in stages:
+        start = time.perf_counter()
+        try:
+            await stage(instance, state, llm)
+        except Exception as e:
+            state['error'] = f"{stage.__name__}: {type(e).__name__}: {e}"
+            break
+        finally:
+            state['timings'][stage.__name__] = time.perf_counter() - start
+    return state
+
+
+async def run_instances(instances, llm, stages=RAIM_STAGES, max_in_flight=16, on_result=None):
+    """Run every instance through `stages`, keeping up to `max_in_flight` in progress."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    # HTTP calls run in worker threads; size the pool so it never caps the provider limits
+    workers = sum(provider.limits.concurrency for provider in llm.providers.values())
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(1, workers)))
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def run_one(instance):
+        async with in_flight:
+            state = await run_instance(instance, stages, llm)
+        if on_result:
+            on_result(state)
+        return state
+
+    return await asyncio.gather(*(run_one(instance) for instance in instances))
+
+
+def mock_response(template, prompt):
+    """A canned response in the output format each template asks for."""
+    if template == 'DESIGN_PROMPT_TEMPLATE':
+        match = re.search(r'devise \*\*(\d+)\*\*', prompt)
+        k = int(match.group(1)) if match else 3
+        return json.dumps({'plans': [{'name': f'Plan {i + 1}: mock', 'strategy': 'mock',
+                                      'actions': [{'type': 'MODIFY', 'target': 'src/module.py:func',
+                                                   'description': 'mock'}]} for i in range(k)]})
+    if template.startswith('LINE_LOC_FROM_PLAN_PROMPT'):
+        return '```\nsrc/module.py\nfunction: func\nline: 10\n```'
+    if template == 'CONTEXT_SELECTION_PROMPT':
+        return json.dumps({'top_3_additional_qnames': ['src/a.py:f', 'src/b.py:g', 'src/c.py:h']})
+    if template.startswith('PATCH_EVALUATION_PROMPT'):
+        score = random.randint(0, 2)
+        return json.dumps({'scores': {'feature_implementation_score': score}, 'is_valid_patch': score > 0})
+    if template in ('PATCH_SELECTION_PROMPT', 'PATCH_BATCH_EVALUATION_PROMPT'):
+        return json.dumps({'selected_plan_index': 0, 'selection_reason': 'mock'})
+    if template == 'rerank_prompt':
+        return '<RANKING_START>[2] > [1]</RANKING_END>\nCandidate 2 defines the function the feature extends.'
+    if template == 'initial_func_loc':
+        return '```\nsrc/module.py\nfunction: func\n```'
+    # Models often list more files than asked for and explain their choice afterwards
+    paths = '\n'.join(['src/module.py', 'src/other.py'] + [f'src/pkg/mod_{i}.py' for i in range(13)])
+    return f'```\n{paths}\n```\nThe first files implement the feature; the rest are their callers.'
+
+
+class MockLLM:
+    """
+    Local OpenAI-compatible server with canned responses, simulated latency and
+    optional 429s, recording the peak number of requests served at once.
+    Streaming requests get one SSE chunk per word, paced by `tokens_per_second`.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.2, tokens_per_second=0, error_rate=0.0):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        import threading
+
+        mock = self
+        self.latency, self.tokens_per_second, self.error_rate = latency, tokens_per_second, error_rate
+        self.requests = self.active = self.peak = self.cancelled = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model, content):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for piece in re.findall(r'\s*\S+', content):
+                        chunk = {'object': 'chat.completion.chunk', 'model': model,
+                                 'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        if mock.tokens_per_second:
+                            time.sleep(estimate_tokens(piece) / mock.tokens_per_second)
+                    self.wfile.write(b'data: [DONE]\n\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    with mock._lock:
+                        mock.cancelled += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                with mock._lock:
+                    mock.requests += 1
+                    mock.active += 1
+                    mock.peak = max(mock.peak, mock.active)
+                try:
+                    if random.random() < mock.error_rate:
+                        self._send(429, {'error': {'message': 'mock rate limit'}})
+                        return
+                    prompt = body['messages'][-1]['content']
+                    content = mock_response(self.headers.get('X-Prompt-Template', ''), prompt)
+                    if body.get('stream'):
+                        time.sleep(mock.latency)
+                        self._stream(body.get('model', 'mock'), content)
+                        return
+                    completion_tokens = estimate_tokens(content)
+                    delay = mock.latency + (completion_tokens / mock.tokens_per_second if mock.tokens_per_second else 0)
+                    time.sleep(delay)
+                    self._send(200, {
+                        'object': 'chat.completion', 'model': body.get('model', 'mock'),
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                     'finish_reason': 'stop'}],
+                        'usage': {'prompt_tokens': estimate_tokens(prompt), 'completion_tokens': completion_tokens},
+                    })
+                finally:
+                    with mock._lock:
+                        mock.active -= 1
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def demo_instances(count, k):
+    return [{
+        'instance_id': f'mock__instance-{i}', 'problem_statement': f'Add feature {i}.', 'k_plans': k,
+        'candidates': [{'plan_name': f'plan_{j}', 'patch_diff': f'--- a/src/module.py\n+++ b/src/module.py\n+# {i}.{j}'}
+                       for j in range(k)],
+    } for i in range(count)]
+
+
+def load_instances(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def execute(instances, llm, max_in_flight, output=''):
+    """Run the pipeline and print a summary; returns the per-instance states."""
+    done = [0]
+    out = open(output, 'w', encoding='utf-8') if output else None
+
+    def on_result(state):
+        done[0] += 1
+        if out:
+            out.write(json.dumps(state) + '\n')
+        if done[0] % 10 == 0 or done[0] == len(instances):
+            print(f"  {done[0]}/{len(instances)} instances done")
+
+    start = time.perf_counter()
+    try:
+        states = asyncio.run(run_instances(instances, llm, max_in_flight=max_in_flight, on_result=on_result))
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    failed = [s for s in states if 'error' in s]
+    print(f"\n{len(states)} instances in {elapsed:.1f}s, {len(failed)} failed")
+    for provider in llm.providers.values():
+        stats = provider.stats
+        print(f"  {provider.name}: {stats['calls']} calls, {stats['retries']} retries, peak {stats['peak_in_flight']} "
+              f"in flight, {stats['prompt_tokens']} prompt / {stats['completion_tokens']} completion tokens")
+        if provider.stream:
+            print(f"    streamed: {stats['closed_on_parse']} closed as soon as parsed, "
+                  f"{stats['parse_retries']} parse retries")
+    for state in failed[:5]:
+        print(f"  {state['instance_id']}: {state['error']}")
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the RAIM stages concurrently with per-provider rate limits.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    mock_parser = subparsers.add_parser('mock', help='Serve a mock LLM endpoint')
+    mock_parser.add_argument('--port', type=int, default=8790)
+
+    run_parser = subparsers.add_parser('run', help='Run the pipeline over a JSONL file of instances')
+    run_parser.add_argument('instances', help='JSONL of instances with the template fields of each stage')
+    run_parser.add_argument('--base_url', required=True, help='OpenAI-compatible base URL')
+    run_parser.add_argument('--model', default='deepseek-chat')
+    run_parser.add_argument('--api_key_env', default='OPENAI_API_KEY')
+    run_parser.add_argument('--output', '-o', default='', help='JSONL of per-instance results')
+
+    demo_parser = subparsers.add_parser('demo', help='Run synthetic instances against an in-process mock server')
+    demo_parser.add_argument('--instances', type=int, default=40)
+    demo_parser.add_argument('--k', type=int, default=5, help='Plans / candidates per instance')
+
+    for name in ('mock', 'demo'):
+        subparsers.choices[name].add_argument('--latency', type=float, default=0.2, help='Seconds per mock call')
+        subparsers.choices[name].add_argument('--error_rate', type=float, default=0.0, help='Share of mock calls answered with 429')
+        subparsers.choices[name].add_argument('--tokens_per_second', type=float, default=0,
+                                              help='Mock generation speed on top of --latency (0: instant)')
+    for name in ('run', 'demo'):
+        subparsers.choices[name].add_argument('--concurrency', type=int, default=8, help='Concurrent calls per provider')
+        subparsers.choices[name].add_argument('--tpm', type=int, default=0, help='Tokens per minute per provider (0: unlimited)')
+        subparsers.choices[name].add_argument('--max_in_flight', type=int, default=16, help='Instances in progress at once')
+        subparsers.choices[name].add_argument('--stream', action='store_true',
+                                              help='Stream responses and stop each one once its output is parsed')
+    args = parser.parse_args()
+
+    if args.command == 'mock':
+        mock = MockLLM(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                       error_rate=args.error_rate)
+        print(f"Mock LLM at {mock.base_url}")
+        try:
+            mock.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    limits = ProviderLimits(concurrency=args.concurrency, tokens_per_minute=args.tpm)
+    if args.command == 'run':
+        llm = LLM({'default': Provider('default', args.base_url, args.model,
+                                       os.environ.get(args.api_key_env, ''), limits, stream=args.stream)})
+        execute(load_instances(args.instances), llm, args.max_in_flight, args.output)
+        return
+
+    with MockLLM(latency=args.latency, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate) as mock:
+        llm = LLM({'mock': Provider('mock', mock.base_url, 'mock', limits=limits, stream=args.stream)})
+        instances = demo_instances(args.instances, args.k)
+        execute(instances, llm, args.max_in_flight)
+        calls = mock.requests
+        print(f"  mock server: {calls} requests, peak {mock.peak} concurrent; "
+              f"serial would take ~{calls * args.latency:.1f}s")
+        if args.stream:
+            print(f"  mock server: {mock.cancelled} streams cut off by the client")
+
+
+if __name__ == "__main__":
+    main()
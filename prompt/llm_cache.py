@@ -0,0 +1,318 @@
+"""
+Content-addressed cache of LLM responses, and a local stand-in endpoint that serves it.
+
+A response is keyed by sha256 over (template name, model, sampling params,
+rendered prompt). Entries are stored one JSON file per key under
+`<cache>/<key[:2]>/<key>.json`, written atomically, and the least recently
+used ones are evicted once the store grows past its size limit. Rerunning an
+ablation through the cache only pays for the calls whose prompt actually
+changed.
+
+The stand-in endpoint speaks the OpenAI chat completions protocol, so the
+pipeline only needs its base URL pointed at it. The template name comes from
+an `X-Prompt-Template` header or `metadata.template` in the request body.
+Without --upstream it is a pure replay server and answers cache misses with
+404; with --upstream it records misses from the real provider:
+
+    python prompt/llm_cache.py serve --cache llm_cache --upstream https://api.deepseek.com/v1
+    python prompt/llm_cache.py serve --cache llm_cache --port 8765
+    python prompt/llm_cache.py stats --cache llm_cache
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Request fields that are not sampling parameters
+NON_PARAMS = {'model', 'messages', 'prompt', 'stream', 'stream_options', 'metadata', 'user'}
+# Request fields only meaningful to this endpoint (or to streaming), not sent upstream
+LOCAL_FIELDS = {'stream', 'stream_options', 'metadata'}
+
+
+def prompt_text(prompt):
+    """The rendered prompt as one string; chat message lists are serialized canonically."""
+    if isinstance(prompt, str):
+        return prompt
+    return json.dumps(prompt, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def cache_key(template, model, params, prompt):
+    payload = json.dumps([template or '', model, params or {}, prompt_text(prompt)],
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk {key: entry} store with size-based LRU eviction.
+
+    Hits refresh the entry's mtime, which is the recency used for eviction.
+    The store's total size is scanned once on open and tracked from then on.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evicted = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.size = sum(size for _, _, size in self._entries())
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def _entries(self):
+        """(mtime, path, size) of every stored entry."""
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield stat.st_mtime, entry.path, stat.st_size
+
+    def __len__(self):
+        return sum(1 for _ in self._entries())
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Unreadable cache entry {path}, ignoring: {e}")
+            entry = None
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.size += len(data) - old_size
+            over = self.size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the store is below 90% of `max_bytes`."""
+        target = (self.max_bytes if max_bytes is None else max_bytes) * 0.9
+        with self._lock:
+            entries = sorted(self._entries())
+            self.size = sum(size for _, _, size in entries)
+            for _, path, size in entries:
+                if self.size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.size -= size
+                self.evicted += 1
+
+    def lookup(self, template, model, params, prompt):
+        entry = self.get(cache_key(template, model, params, prompt))
+        return None if entry is None else entry['response']
+
+    def store(self, template, model, params, prompt, response, usage=None):
+        key = cache_key(template, model, params, prompt)
+        self.put(key, {
+            'key': key, 'template': template, 'model': model, 'params': params or {},
+            'prompt_sha256': hashlib.sha256(prompt_text(prompt).encode('utf-8')).hexdigest(),
+            'response': response, 'usage': usage or {}, 'created': time.time(),
+        })
+        return key
+
+
+def cached_call(cache, call, template, model, params, prompt):
+    """`call(prompt, model, params) -> response` through the cache; returns (response, hit)."""
+    response = cache.lookup(template, model, params, prompt)
+    if response is not None:
+        return response, True
+    response = call(prompt, model, params)
+    cache.store(template, model, params, prompt, response)
+    return response, False
+
+
+def request_params(body):
+    return {k: v for k, v in body.items() if k not in NON_PARAMS}
+
+
+def completion_body(model, content, usage=None, key=''):
+    return {
+        'id': f'chatcmpl-{key[:24]}', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': usage or {},
+    }
+
+
+def stream_chunks(model, content, key=''):
+    """Chat completion chunks replaying `content` as a stream."""
+    base = {'id': f'chatcmpl-{key[:24]}', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+    yield dict(base, choices=[{'index': 0, 'delta': {'role': 'assistant', 'content': content}, 'finish_reason': None}])
+    yield dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+
+
+def forward(upstream, body, api_key, template=''):
+    """
+    POST a non-streaming chat completion request to the real provider.
+
+    The stream flags and the cache's own `metadata` tag are dropped, since
+    providers reject `stream_options` on non-streaming requests.
+    """
+    import urllib.request
+
+    headers = {'Content-Type': 'application/json'}
+    if api_key:
+        headers['Authorization'] = f'Bearer {api_key}'
+    if template:
+        headers['X-Prompt-Template'] = template
+    body = {k: v for k, v in body.items() if k not in LOCAL_FIELDS}
+    request = urllib.request.Request(upstream.rstrip('/') + '/chat/completions',
+                                     data=json.dumps(body).encode('utf-8'), headers=headers)
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.load(response)
+
+
+def make_handler(cache, upstream='', api_key=''):
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, model, content, key):
+            data = ''.join(f"data: {json.dumps(chunk)}\n\n" for chunk in stream_chunks(model, content, key))
+            data = (data + 'data: [DONE]\n\n').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/stats'):
+                self._send_json(200, {'hits': cache.hits, 'misses': cache.misses, 'evicted': cache.evicted,
+                                      'bytes': cache.size})
+            else:
+                self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {'error': {'message': f'Invalid JSON body: {e}'}})
+                return
+
+            model = body.get('model', '')
+            template = self.headers.get('X-Prompt-Template') or (body.get('metadata') or {}).get('template', '')
+            params = request_params(body)
+            prompt = body.get('messages', body.get('prompt', ''))
+            key = cache_key(template, model, params, prompt)
+
+            entry = cache.get(key)
+            if entry is None:
+                if not upstream:
+                    self._send_json(404, {'error': {'message': f'Cache miss for {template or "untagged"} prompt',
+                                                    'type': 'cache_miss', 'key': key}})
+                    return
+                try:
+                    result = forward(upstream, body, api_key, template)
+                except Exception as e:
+                    self._send_json(502, {'error': {'message': f'Upstream request failed: {e}'}})
+                    return
+                content = result['choices'][0]['message']['content']
+                cache.store(template, model, params, prompt, content, result.get('usage'))
+                entry = {'response': content, 'usage': result.get('usage', {})}
+
+            if body.get('stream'):
+                self._send_stream(model, entry['response'], key)
+            else:
+                self._send_json(200, completion_body(model, entry['response'], entry.get('usage'), key))
+
+    return Handler
+
+
+def serve(cache, host='127.0.0.1', port=8765, upstream='', api_key=''):
+    """Run the stand-in endpoint until interrupted."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_handler(cache, upstream, api_key))
+    mode = f"recording misses from {upstream}" if upstream else "replay only"
+    print(f"Serving {cache.path} at http://{host}:{server.server_address[1]}/v1 ({mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"hits {cache.hits}, misses {cache.misses}, evicted {cache.evicted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Content-addressed LLM response cache and replay endpoint.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Serve the cache as an OpenAI-compatible endpoint')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--upstream', default='', help='Provider base URL to record cache misses from')
+    serve_parser.add_argument('--api_key_env', default='OPENAI_API_KEY',
+                              help='Environment variable holding the upstream API key')
+
+    subparsers.add_parser('stats', help='Number of entries and size of the cache')
+    subparsers.add_parser('evict', help='Evict least recently used entries down to --max_mb')
+
+    for sub in subparsers.choices.values():
+        sub.add_argument('--cache', default='llm_cache', help='Cache directory (default: llm_cache)')
+        sub.add_argument('--max_mb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                         help='Evict least recently used entries beyond this size')
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache, max_bytes=int(args.max_mb * 1024 ** 2))
+    if args.command == 'serve':
+        serve(cache, args.host, args.port, args.upstream, os.environ.get(args.api_key_env, ''))
+    elif args.command == 'evict':
+        cache.evict()
+        print(f"Evicted {cache.evicted} entries, {cache.size / 1e6:.1f} MB left")
+    else:
+        print(f"{len(cache)} entries, {cache.size / 1e6:.1f} MB in {args.cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Token-budget context packing for the localization and design prompts.
+
+The variable sections of `file_loc_with_graph_user` (structure, module call
+graph, code skeletons) and `DESIGN_PROMPT_TEMPLATE` (call graph context,
+final code context) are filled from ranked snippets, each section within
+its own token budget. When a section is over budget, snippets are cut back
+lowest relevance first, each only as far as needed before the next one is
+touched:
+
+    1. a function body is replaced by its skeleton, if one was given
+    2. a skeleton is truncated line by line (and dropped when empty)
+    3. a function body without a skeleton is dropped
+
+Every snippet that was cut back is reported, so a prompt can be traced back
+to the context the model did not see.
+
+Tokens are counted with tiktoken when it is installed and its encoding is
+available locally, otherwise with a word-piece estimate that is close enough
+for budgeting code.
+
+    python prompt/packing.py snippets.jsonl --query problem.txt --template DESIGN_PROMPT_TEMPLATE -o packed.json
+"""
+import os
+import re
+import sys
+import json
+import math
+import argparse
+from dataclasses import dataclass, field, replace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from templates import get as get_template
+
+# template: {section placeholder: default token budget}
+DEFAULT_BUDGETS = {
+    'file_loc_with_graph_user': {'structure': 4000, 'module_call_graph': 3000, 'code_skeletons': 12000},
+    'DESIGN_PROMPT_TEMPLATE': {'call_graph_context': 4000, 'final_code_context': 16000},
+}
+
+SEPARATOR = '\n\n'
+SKELETON, BODY = 'skeleton', 'body'
+
+WORDS = re.compile(r'\w+')
+SYMBOLS = re.compile(r'[^\w\s]')
+TERMS = re.compile(r'[A-Za-z][a-z0-9]*|[A-Z]+(?![a-z])')
+
+
+def estimate_tokens(text):
+    """Word-piece estimate: a token per 4 characters of each word, plus one per symbol."""
+    return sum((len(word) + 3) // 4 for word in WORDS.findall(text)) + len(SYMBOLS.findall(text))
+
+
+def token_counter(encoding='cl100k_base'):
+    """
+    A `count(text) -> int` function.
+
+    Uses tiktoken's `encoding` when tiktoken is installed and the encoding
+    loads without network access, otherwise estimate_tokens.
+    """
+    try:
+        import tiktoken
+        encoder = tiktoken.get_encoding(encoding)
+    except Exception as e:
+        if not isinstance(e, ImportError):
+            print(f"Warning: Could not load tiktoken encoding {encoding}, estimating tokens instead: {e}")
+        return estimate_tokens
+    return lambda text: len(encoder.encode(text, disallowed_special=()))
+
+
+@dataclass
+class Snippet:
+    section: str
+    key: str
+    text: str
+    kind: str = BODY
+    skeleton: str = ''
+    score: float = None
+
+
+@dataclass
+class PackAction:
+    section: str
+    key: str
+    action: str  # 'truncated', 'skeletonized' or 'dropped'
+    tokens_before: int
+    tokens_after: int
+
+
+@dataclass
+class PackedSection:
+    name: str
+    budget: int
+    snippets: list = field(default_factory=list)
+    tokens: int = 0
+
+    @property
+    def text(self):
+        return SEPARATOR.join(snippet.text for snippet in self.snippets)
+
+
+def query_terms(text):
+    """Lower-cased identifier parts (snake_case and CamelCase split) of `text`."""
+    return [term.lower() for term in TERMS.findall(text) if len(term) > 2]
+
+
+def relevance(snippet, terms):
+    """Share of the query terms that occur in the snippet, damped by its length."""
+    if not terms:
+        return 0.0
+    words = set(query_terms(snippet.key + ' ' + snippet.text))
+    hits = sum(1 for term in terms if term in words)
+    return hits / len(terms) / math.log2(2 + len(words) / 50)
+
+
+def rank_snippets(snippets, query=''):
+    """Snippets by descending score; missing scores are filled from the query."""
+    terms = sorted(set(query_terms(query)))
+    for snippet in snippets:
+        if snippet.score is None:
+            snippet.score = relevance(snippet, terms)
+    return sorted(snippets, key=lambda s: (-s.score, s.key))
+
+
+def truncate_lines(text, max_tokens, count):
+    """The longest line prefix of `text` within `max_tokens`, with a marker for the cut lines."""
+    lines = text.splitlines()
+    kept, used = [], 0
+    for line in lines:
+        cost = count(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if len(kept) < len(lines) and kept:
+        marker = f"# ... {len(lines) - len(kept)} more lines truncated"
+        while kept and used + count(marker) + 1 > max_tokens:
+            used -= count(kept.pop()) + 1
+        if kept:
+            kept.append(marker)
+    return '\n'.join(kept)
+
+
+def pack_section(name, snippets, budget, count, query=''):
+    """Fit the ranked `snippets` of one section into `budget` tokens; returns (PackedSection, [PackAction])."""
+    ranked = rank_snippets(list(snippets), query)
+    separator = count(SEPARATOR)
+    costs = [count(snippet.text) for snippet in ranked]
+    total = sum(costs) + separator * max(0, len(ranked) - 1)
+    actions = []
+
+    def shrink(i, text, action):
+        nonlocal total
+        before = costs[i]
+        ranked[i] = replace(ranked[i], text=text)
+        costs[i] = count(text) if text else 0
+        kept = [cost for cost in costs if cost]
+        total = sum(kept) + separator * max(0, len(kept) - 1)
+        actions.append(PackAction(name, ranked[i].key, action if text else 'dropped', before, costs[i]))
+
+    # Each snippet is cut back as far as needed before the next more relevant one is touched
+    for i in range(len(ranked) - 1, -1, -1):
+        if total <= budget:
+            break
+        is_skeleton = ranked[i].kind == SKELETON
+        if not is_skeleton and ranked[i].skeleton and costs[i] > count(ranked[i].skeleton):
+            shrink(i, ranked[i].skeleton, 'skeletonized')
+            is_skeleton = True
+        if total <= budget:
+            break
+        if is_skeleton:
+            room = max(0, costs[i] - (total - budget))
+            shrink(i, truncate_lines(ranked[i].text, room, count), 'truncated')
+        else:
+            shrink(i, '', 'dropped')
+
+    kept = [snippet for snippet, cost in zip(ranked, costs) if cost]
+    return PackedSection(name, budget, kept, total if kept else 0), actions
+
+
+def pack_context(snippets, budgets, count=None, query=''):
+    """
+    Pack snippets into every section named in `budgets` ({section: tokens}).
+
+    Returns ({section: PackedSection}, [PackAction]); sections without
+    snippets come back empty.
+    """
+    count = count or token_counter()
+    by_section = {}
+    for snippet in snippets:
+        if snippet.section not in budgets:
+            print(f"Warning: No budget for section {snippet.section}, skipping {snippet.key}")
+            continue
+        by_section.setdefault(snippet.section, []).append(snippet)
+
+    sections, actions = {}, []
+    for name, budget in budgets.items():
+        sections[name], section_actions = pack_section(name, by_section.get(name, []), budget, count, query)
+        actions += section_actions
+    return sections, actions
+
+
+def load_snippets(path):
+    """Snippets from a JSONL file of {section, key, text[, kind, skeleton, score]} objects."""
+    snippets = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                snippets.append(Snippet(**json.loads(line)))
+            except (json.JSONDecodeError, TypeError) as e:
+                print(f"Warning: Skipping line {line_num} of {path}: {e}")
+    return snippets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack ranked context snippets into per-section token budgets.')
+    parser.add_argument('snippets', help='JSONL file of {section, key, text[, kind, skeleton, score]}')
+    parser.add_argument('--template', choices=list(DEFAULT_BUDGETS), default='DESIGN_PROMPT_TEMPLATE',
+                        help='Prompt whose sections are packed (default: DESIGN_PROMPT_TEMPLATE)')
+    parser.add_argument('--budget', action='append', nargs=2, metavar=('SECTION', 'TOKENS'), default=[],
+                        help='Override the budget of one section')
+    parser.add_argument('--query', default='', help='File with the problem statement used for ranking')
+    parser.add_argument('--encoding', default='cl100k_base', help='tiktoken encoding, if tiktoken is installed')
+    parser.add_argument('--output', '-o', default='', help='Write {section: packed text} as JSON')
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS[args.template])
+    placeholders = get_template(args.template).placeholders
+    for section, tokens in args.budget:
+        if section not in placeholders:
+            parser.error(f"{args.template} has no section {section}")
+        budgets[section] = int(tokens)
+
+    query = ''
+    if args.query:
+        with open(args.query, 'r', encoding='utf-8') as f:
+            query = f.read()
+
+    sections, actions = pack_context(load_snippets(args.snippets), budgets, token_counter(args.encoding), query)
+    for name, section in sections.items():
+        print(f"{name:<20} {section.tokens:>7} / {section.budget:<7} tokens, {len(section.snippets)} snippets")
+    if actions:
+        print("\nCut back:")
+        for action in actions:
+            print(f"  {action.section:<20} {action.action:<12} {action.tokens_before:>6} -> {action.tokens_after:<6} {action.key}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({name: section.text for name, section in sections.items()}, f, indent=2)
+        print(f"\nPacked sections saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
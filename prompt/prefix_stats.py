@@ -0,0 +1,192 @@
+"""
+Shared-prefix measurement for the prompt stages that make one call per plan.
+
+For every instance, the k prompts of a stage are rendered with both the
+original template and its shared-prefix layout. The harness then reports
+how many of their tokens lie in the prefix common to all k calls:
+
+    shared_fraction    share of all prompt tokens inside the per-instance common prefix
+    reusable_fraction  share that a prefix cache can serve, since the first call of each
+                       instance has to write the prefix before the others can hit it
+    static_tokens      prefix shared by every call of the stage, across instances
+
+Calls come from a JSONL file of {stage, instance_id, values}, or are built
+from the saved pred_<i> patches of an RQ4 run for the patch evaluation stage:
+
+    python prompt/prefix_stats.py --rq4 logs_num_plan_k9_deepseek-v3.2 --problems problems.jsonl
+    python prompt/prefix_stats.py --calls calls.jsonl -o prefix_stats.csv
+"""
+import os
+import csv
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from templates import get as get_template
+from packing import token_counter
+
+EVALUATION_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'evaluation', 'nocode-bench-verified')
+
+# stage: (original template, shared-prefix template)
+LAYOUTS = {
+    'line_localization': ('LINE_LOC_FROM_PLAN_PROMPT', 'LINE_LOC_FROM_PLAN_PROMPT_SHARED_PREFIX'),
+    'patch_evaluation': ('PATCH_EVALUATION_PROMPT', 'PATCH_EVALUATION_PROMPT_SHARED_PREFIX'),
+}
+
+
+def common_prefix(texts):
+    return os.path.commonprefix(list(texts)) if texts else ''
+
+
+def prefix_stats(template_name, calls, count):
+    """
+    Shared-prefix statistics of one template over {instance_id: [values, ...]}.
+
+    The common prefix is measured on the rendered text, so per-plan fields
+    that happen to start alike count as shared too.
+    """
+    template = get_template(template_name)
+    total = shared = reusable = num_calls = 0
+    stage_prefix = None
+    for instance_id, values in calls.items():
+        prompts = [template.render(**v) for v in values]
+        prefix = common_prefix(prompts)
+        prefix_tokens = count(prefix)
+        tokens = sum(count(p) for p in prompts)
+        total += tokens
+        shared += prefix_tokens * len(prompts)
+        reusable += prefix_tokens * (len(prompts) - 1)
+        num_calls += len(prompts)
+        stage_prefix = prefix if stage_prefix is None else common_prefix([stage_prefix, prefix])
+
+    return {
+        'template': template_name,
+        'instances': len(calls),
+        'calls': num_calls,
+        'mean_tokens': total / num_calls if num_calls else 0.0,
+        'static_tokens': count(stage_prefix or ''),
+        'shared_fraction': shared / total if total else 0.0,
+        'reusable_fraction': reusable / total if total else 0.0,
+    }
+
+
+def load_calls(path):
+    """{stage: {instance_id: [values, ...]}} from a JSONL file of {stage, instance_id, values}."""
+    calls = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                call = json.loads(line)
+                calls.setdefault(call['stage'], {}).setdefault(call['instance_id'], []).append(call['values'])
+            except (json.JSONDecodeError, KeyError) as e:
+                print(f"Warning: Skipping line {line_num} of {path}: {e}")
+    return calls
+
+
+def load_problems(path):
+    """{instance_id: {'problem_statement', 'impact_report'}} from a JSONL file."""
+    problems = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                problems[record['instance_id']] = record
+    return problems
+
+
+def run_candidates(run, root=EVALUATION_ROOT):
+    """
+    {instance_id: [(pred, patch), ...]} for the saved pred_<i> candidates of one
+    run, plus {instance_id: patch} for its selected (pred_best) patches, read
+    from the packed patch store under `root` when it has been built.
+    """
+    sys.path.insert(0, root)
+    from raim_eval.discovery import BEST, discover_artifacts
+    from raim_eval.patch_store import default_prefix, run_patches
+
+    candidates, selected = {}, {}
+    for artifact in discover_artifacts(root):
+        if artifact.kind != 'evaluation_details' or artifact.run != run:
+            continue
+        for instance_id, patch in run_patches(artifact, default_prefix(root)):
+            patch = patch.decode('utf-8', 'replace')
+            if artifact.pred == BEST:
+                selected[instance_id] = patch
+            else:
+                candidates.setdefault(instance_id, []).append((int(artifact.pred), patch))
+    if not candidates:
+        raise FileNotFoundError(f"No pred_<i> candidates found for run {run} under {root}")
+    return {i: sorted(c) for i, c in candidates.items()}, selected
+
+
+def rq4_evaluation_calls(run, problems, root=EVALUATION_ROOT, max_instances=None):
+    """
+    patch_evaluation calls for the saved pred_<i> candidates of one RQ4 run.
+
+    The problem statement and impact report are not part of the run logs;
+    they are taken from `problems` and left empty for instances it lacks.
+    """
+    candidates, _ = run_candidates(run, root)
+    missing = [i for i in candidates if i not in problems]
+    if missing:
+        print(f"Warning: No problem statement / impact report for {len(missing)} of {len(candidates)} instances")
+
+    calls = {}
+    for instance_id in sorted(candidates)[:max_instances]:
+        problem = problems.get(instance_id, {})
+        shared = {'problem_statement': problem.get('problem_statement', ''),
+                  'impact_report': problem.get('impact_report', '')}
+        calls[instance_id] = [dict(shared, plan_name=f'plan_{pred}', patch_diff=patch)
+                              for pred, patch in candidates[instance_id]]
+    return {'patch_evaluation': calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-prefix token fraction of the per-plan prompt stages.')
+    parser.add_argument('--calls', default='', help='JSONL file of {stage, instance_id, values}')
+    parser.add_argument('--rq4', default='', metavar='RUN',
+                        help='Build patch_evaluation calls from the pred_<i> patches of this RQ4 run')
+    parser.add_argument('--problems', default='', help='JSONL of {instance_id, problem_statement, impact_report} for --rq4')
+    parser.add_argument('--max_instances', type=int, default=None)
+    parser.add_argument('--encoding', default='cl100k_base', help='tiktoken encoding, if tiktoken is installed')
+    parser.add_argument('--output', '-o', default='', help='Optional CSV of the statistics')
+    args = parser.parse_args()
+
+    calls = load_calls(args.calls) if args.calls else {}
+    if args.rq4:
+        problems = load_problems(args.problems) if args.problems else {}
+        calls.update(rq4_evaluation_calls(args.rq4, problems, max_instances=args.max_instances))
+    if not calls:
+        parser.error('--calls or --rq4')
+
+    count = token_counter(args.encoding)
+    rows = []
+    for stage, stage_calls in calls.items():
+        if stage not in LAYOUTS:
+            print(f"Warning: Unknown stage {stage}, known: {', '.join(LAYOUTS)}")
+            continue
+        original, shared = LAYOUTS[stage]
+        for template_name in (original, shared):
+            rows.append(dict(stage=stage, **prefix_stats(template_name, stage_calls, count)))
+
+    print(f"{'stage':<18} {'template':<40} {'calls':>6} {'mean tok':>9} {'static tok':>10} {'shared':>7} {'reusable':>8}")
+    for row in rows:
+        print(f"{row['stage']:<18} {row['template']:<40} {row['calls']:>6} {row['mean_tokens']:>9.0f} "
+              f"{row['static_tokens']:>10} {row['shared_fraction']:>7.1%} {row['reusable_fraction']:>8.1%}")
+
+    if args.output and rows:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nStatistics saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
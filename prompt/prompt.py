@@ -321,6 +321,66 @@ line: 1
 Return only the locations, wrapped in ``` (no extra explanation).
 """
 
+# Shared-prefix layout of LINE_LOC_FROM_PLAN_PROMPT: the static instructions come first and the
+# per-plan fields last, so the k calls of an instance share everything up to {plan_text}
+LINE_LOC_FROM_PLAN_PROMPT_SHARED_PREFIX = """You are an expert software engineer tasked with pinpointing the exact code lines for implementing a pre-approved modification plan.
+
+**YOUR TASK:**
+
+Based on the **Approved Implementation Plan**, identify the precise line numbers or code blocks for **EACH ACTION**.
+
+- For **MODIFY** actions on an **existing** function/class, specify the target function/class name and the exact line number(s) or a range (`start-end`) within it that need to be changed.
+- For **CREATE** actions in an **existing file**, your goal is to find the best insertion point. To do this, you MUST specify an **EXISTING** function or class as an "anchor" and provide a line number near it. For example, specify the last line of a function if you want to insert new code after it.
+- For **CREATE** actions in a **new file** (provided as a skeleton), the location is simply `line: 1`.
+
+Your entire response MUST be wrapped in a single ``` block.
+
+### EXAMPLES of OUTPUT FORMAT ###
+
+**Example 1: Modifying existing functions**
+```
+src/module1/file1.py
+class: RequestHandler
+function: handle_new_feature
+line: 120
+
+src/module2/utils.py
+function: validate_input
+line: 45
+line: 96
+```
+
+**Example 2: Creating a new function in an existing file**
+(The plan is to create a new helper function `new_util_func` in `src/module2/utils.py` after `validate_input`)
+```
+src/module2/utils.py
+function: validate_input
+line: 105 
+```
+*(Note: You identified that line 105 is the end of the `validate_input` function, which is the correct place to insert the new code after.)*
+
+**Example 3: Creating a new file**
+(The plan is to create a new file `src/module3/new_file.py`)
+```
+src/module3/new_file.py
+line: 1
+```
+
+**CONTEXT:**
+---
+**1. Overall Feature Requirement Analysis:**
+{analysis_result_json}
+
+**2. The Approved Implementation Plan:**
+{plan_text}
+
+**3. Code Context for the Plan:**
+{code_context}
+---
+
+Return only the locations, wrapped in ``` (no extra explanation).
+"""
+
 # (4) Impact-Aware Patch Selection
 PATCH_EVALUATION_PROMPT = """You are an experienced software engineer responsible for maintaining a GitHub project.
 A new feature implementation has been requested.
@@ -448,6 +508,136 @@ Return a strictly valid JSON object:
 }}
 """
 
+# Shared-prefix layout of PATCH_EVALUATION_PROMPT: instructions, criteria and output format first,
+# then the per-instance feature and impact report, then the candidate patch
+PATCH_EVALUATION_PROMPT_SHARED_PREFIX = """You are an experienced software engineer responsible for maintaining a GitHub project.
+A new feature implementation has been requested.
+Engineer A has written a test script designed to verify the new feature.
+Engineer B has written a patch to implement the feature.
+
+NOTE: both the test and the patch may be wrong.
+
+--- EVALUATION TASK ---
+You need to perform a multi-stage evaluation of the candidate patch:
+
+## STAGE 1: REGRESSION TEST ANALYSIS
+First, analyze the regression test results to ensure the new feature implementation does not break existing functionality.
+- Check if the regression tests pass or fail
+- If they fail, determine the root cause: is it due to the patch breaking existing functionality, or is it due to test issues?
+
+## STAGE 2: FEATURE IMPLEMENTATION EVALUATION WITH REPRODUCTION TESTS
+Next, evaluate the feature implementation using the reproduction test results:
+- Analyze the reproduction test results at a granular level: how many test cases passed vs. failed
+- Examine the detailed error information for failed tests
+- Distinguish between two scenarios:
+  1. **Test Issues**: The test itself is flawed, incorrect, or incompatible with the codebase
+  2. **Patch Implementation Issues**: The patch fails to correctly implement the feature as described
+- For each failed test, provide a brief analysis of whether it's a test issue or a patch issue
+- Consider the pass rate as an indicator of partial feature implementation
+
+## STAGE 3: CODE CHANGE IMPACT ANALYSIS
+Finally, evaluate the patch using the code change impact analysis:
+- Assess if the patch introduces any breaking changes
+- Check if it complies with the critical constraints identified in the impact report
+- Evaluate code quality, edge case handling, and overall implementation effectiveness
+
+CRITICAL PRIORITY: NEW FEATURE IMPLEMENTATION ACCURACY IS THE MOST IMPORTANT FACTOR. Only consider other factors when multiple patches have equally accurate implementation logic.
+
+Your task is to:
+1. Evaluate the Test Results in detail:
+   - Determine whether each test case is valid for verifying the new feature implementation
+   - For failed tests, distinguish between test issues and patch implementation issues
+   - Calculate an effective pass rate by excluding invalid tests
+   - Determine the expected correct behavior based on the feature description
+
+2. Evaluate the Candidate Patch:
+   - Compare the patch implementation against the expected correct behavior
+   - Double check: refer to the feature description to confirm the feature's implementation
+   - Assess if the patch correctly handles all requirements
+
+3. Score the Patch:
+   - Assess the patch comprehensively based on the criteria below, with FEATURE IMPLEMENTATION ACCURACY as the FIRST PRIORITY
+   - Consider both the regression test results and the reproduction test results
+   - Weight the evaluation towards the feature implementation accuracy
+
+--- EVALUATION CRITERIA ---
+
+1. FEATURE IMPLEMENTATION SCORE (0-2) [HIGHEST PRIORITY]:
+   - 0: Incorrect: changes do not implement the feature correctly or break existing functionality
+   - 1: Partially correct: changes address some cases but are incomplete (passes some reproduction tests)
+   - 2: Fully correct: changes completely implement the feature as described (passes most/all reproduction tests)
+
+2. Patch Quality Considerations [SECONDARY]:
+   - Effectiveness in implementing the core feature
+   - Handling of edge cases
+   - Implementation quality and code style
+   - Potential regression risks (based on regression test results)
+   - Compliance with impact report constraints
+
+3. Detailed Scoring (0-2 for each with clear criteria):
+   - relevance: How well does it implement the core feature described? [HIGH PRIORITY]
+     * 0: Does not implement the feature at all
+     * 1: Partially implements the feature, missing key aspects
+     * 2: Fully implements the feature as described
+   - syntax: Is the code valid and well-formed?
+     * 0: Contains syntax errors that prevent execution
+     * 1: Valid syntax but with minor issues like unused variables
+     * 2: Valid, clean, and well-structured code
+   - upstream_safety: Does it violate any breaking changes or risks? [LOWER PRIORITY]
+     * 0: Introduces critical breaking changes for upstream code
+     * 1: Introduces minor compatibility issues
+     * 2: No breaking changes, safe for all upstream callers
+   - downstream_correctness: Does it use downstream APIs correctly? [LOWER PRIORITY]
+     * 0: Incorrect API usage that will cause failures
+     * 1: API usage with potential edge case issues
+     * 2: Correct and safe API usage following best practices
+   - regression_safety: Does it maintain compatibility with existing functionality? (based on regression test results) [LOWER PRIORITY]
+     * 0: Breaks existing functionality in significant ways
+     * 1: May affect some edge cases or non-critical functionality
+     * 2: Maintains full compatibility with all existing functionality
+
+--- OUTPUT FORMAT ---
+Return a strictly valid JSON object:
+{{
+    "scores": {{
+        "relevance": (0-2),
+        "syntax": (0-2),
+        "upstream_safety": (0-2),
+        "downstream_correctness": (0-2),
+        "regression_safety": (0-2),
+        "feature_implementation_score": (0-2)
+    }},
+    "is_valid_patch": boolean,
+    "critical_issues": ["List specific flaws found"],
+    "reasoning": "Detailed analysis including multi-stage evaluation results.",
+    "test_validity": "valid" or "invalid",
+    "expected_behavior": "Describe the expected correct behavior based on the feature description.",
+    "test_analysis": {{
+        "total_reproduction_tests": (number),
+        "passed_reproduction_tests": (number),
+        "failed_reproduction_tests": (number),
+        "effective_pass_rate": (float, 0.0-1.0),
+        "test_issues": ["List test cases that are problematic"],
+        "patch_issues": ["List patch implementation issues identified from tests"]
+    }}
+}}
+
+--- FEATURE DESCRIPTION ---
+{problem_statement}
+
+--- CHANGE IMPACT REPORT (CRITICAL CONSTRAINTS) ---
+{impact_report}
+
+--- CANDIDATE PATCH ---
+Plan Name: {plan_name}
+Patch Content:
+```diff
+{patch_diff}
+```
+
+Evaluate the candidate patch above and return the JSON object described in OUTPUT FORMAT.
+"""
+
 PATCH_SELECTION_PROMPT = """You are an experienced software engineer responsible for maintaining a GitHub project.
 A new feature implementation has been requested.
 Engineer A has written a test script designed to verify the new feature.
@@ -527,3 +717,130 @@ Return a strictly valid JSON object with the following format:
 
 The selected_plan_index should be the index of the patch with the highest feature_implementation_score. Only when multiple patches have the same feature_implementation_score, consider other factors like code change impact, test pass rates, and implementation quality.
 """
+
+# Batched variant of PATCH_EVALUATION_PROMPT + PATCH_SELECTION_PROMPT: all k candidates are scored and the
+# best one is selected in a single call, laid out with the static instructions first
+PATCH_BATCH_EVALUATION_PROMPT = """You are an experienced software engineer responsible for maintaining a GitHub project.
+A new feature implementation has been requested.
+Engineer A has written a test script designed to verify the new feature.
+Engineer B has proposed several candidate patches to implement the feature.
+
+NOTE: both the test and candidate patches may be wrong.
+
+--- EVALUATION TASK ---
+You need to evaluate EVERY candidate patch independently with the multi-stage evaluation below, and then select the best one.
+
+## STAGE 1: REGRESSION TEST ANALYSIS
+First, analyze the regression test results to ensure the new feature implementation does not break existing functionality.
+- Check if the regression tests pass or fail
+- If they fail, determine the root cause: is it due to the patch breaking existing functionality, or is it due to test issues?
+
+## STAGE 2: FEATURE IMPLEMENTATION EVALUATION WITH REPRODUCTION TESTS
+Next, evaluate the feature implementation using the reproduction test results:
+- Analyze the reproduction test results at a granular level: how many test cases passed vs. failed
+- Examine the detailed error information for failed tests
+- Distinguish between two scenarios:
+  1. **Test Issues**: The test itself is flawed, incorrect, or incompatible with the codebase
+  2. **Patch Implementation Issues**: The patch fails to correctly implement the feature as described
+- For each failed test, provide a brief analysis of whether it's a test issue or a patch issue
+- Consider the pass rate as an indicator of partial feature implementation
+
+## STAGE 3: CODE CHANGE IMPACT ANALYSIS
+Finally, evaluate each patch using the code change impact analysis:
+- Assess if the patch introduces any breaking changes
+- Check if it complies with the critical constraints identified in the impact report
+- Evaluate code quality, edge case handling, and overall implementation effectiveness
+
+CRITICAL PRIORITY: NEW FEATURE IMPLEMENTATION ACCURACY IS THE MOST IMPORTANT FACTOR. Only consider other factors when multiple patches have equally accurate implementation logic.
+
+Score each candidate on its own before comparing them, so that the order in which the candidates are listed does not influence the scores.
+
+--- EVALUATION CRITERIA ---
+
+1. FEATURE IMPLEMENTATION SCORE (0-2) [HIGHEST PRIORITY]:
+   - 0: Incorrect: changes do not implement the feature correctly or break existing functionality
+   - 1: Partially correct: changes address some cases but are incomplete (passes some reproduction tests)
+   - 2: Fully correct: changes completely implement the feature as described (passes most/all reproduction tests)
+
+2. Patch Quality Considerations [ONLY CONSIDER WHEN MULTIPLE PATCHES HAVE SAME FEATURE IMPLEMENTATION SCORE]:
+   - Effectiveness in implementing the core feature
+   - Handling of edge cases
+   - Implementation quality and code style
+   - Potential regression risks (based on regression test results)
+   - Compliance with impact report constraints
+
+3. Detailed Scoring (0-2 for each with clear criteria):
+   - relevance: How well does it implement the core feature described? [HIGH PRIORITY]
+     * 0: Does not implement the feature at all
+     * 1: Partially implements the feature, missing key aspects
+     * 2: Fully implements the feature as described
+   - syntax: Is the code valid and well-formed?
+     * 0: Contains syntax errors that prevent execution
+     * 1: Valid syntax but with minor issues like unused variables
+     * 2: Valid, clean, and well-structured code
+   - upstream_safety: Does it violate any breaking changes or risks? [LOWER PRIORITY]
+     * 0: Introduces critical breaking changes for upstream code
+     * 1: Introduces minor compatibility issues
+     * 2: No breaking changes, safe for all upstream callers
+   - downstream_correctness: Does it use downstream APIs correctly? [LOWER PRIORITY]
+     * 0: Incorrect API usage that will cause failures
+     * 1: API usage with potential edge case issues
+     * 2: Correct and safe API usage following best practices
+   - regression_safety: Does it maintain compatibility with existing functionality? (based on regression test results) [LOWER PRIORITY]
+     * 0: Breaks existing functionality in significant ways
+     * 1: May affect some edge cases or non-critical functionality
+     * 2: Maintains full compatibility with all existing functionality
+
+--- OUTPUT FORMAT ---
+Return a strictly valid JSON object with one entry per candidate, in candidate order:
+{{
+    "candidates": [
+        {{
+            "index": 0,
+            "scores": {{
+                "relevance": (0-2),
+                "syntax": (0-2),
+                "upstream_safety": (0-2),
+                "downstream_correctness": (0-2),
+                "regression_safety": (0-2),
+                "feature_implementation_score": (0-2)
+            }},
+            "is_valid_patch": boolean,
+            "critical_issues": ["List specific flaws found"],
+            "test_analysis": {{
+                "total_reproduction_tests": (number),
+                "passed_reproduction_tests": (number),
+                "failed_reproduction_tests": (number),
+                "effective_pass_rate": (float, 0.0-1.0),
+                "test_issues": ["List test cases that are problematic"],
+                "patch_issues": ["List patch implementation issues identified from tests"]
+            }},
+            "reasoning": "Analysis of this candidate, including multi-stage evaluation results."
+        }},
+        ...
+    ],
+    "selected_plan_index": int,  # Zero-based index of the best patch
+    "selection_reason": "Why this patch was selected over the others"
+}}
+
+The selected_plan_index should be the index of the patch with the highest feature_implementation_score. Only when multiple patches have the same feature_implementation_score, consider other factors like code change impact, test pass rates, and implementation quality.
+
+--- FEATURE DESCRIPTION ---
+{problem_statement}
+
+--- CHANGE IMPACT REPORT (CRITICAL CONSTRAINTS) ---
+{impact_report}
+
+--- CANDIDATE PATCHES ({num_candidates}) ---
+{candidates_text}
+
+Evaluate all {num_candidates} candidate patches above and return the JSON object described in OUTPUT FORMAT.
+"""
+
+PATCH_BATCH_CANDIDATE = """### Candidate {index}
+Plan Name: {plan_name}
+Patch Content:
+```diff
+{patch_diff}
+```
+"""
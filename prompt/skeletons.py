@@ -0,0 +1,287 @@
+"""
+Persistent code-skeleton store for the file localization prompts.
+
+`file_loc_with_graph_user` and `initial_func_loc` show the candidate files as
+skeletons: class and function signatures with their docstring's first line,
+bodies elided. The benchmark repositories recur across many instances with
+nearby base commits, so skeletons are stored by git blob hash
+(sha1 of "blob <size>\\0<content>"). A file that did not change between two
+commits, or two instances, is parsed once.
+
+Skeletons live one file per blob under `<store>/v<SKELETON_VERSION>/<hash[:2]>/`,
+written atomically, with an in-memory map in front. Warming a whole snapshot
+parses the missing blobs in a process pool; for a git revision the blob
+hashes come from `git ls-tree` and contents from `git cat-file --batch`, so
+no checkout is needed:
+
+    python prompt/skeletons.py warm /repos/django --rev 4a72da7 --store skeleton_store
+    python prompt/skeletons.py show /repos/django django/db/models/query.py django/db/models/sql/query.py --rev 4a72da7
+"""
+import os
+import re
+import ast
+import copy
+import sys
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump when the skeleton format changes, so stale skeletons are not served
+SKELETON_VERSION = 2
+MAX_VALUE_CHARS = 80
+SIGNATURE_LINE = re.compile(r'^\s*(?:@|class\s|def\s|async\s+def\s)')
+
+
+def blob_hash(data):
+    """Git's object id for a blob holding `data`."""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def _first_docstring_line(node):
+    docstring = ast.get_docstring(node)
+    return docstring.strip().splitlines()[0] if docstring and docstring.strip() else None
+
+
+def _skeleton_body(node):
+    doc = _first_docstring_line(node)
+    return ([ast.Expr(ast.Constant(doc))] if doc else []) + [ast.Expr(ast.Constant(...))]
+
+
+def _skeleton_stmt(node):
+    """A copy of `node` reduced to its skeleton, or None if it has no place in one."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        node = copy.copy(node)
+        node.body = _skeleton_body(node)
+        return node
+    if isinstance(node, ast.ClassDef):
+        body = [_skeleton_stmt(child) for child in node.body]
+        node = copy.copy(node)
+        doc = _first_docstring_line(node)
+        node.body = ([ast.Expr(ast.Constant(doc))] if doc else []) + [child for child in body if child is not None]
+        if not node.body:
+            node.body = [ast.Expr(ast.Constant(...))]
+        return node
+    if isinstance(node, (ast.Assign, ast.AnnAssign)):
+        # Annotated fields stay even without a value: they are a dataclass's or NamedTuple's interface
+        if node.value is not None and len(ast.unparse(node.value)) > MAX_VALUE_CHARS:
+            node = copy.copy(node)
+            node.value = ast.Constant(...)
+        return node
+    return None
+
+
+def extract_skeleton(source):
+    """
+    Skeleton of a Python module: the docstring's first line, classes,
+    functions and module/class-level assignments, with bodies elided. Files that do not parse fall back to
+    their decorator, class and def lines.
+    """
+    if isinstance(source, bytes):
+        source = source.decode('utf-8', 'replace')
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return '\n'.join(line.rstrip() for line in source.splitlines() if SIGNATURE_LINE.match(line))
+    doc = _first_docstring_line(tree)
+    body = [ast.Expr(ast.Constant(doc))] if doc else []
+    body += [node for node in map(_skeleton_stmt, tree.body) if node is not None]
+    module = ast.Module(body=body, type_ignores=[])
+    return ast.unparse(module)
+
+
+def _extract(item):
+    blob, data = item
+    return blob, extract_skeleton(data)
+
+
+def _git(repo, *args, data=None):
+    return subprocess.run(['git', '-C', repo, *args], input=data, capture_output=True, check=True).stdout
+
+
+def rev_blobs(repo, rev, paths=(), suffix='.py'):
+    """{path: blob hash} of the files in `rev` (all of them, or just `paths`), from the git object database."""
+    blobs = {}
+    for line in _git(repo, 'ls-tree', '-r', '-z', rev, '--', *paths).split(b'\0'):
+        if not line:
+            continue
+        meta, path = line.split(b'\t', 1)
+        _, kind, blob = meta.split()
+        path = path.decode('utf-8', 'replace')
+        if kind == b'blob' and path.endswith(suffix):
+            blobs[path] = blob.decode()
+    return blobs
+
+
+def read_blobs(repo, blobs):
+    """{blob hash: content} for the given blob hashes, through one `git cat-file --batch` call."""
+    blobs = list(blobs)
+    out = _git(repo, 'cat-file', '--batch', data=''.join(b + '\n' for b in blobs).encode())
+    contents, pos = {}, 0
+    for blob in blobs:
+        end = out.index(b'\n', pos)
+        header = out[pos:end].split()
+        pos = end + 1
+        if len(header) < 3 or header[1] == b'missing':
+            continue
+        size = int(header[2])
+        contents[blob] = out[pos:pos + size]
+        pos += size + 1
+    return contents
+
+
+def tree_files(root, suffix='.py'):
+    """Paths (relative to `root`) of the files in a working tree, skipping hidden directories."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if name.endswith(suffix):
+                paths.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return paths
+
+
+class SkeletonStore:
+    """On-disk {blob hash: skeleton} store with an in-memory map in front."""
+
+    def __init__(self, path, workers=None):
+        self.path = os.path.join(path, f'v{SKELETON_VERSION}')
+        self.workers = workers
+        self.hits = self.misses = 0
+        self._memory = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, blob):
+        return os.path.join(self.path, blob[:2], blob + '.py')
+
+    def get(self, blob):
+        if blob in self._memory:
+            self.hits += 1
+            return self._memory[blob]
+        try:
+            with open(self._entry_path(blob), 'r', encoding='utf-8') as f:
+                skeleton = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._memory[blob] = skeleton
+        return skeleton
+
+    def get_or_parse(self, blob, data):
+        skeleton = self.get(blob)
+        if skeleton is None:
+            skeleton = extract_skeleton(data)
+            self.put(blob, skeleton)
+        return skeleton
+
+    def __contains__(self, blob):
+        return blob in self._memory or os.path.exists(self._entry_path(blob))
+
+    def put(self, blob, skeleton):
+        path = self._entry_path(blob)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(skeleton)
+        os.replace(tmp_path, path)
+
+    def _parse_all(self, items):
+        """Parse {blob: content} into the store, in a process pool when there is enough work."""
+        if len(items) < 32 or self.workers == 1:
+            for blob, skeleton in map(_extract, items.items()):
+                self.put(blob, skeleton)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for blob, skeleton in pool.map(_extract, items.items(), chunksize=16):
+                self.put(blob, skeleton)
+
+    def warm(self, repo, rev=None, paths=None):
+        """
+        Parse every file of a snapshot whose blob is not stored yet.
+
+        Returns {files, parsed, reused, seconds}.
+        """
+        start = time.perf_counter()
+        if rev:
+            blobs = rev_blobs(repo, rev, paths or ())
+            missing = {b for b in blobs.values() if b not in self}
+            contents = read_blobs(repo, missing) if missing else {}
+        else:
+            blobs, contents = {}, {}
+            for path in (tree_files(repo) if paths is None else paths):
+                with open(os.path.join(repo, path), 'rb') as f:
+                    data = f.read()
+                blobs[path] = blob = blob_hash(data)
+                if blob not in self:
+                    contents[blob] = data
+        self._parse_all(contents)
+        return {'files': len(blobs), 'parsed': len(contents), 'reused': len(blobs) - len(contents),
+                'seconds': time.perf_counter() - start}
+
+    def skeletons(self, repo, paths, rev=None):
+        """{path: skeleton} for `paths` of a working tree, or of `rev` when given; missing files are skipped."""
+        if rev:
+            blobs = rev_blobs(repo, rev, paths)
+            missing = {b for b in blobs.values() if b not in self}
+            contents = read_blobs(repo, missing) if missing else {}
+            skeletons = {}
+            for path in paths:
+                if path not in blobs:
+                    continue
+                blob = blobs[path]
+                if blob not in contents and blob not in self:
+                    print(f"Warning: Blob {blob} of {path} is missing from the object database")
+                    continue
+                skeletons[path] = self.get_or_parse(blob, contents.get(blob))
+            return skeletons
+
+        skeletons = {}
+        for path in paths:
+            try:
+                with open(os.path.join(repo, path), 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"Warning: Cannot read {path}: {e}")
+                continue
+            skeletons[path] = self.get_or_parse(blob_hash(data), data)
+        return skeletons
+
+
+def format_skeletons(skeletons):
+    """The {code_skeletons} / {file_skeletons} prompt section for {path: skeleton}."""
+    return '\n\n'.join(f"### File: {path}\n```python\n{skeleton}\n```" for path, skeleton in skeletons.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Blob-hash keyed code-skeleton store for file localization.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    warm_parser = subparsers.add_parser('warm', help='Parse every file of a snapshot that is not stored yet')
+    show_parser = subparsers.add_parser('show', help='Print the skeleton section for some files')
+    for sub in (warm_parser, show_parser):
+        sub.add_argument('repo', help='Repository root')
+        sub.add_argument('--rev', default='', help='Git revision to read instead of the working tree')
+        sub.add_argument('--store', default='skeleton_store', help='Store directory (default: skeleton_store)')
+    warm_parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    show_parser.add_argument('paths', nargs='+', help='File paths relative to the repository root')
+    args = parser.parse_args()
+
+    store = SkeletonStore(args.store, workers=getattr(args, 'workers', None))
+    if args.command == 'warm':
+        stats = store.warm(args.repo, args.rev or None)
+        print(f"{stats['files']} files: {stats['parsed']} parsed, {stats['reused']} already stored "
+              f"({stats['seconds']:.2f}s)")
+        return
+
+    start = time.perf_counter()
+    skeletons = store.skeletons(args.repo, args.paths, args.rev or None)
+    elapsed = time.perf_counter() - start
+    print(format_skeletons(skeletons))
+    print(f"\n{len(skeletons)} skeletons in {elapsed * 1000:.1f} ms ({store.hits} stored, {store.misses} parsed)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
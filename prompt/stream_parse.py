@@ -0,0 +1,641 @@
+"""
+Incremental parsers for the structured outputs the RAIM prompts ask for.
+
+Each parser consumes a response as it streams in, chunk by chunk, and
+returns the structured items that became complete with that chunk:
+
+    FileListParser      fenced list of file paths (file_summary_overall, file_loc_with_graph_user)
+    LocationParser      file + class:/function:/line: blocks (initial_func_loc, LINE_LOC_FROM_PLAN_PROMPT)
+    QueryActionParser   <QUERY_GENERATION_START> ... ACTION: {json} (query_gen_prompt)
+    RankingParser       <RANKING_START>[2] > [1]</RANKING_END> (rerank_prompt)
+    JSONParser          one JSON object, with the elements of one list field streamed out
+                        (CONTEXT_SELECTION_PROMPT, DESIGN_PROMPT_TEMPLATE, evaluation and selection)
+
+`parser.done` turns true as soon as the rest of the response cannot change
+the result (the closing fence or tag, or the item limit), so generation can
+be cancelled there. Output that can no longer match the grammar raises
+ParseError from feed(), mid-stream, so a retry can start before the bad
+response finishes.
+
+    parser = parser_for('rerank_prompt', num_items=5)
+    for chunk in stream:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    ranking = parser.close()
+"""
+import re
+import json
+import argparse
+
+FENCE = '```'
+DEFAULT_MAX_PREAMBLE = 4000
+
+
+class ParseError(ValueError):
+    pass
+
+
+class StreamParser:
+    """Base class: feed() buffers text and hands complete lines or characters to the grammar."""
+
+    def __init__(self, max_preamble=DEFAULT_MAX_PREAMBLE):
+        self.max_preamble = max_preamble
+        self.text = ''
+        self.items = []
+        self.done = False
+        self.error = None
+
+    def feed(self, chunk):
+        """Consume the next chunk; returns the items completed by it."""
+        if self.done or not chunk:
+            return []
+        start = len(self.items)
+        self.text += chunk
+        try:
+            self._consume()
+        except ParseError as e:
+            self.error = e
+            raise
+        return self.items[start:]
+
+    def close(self):
+        """The parsed result once the stream has ended (or was cancelled because `done`)."""
+        if self.error:
+            raise self.error
+        if not self.done:
+            self._finish()
+        return self.result()
+
+    def _fail(self, message):
+        raise ParseError(f"{type(self).__name__}: {message}")
+
+    def _check_preamble(self, length):
+        if length > self.max_preamble:
+            self._fail(f"no structured output after {length} characters")
+
+    def _consume(self):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def result(self):
+        return list(self.items)
+
+    def closed_text(self, text):
+        """`text` (what arrived before the parser hung up) as a complete response in the template's format."""
+        return text
+
+
+class LineParser(StreamParser):
+    """Grammars made of whole lines: complete lines are passed to _line()."""
+
+    def __init__(self, max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self._pos = 0
+
+    def _consume(self):
+        while not self.done:
+            end = self.text.find('\n', self._pos)
+            if end < 0:
+                break
+            line, self._pos = self.text[self._pos:end], end + 1
+            self._line(line.strip())
+        if not self.done and self._pos == 0:
+            self._check_preamble(len(self.text))
+
+    def _finish(self):
+        rest = self.text[self._pos:].strip()
+        self._pos = len(self.text)
+        if rest:
+            self._line(rest)
+        if not self.done:
+            self._end_of_stream()
+
+    def _line(self, line):
+        raise NotImplementedError
+
+    def _end_of_stream(self):
+        pass
+
+
+class FencedParser(LineParser):
+    """Line grammars wrapped in a ``` block; text before the opening fence is ignored."""
+
+    def __init__(self, max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.in_fence = False
+        self.fence_closed = False
+        self._preamble = 0
+
+    def _line(self, line):
+        if not self.in_fence:
+            if line.startswith(FENCE):
+                self.in_fence = True
+            else:
+                self._preamble += len(line) + 1
+                self._check_preamble(self._preamble)
+            return
+        if line.startswith(FENCE):
+            self._close_fence()
+            self.fence_closed = self.done = True
+            return
+        self._fenced_line(line)
+
+    def _close_fence(self):
+        pass
+
+    def _block_lines(self):
+        return []
+
+    def closed_text(self, text):
+        # Stopped before the closing fence: rebuild the block from what was parsed
+        if self.fence_closed:
+            return text
+        return '\n'.join([FENCE] + self._block_lines() + [FENCE]) + '\n'
+
+    def _end_of_stream(self):
+        if not self.in_fence:
+            self._fail("no ``` block in the response")
+        # An unclosed fence at the end of the stream still counts
+        self._close_fence()
+        self.done = True
+
+
+class FileListParser(FencedParser):
+    """File paths, one per line inside ```; done at the closing fence or after `limit` paths."""
+
+    def __init__(self, limit=10, suffix='.py', max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.limit = limit
+        self.suffix = suffix
+        self.skipped = []
+
+    def _fenced_line(self, line):
+        if not line:
+            return
+        if ' ' in line or (self.suffix and not line.endswith(self.suffix)):
+            self.skipped.append(line)
+            return
+        if line not in self.items:
+            self.items.append(line)
+        if self.limit and len(self.items) >= self.limit:
+            self.done = True
+
+    def _close_fence(self):
+        if not self.items:
+            self._fail("empty file list")
+
+    def _block_lines(self):
+        return list(self.items)
+
+
+LOCATION_KEY = re.compile(r'^(class|function|line)\s*:\s*(.+?)\s*$')
+LINE_SPEC = re.compile(r'^\d+(\s*-\s*\d+)?$')
+LINE_SEPARATOR = re.compile(r'\s*,\s*')
+
+
+class LocationParser(FencedParser):
+    """
+    Blocks of a file path followed by `class:`, `function:` or `line:` entries.
+
+    Result: one {'file', 'entries'} dict per block, where entries are the
+    (key, value) pairs in response order, so a `line:` stays with the
+    `class:` or `function:` above it; `line: 10, 12` gives one entry per
+    line. A block is emitted when the next file path, a blank line or the
+    closing fence ends it; done after `limit` blocks when a limit is given.
+    """
+
+    def __init__(self, limit=None, max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.limit = limit
+        self._block = None
+
+    def _emit(self):
+        if self._block is not None:
+            self.items.append(self._block)
+            self._block = None
+            if self.limit and len(self.items) >= self.limit:
+                self.done = True
+
+    def _fenced_line(self, line):
+        if not line:
+            self._emit()
+            return
+        match = LOCATION_KEY.match(line)
+        if match is None:
+            if ' ' in line:
+                self._fail(f"expected a file path or class:/function:/line: entry, got {line!r}")
+            self._emit()
+            if not self.done:
+                self._block = {'file': line, 'entries': []}
+            return
+        key, value = match.groups()
+        if self._block is None:
+            self._fail(f"{key}: entry before any file path")
+        if key != 'line':
+            self._block['entries'].append((key, value))
+            return
+        # `line: 10, 12-14` lists several lines; each becomes its own entry
+        for spec in LINE_SEPARATOR.split(value):
+            if not LINE_SPEC.match(spec):
+                self._fail(f"line: expects numbers or start-end ranges, got {value!r}")
+            self._block['entries'].append((key, spec))
+
+    def _close_fence(self):
+        self._emit()
+        if not self.items:
+            self._fail("no locations in the ``` block")
+
+    def _block_lines(self):
+        lines = []
+        for block in self.items:
+            lines += [block['file']] + [f"{key}: {value}" for key, value in block['entries']] + ['']
+        return lines[:-1]
+
+
+def _balanced_end(text, start):
+    """Index just past the JSON value that opens at text[start], or -1 if it is not complete yet."""
+    depth, in_string, escape = 0, False, False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in '{[':
+            depth += 1
+        elif c in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+class QueryActionParser(StreamParser):
+    """
+    The query generation block; done as soon as the ACTION JSON is complete.
+
+    Result: {'thought', 'reformulation', 'action'}, where action is the parsed
+    {"name": "search" | "finish", "arguments": ...} object.
+    """
+    START, END = '<QUERY_GENERATION_START>', '<QUERY_GENERATION_END>'
+    TOOLS = ('search', 'finish')
+
+    def __init__(self, max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.action = None
+
+    def _section(self, body, name, following):
+        match = re.search(rf'{name}:\s*(.*?)\s*(?={following}:|$)', body, re.DOTALL)
+        return match.group(1) if match else ''
+
+    def _consume(self):
+        start = self.text.find(self.START)
+        if start < 0:
+            self._check_preamble(len(self.text))
+            return
+        body = self.text[start + len(self.START):]
+        end = body.find(self.END)
+        action_at = body.find('ACTION:')
+        if action_at < 0:
+            if end >= 0:
+                self._fail("query generation block ended without an ACTION")
+            return
+        brace = body.find('{', action_at)
+        if brace < 0:
+            if end >= 0:
+                self._fail("ACTION without a JSON object")
+            return
+        stop = _balanced_end(body, brace)
+        if stop < 0:
+            if end >= 0:
+                self._fail("unterminated ACTION JSON")
+            return
+        try:
+            action = json.loads(body[brace:stop])
+        except json.JSONDecodeError as e:
+            self._fail(f"invalid ACTION JSON: {e}")
+        if not isinstance(action, dict) or action.get('name') not in self.TOOLS:
+            self._fail(f"ACTION must call one of {', '.join(self.TOOLS)}")
+        self.action = action
+        self.items.append({
+            'thought': self._section(body[:action_at], 'THOUGHT', 'REFORMULATION'),
+            'reformulation': self._section(body[:action_at], 'REFORMULATION', 'ACTION'),
+            'action': action,
+        })
+        self.done = True
+
+    def _finish(self):
+        self._fail("no complete ACTION in the response")
+
+    def result(self):
+        return self.items[0] if self.items else None
+
+
+class RankingParser(StreamParser):
+    """`[i] > [j] > ...` between the ranking tags; each identifier is emitted as it arrives."""
+    START, END = '<RANKING_START>', '</RANKING_END>'
+    TOKEN = re.compile(r'\s*(?:\[(\d+)\]|>)\s*')
+
+    def __init__(self, num_items=None, max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.num_items = num_items
+        self._pos = None
+
+    def _consume(self):
+        if self._pos is None:
+            start = self.text.find(self.START)
+            if start < 0:
+                self._check_preamble(len(self.text))
+                return
+            self._pos = start + len(self.START)
+
+        while True:
+            rest = self.text[self._pos:]
+            if rest.lstrip().startswith(self.END):
+                self.done = True
+                return
+            match = self.TOKEN.match(rest)
+            if match is None:
+                # Need more text, unless what is there can no longer become a token or the end tag
+                stripped = rest.strip()
+                if stripped and not re.fullmatch(r'\[\d*|<(/(R(A(N(K(I(N(G(_(E(N(D)?)?)?)?)?)?)?)?)?)?)?)?', stripped):
+                    self._fail(f"unexpected text in ranking: {stripped[:40]!r}")
+                return
+            self._pos += match.end()
+            if match.group(1) is not None:
+                self._rank(int(match.group(1)))
+
+    def _rank(self, identifier):
+        if identifier in self.items:
+            self._fail(f"[{identifier}] ranked twice")
+        if self.num_items is not None and not 1 <= identifier <= self.num_items:
+            self._fail(f"[{identifier}] is not one of the {self.num_items} candidates")
+        self.items.append(identifier)
+
+    def _finish(self):
+        if self._pos is None:
+            self._fail("no <RANKING_START> in the response")
+        # Accept a trailing identifier cut off by the end of the stream, e.g. "[3]" without the end tag
+        match = self.TOKEN.match(self.text[self._pos:])
+        if match and match.group(1) is not None:
+            self._rank(int(match.group(1)))
+        if not self.items:
+            self._fail("empty ranking")
+
+
+class JSONParser(StreamParser):
+    """
+    One JSON object, possibly inside a ```json fence; a `{` in the text before
+    it that is not followed by a key is skipped as prose.
+
+    Top-level values are recorded as soon as each is complete; elements of
+    the `item_key` list are emitted one by one. Done when the object closes
+    or once `limit` items have arrived. Keys listed in `required` must be
+    present by then.
+    """
+
+    def __init__(self, item_key=None, limit=None, required=(), max_preamble=DEFAULT_MAX_PREAMBLE):
+        super().__init__(max_preamble)
+        self.item_key = item_key
+        self.limit = limit
+        self.required = tuple(required)
+        self.values = {}
+        self._pos = 0
+        self._stack = []
+        self._in_string = self._escape = False
+        self._string_start = None
+        self._expect_key = False
+        self._object_start = None
+        self._key = None
+        self._value_start = None
+        self._in_items = False
+        self._item_start = None
+
+    def _load(self, text, what):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            self._fail(f"invalid {what}: {e}")
+
+    def _end_value(self, end):
+        if self._value_start is not None:
+            self.values[self._key] = self._load(self.text[self._value_start:end].strip(), f"value of {self._key!r}")
+            self._value_start = None
+
+    def _end_item(self, end):
+        if self._item_start is not None:
+            self.items.append(self._load(self.text[self._item_start:end].strip(), f"{self.item_key} element"))
+            self._item_start = None
+            if self.limit and len(self.items) >= self.limit:
+                self._complete()
+
+    def _complete(self):
+        missing = [key for key in self.required if key not in self.values and key != self.item_key]
+        if self.item_key in self.required and not self.items and self.item_key not in self.values:
+            missing.append(self.item_key)
+        if missing:
+            self._fail(f"missing keys: {', '.join(missing)}")
+        self.done = True
+
+    def _consume(self):
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            i, c = self._pos, text[self._pos]
+            self._pos += 1
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if depth == 1 and self._expect_key:
+                        self._key = self._load(text[self._string_start:i + 1], 'key')
+                        self._expect_key = False
+                        self._object_start = None
+                    elif depth == 1:
+                        self._end_value(i + 1)
+                    elif depth == 2 and self._in_items and self._item_start == self._string_start:
+                        self._end_item(i + 1)
+                continue
+
+            if not self._stack:
+                if c == '{':
+                    self._stack.append(c)
+                    self._expect_key = True
+                    self._object_start = i
+                else:
+                    self._check_preamble(i + 1)
+                continue
+
+            if c.isspace() or c == ':':
+                continue
+            if depth == 1 and self._expect_key and c not in '"}':
+                if self._object_start is None:
+                    self._fail(f"expected a key, got {c!r}")
+                # A '{' in the prose before the JSON: resume scanning for the object after it
+                self._pos = self._object_start + 1
+                self._stack, self._expect_key, self._object_start = [], False, None
+                self._check_preamble(self._pos)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if depth == 1 and not self._expect_key and self._value_start is None:
+                    self._value_start = i
+                elif depth == 2 and self._in_items and self._item_start is None:
+                    self._item_start = i
+            elif c in '{[':
+                if depth == 1 and self._value_start is None:
+                    self._value_start = i
+                    self._in_items = c == '[' and self._key == self.item_key
+                elif depth == 2 and self._in_items and self._item_start is None:
+                    self._item_start = i
+                self._stack.append(c)
+            elif c in '}]':
+                if depth == 2 and self._in_items and c == ']':
+                    self._end_item(i)
+                    self._in_items = False
+                if depth == 1:
+                    self._end_value(i)
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    self._complete()
+                elif depth == 1:
+                    self._end_value(i + 1)
+                elif depth == 2 and self._in_items:
+                    self._end_item(i + 1)
+            elif c == ',':
+                if depth == 1:
+                    self._end_value(i)
+                    self._expect_key = True
+                    self._key = None
+                elif depth == 2 and self._in_items:
+                    self._end_item(i)
+            else:
+                if depth == 1 and self._value_start is None:
+                    self._value_start = i
+                elif depth == 2 and self._in_items and self._item_start is None:
+                    self._item_start = i
+
+    def _finish(self):
+        self._fail("JSON object not closed" if self._stack else "no JSON object in the response")
+
+    def result(self):
+        values = dict(self.values)
+        if self.item_key is not None and (self.items or self.item_key not in values):
+            values[self.item_key] = list(self.items)
+        return values
+
+    def closed_text(self, text):
+        # Stopped after `limit` items, inside the object: re-serialize what was parsed
+        return text if not self._stack else json.dumps(self.result(), indent=2)
+
+
+# template name: parser factory taking the per-call options
+PARSERS = {
+    'file_summary_overall': lambda **kw: FileListParser(limit=kw.get('limit', 10)),
+    'file_loc_with_graph_user': lambda **kw: FileListParser(limit=kw.get('limit', 10)),
+    'initial_func_loc': lambda **kw: LocationParser(limit=kw.get('limit', 3)),
+    'LINE_LOC_FROM_PLAN_PROMPT': lambda **kw: LocationParser(),
+    'LINE_LOC_FROM_PLAN_PROMPT_SHARED_PREFIX': lambda **kw: LocationParser(),
+    'query_gen_prompt': lambda **kw: QueryActionParser(),
+    'rerank_prompt': lambda **kw: RankingParser(num_items=kw.get('num_items')),
+    'CONTEXT_SELECTION_PROMPT': lambda **kw: JSONParser(item_key='top_3_additional_qnames', limit=3,
+                                                        required=('top_3_additional_qnames',)),
+    'DESIGN_PROMPT_TEMPLATE': lambda **kw: JSONParser(item_key='plans', limit=kw.get('k_plans'), required=('plans',)),
+    'PATCH_EVALUATION_PROMPT': lambda **kw: JSONParser(required=('scores',)),
+    'PATCH_EVALUATION_PROMPT_SHARED_PREFIX': lambda **kw: JSONParser(required=('scores',)),
+    'PATCH_SELECTION_PROMPT': lambda **kw: JSONParser(required=('selected_plan_index',)),
+    'PATCH_BATCH_EVALUATION_PROMPT': lambda **kw: JSONParser(item_key='candidates',
+                                                             required=('selected_plan_index',)),
+}
+
+
+def parser_for(template, **options):
+    try:
+        return PARSERS[template](**options)
+    except KeyError:
+        raise KeyError(f"No output parser for {template}; known: {', '.join(PARSERS)}") from None
+
+
+def parse_stream(template, chunks, **options):
+    """
+    Parse an iterable of text chunks for `template`.
+
+    Returns (result, characters consumed, stopped early). Stops reading as
+    soon as the parser is done; ParseError propagates mid-stream.
+    """
+    parser = parser_for(template, **options)
+    consumed, stopped = 0, False
+    for chunk in chunks:
+        parser.feed(chunk)
+        consumed += len(chunk)
+        if parser.done:
+            stopped = True
+            break
+    return parser.close(), consumed, stopped
+
+
+def sse_deltas(lines):
+    """Content deltas from the `data:` lines of an OpenAI-compatible streaming response."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        for choice in json.loads(data).get('choices') or []:
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse a saved response incrementally, as if it were streamed.')
+    parser.add_argument('template', choices=sorted(PARSERS))
+    parser.add_argument('response', help='Text file holding the response')
+    parser.add_argument('--chunk', type=int, default=8, help='Characters per simulated stream chunk')
+    parser.add_argument('--num_items', type=int, default=None, help='Number of candidates, for rerank_prompt')
+    args = parser.parse_args()
+
+    with open(args.response, 'r', encoding='utf-8') as f:
+        text = f.read()
+    options = {'num_items': args.num_items} if args.num_items else {}
+    stream_parser = parser_for(args.template, **options)
+
+    consumed = 0
+    try:
+        for start in range(0, len(text), args.chunk):
+            chunk = text[start:start + args.chunk]
+            consumed += len(chunk)
+            for item in stream_parser.feed(chunk):
+                print(f"[{consumed:>6}] {json.dumps(item)}")
+            if stream_parser.done:
+                break
+        result = stream_parser.close()
+    except ParseError as e:
+        print(f"Parse error after {consumed} of {len(text)} characters: {e}")
+        return
+    print(json.dumps(result, indent=2))
+    print(f"Consumed {consumed} of {len(text)} characters"
+          + (f", generation could stop {len(text) - consumed} characters early" if consumed < len(text) else ''))
+
+
+if __name__ == "__main__":
+    main()
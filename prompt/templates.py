@@ -0,0 +1,191 @@
+"""
+Compiled registry of the prompt templates in prompt.py.
+
+Each template is parsed once with string.Formatter into alternating literal
+text and placeholders, and checked against the placeholders its stage is
+expected to supply, so a typo or a stray unescaped brace fails at import
+instead of at the first LLM call. Rendering joins the pre-split pieces
+instead of re-parsing the format string.
+
+Binding the per-instance fields once (e.g. the problem statement) folds them
+into the literal text, so every later render for that instance starts with
+the same prefix string, byte for byte, which is what provider prompt caching
+keys on:
+
+    evaluate = bind('PATCH_EVALUATION_PROMPT', problem_statement=..., impact_report=...)
+    prompts = [evaluate.render(plan_name=name, patch_diff=diff) for name, diff in candidates]
+"""
+import os
+import sys
+import string
+import argparse
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import prompt
+
+# stage: {template name: placeholders the stage fills in}
+STAGES = {
+    'file_localization': {
+        'feature_report_template': ('problem_statement', 'structure'),
+        'file_system_prompt_overall': (),
+        'file_summary_overall': (),
+        'file_loc_with_graph_system': (),
+        'file_loc_with_graph_user': ('problem_statement', 'structure', 'module_call_graph', 'code_skeletons'),
+    },
+    'function_localization': {
+        'initial_func_loc': ('problem_statement', 'file_skeletons'),
+        'query_gen_prompt': ('problem_statement', 'function_contents_text'),
+        'rerank_prompt': ('problem_statement', 'function_contents_text'),
+    },
+    'patch_generation': {
+        'CONTEXT_SELECTION_PROMPT': ('analysis_result_json', 'code_context', 'call_graph_context'),
+        'DESIGN_PROMPT_TEMPLATE': ('k_plans', 'analysis_result_json', 'augmentations_text',
+                                   'call_graph_context', 'final_code_context'),
+        'LINE_LOC_FROM_PLAN_PROMPT': ('analysis_result_json', 'plan_text', 'code_context'),
+        'LINE_LOC_FROM_PLAN_PROMPT_SHARED_PREFIX': ('analysis_result_json', 'plan_text', 'code_context'),
+    },
+    'patch_selection': {
+        'PATCH_EVALUATION_PROMPT': ('problem_statement', 'impact_report', 'plan_name', 'patch_diff'),
+        'PATCH_EVALUATION_PROMPT_SHARED_PREFIX': ('problem_statement', 'impact_report', 'plan_name', 'patch_diff'),
+        'PATCH_SELECTION_PROMPT': ('problem_statement', 'candidates_analysis'),
+        'PATCH_BATCH_EVALUATION_PROMPT': ('problem_statement', 'impact_report', 'num_candidates', 'candidates_text'),
+        'PATCH_BATCH_CANDIDATE': ('index', 'plan_name', 'patch_diff'),
+    },
+}
+
+
+class CompiledTemplate:
+    """
+    A format string split into `literals` and `fields`, with
+    text == literals[0] + {fields[0]} + literals[1] + ... + literals[-1].
+    """
+
+    def __init__(self, name, literals, fields):
+        self.name = name
+        self.literals = tuple(literals)
+        self.fields = tuple(fields)
+
+    @property
+    def placeholders(self):
+        """Distinct placeholder names, in order of first use."""
+        return tuple(dict.fromkeys(self.fields))
+
+    @property
+    def static_prefix(self):
+        """Text before the first placeholder; identical for every render."""
+        return self.literals[0]
+
+    def render(self, **values):
+        missing = [f for f in self.placeholders if f not in values]
+        if missing:
+            raise KeyError(f"{self.name} is missing values for: {', '.join(missing)}")
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(str(values[field]))
+            parts.append(literal)
+        return ''.join(parts)
+
+    def bind(self, **values):
+        """A template with `values` folded into its literal text; unknown names are ignored."""
+        literals, fields = [self.literals[0]], []
+        for field, literal in zip(self.fields, self.literals[1:]):
+            if field in values:
+                literals[-1] += str(values[field]) + literal
+            else:
+                fields.append(field)
+                literals.append(literal)
+        return CompiledTemplate(self.name, literals, fields)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.name!r}, fields={self.placeholders})"
+
+
+def compile_template(name, text, expected=None):
+    """
+    Parse `text` into a CompiledTemplate.
+
+    Only plain named placeholders are allowed (no positional fields,
+    attribute/index lookups, conversions or format specs). When `expected`
+    is given the placeholders must be exactly those names.
+    """
+    literals, fields = [''], []
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise ValueError(f"Template {name}: {e}") from None
+
+    for literal, field, format_spec, conversion in parsed:
+        literals[-1] += literal
+        if field is None:
+            continue
+        if not field.isidentifier():
+            raise ValueError(f"Template {name}: unsupported placeholder {{{field}}}")
+        if format_spec or conversion:
+            raise ValueError(f"Template {name}: placeholder {{{field}}} uses a conversion or format spec")
+        fields.append(field)
+        literals.append('')
+
+    template = CompiledTemplate(name, literals, fields)
+    if expected is not None and set(template.placeholders) != set(expected):
+        raise ValueError(f"Template {name}: placeholders {sorted(template.placeholders)}, "
+                         f"expected {sorted(expected)}")
+
+    sample = {field: f'<{field}>' for field in template.placeholders}
+    if template.render(**sample) != text.format(**sample):
+        raise ValueError(f"Template {name}: compiled rendering differs from str.format")
+    return template
+
+
+TEMPLATES = {
+    name: compile_template(name, getattr(prompt, name), fields)
+    for templates in STAGES.values()
+    for name, fields in templates.items()
+}
+
+STAGE_OF = {name: stage for stage, templates in STAGES.items() for name in templates}
+
+
+def get(name):
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"Unknown template {name}; known: {', '.join(TEMPLATES)}") from None
+
+
+def render(name, **values):
+    return get(name).render(**values)
+
+
+@lru_cache(maxsize=64)
+def _bind(name, items):
+    return get(name).bind(**dict(items))
+
+
+def bind(name, **values):
+    """
+    get(name).bind(**values), cached on the values.
+
+    Repeated binds with the same per-instance values return the same object,
+    so its prefix string is built once per instance rather than per call.
+    """
+    return _bind(name, tuple(sorted(values.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the compiled prompt templates and their placeholders.')
+    parser.add_argument('--stage', choices=list(STAGES), default=None, help='Only list this stage')
+    args = parser.parse_args()
+
+    print(f"{'template':<40} {'stage':<22} {'prefix chars':>12} {'static chars':>12}  placeholders")
+    for name, template in TEMPLATES.items():
+        if args.stage and STAGE_OF[name] != args.stage:
+            continue
+        static = sum(len(literal) for literal in template.literals)
+        print(f"{name:<40} {STAGE_OF[name]:<22} {len(template.static_prefix):>12} {static:>12}  "
+              + ', '.join(template.placeholders))
+
+
+if __name__ == "__main__":
+    main()